@@ -0,0 +1,309 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Read access to the files in the compressed archives shipped with the repository.
+
+Directories such as the combined datasets or the model outputs of the original study are distributed as
+``.tar.xz`` archives. Instead of extracting them to disk first, files that do not exist on disk are read
+directly from the corresponding archive. On first use, the members of an archive are indexed with their
+offsets in the decompressed tar stream, so that individual files can be found without scanning the archive.
+
+Since XZ archives can only be decompressed sequentially, reading a member requires decompressing the archive
+up to that member. Reading several members with :func:`read_files` is done in a single pass in archive order.
+Files on disk always take precedence over archive members.
+"""
+
+import io
+import json
+import lzma
+import os
+import tarfile
+
+from extraction_benchmark.paths import *
+
+
+# Directories that can be read from archives and the archives containing them
+ARCHIVES = {
+    DATASET_COMBINED_PATH: os.path.join(DATASET_PATH, 'combined.tar.xz'),
+    MODEL_OUTPUTS_PATH: os.path.join(OUTPUTS_PATH, 'model-outputs.tar.xz'),
+    METRICS_PATH: os.path.join(OUTPUTS_PATH, 'metrics-computed.tar.xz'),
+    HTML_FEATURES_PATH: os.path.join(OUTPUTS_PATH, 'html-features.tar.xz'),
+}
+
+
+class ArchiveIndex:
+    """Index of the regular file members of a ``.tar.xz`` archive for reading them without extraction."""
+
+    def __init__(self, archive_path, root, index_path=ARCHIVE_INDEX_PATH):
+        """
+        :param archive_path: archive file path
+        :param root: name of the archive's top-level directory, which is stripped from member names
+        :param index_path: directory for storing the member index
+        """
+        self.archive_path = archive_path
+        self.root = root
+        self.index_file = os.path.join(index_path, os.path.basename(archive_path) + '.json')
+        stat = os.stat(archive_path)
+        self.signature = (stat.st_size, stat.st_mtime_ns)
+        self.members = self._load_index()
+        if self.members is None:
+            self.members = self._build_index()
+        self._dirs = {}
+        for name in self.members:
+            parts = name.split('/')
+            for i in range(len(parts)):
+                self._dirs.setdefault('/'.join(parts[:i]), set()).add(parts[i])
+        self._stream = None
+
+    def _load_index(self):
+        if not os.path.isfile(self.index_file):
+            return None
+        with open(self.index_file, 'r') as f:
+            index = json.load(f)
+        if tuple(index['signature']) != self.signature:
+            return None
+        return {k: tuple(v) for k, v in index['members'].items()}
+
+    def _build_index(self):
+        members = {}
+        with tarfile.open(self.archive_path, 'r|xz') as tar:
+            for info in tar:
+                if not info.isfile():
+                    continue
+                name = os.path.normpath(info.name).lstrip('/')
+                if name.startswith(self.root + '/'):
+                    name = name[len(self.root) + 1:]
+                members[name] = (info.offset_data, info.size)
+
+        os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+        with open(self.index_file + '.tmp', 'w') as f:
+            json.dump({'signature': self.signature, 'members': members}, f)
+        os.replace(self.index_file + '.tmp', self.index_file)
+        return members
+
+    def listdir(self, name):
+        """
+        :param name: member directory name relative to the archive root (empty for the root)
+        :return: sorted list of the names of files and directories in a member directory
+        """
+        return sorted(self._dirs.get(name.strip('/'), []))
+
+    def isdir(self, name):
+        """
+        :param name: member name relative to the archive root
+        :return: whether the name is a directory in the archive
+        """
+        return name.strip('/') in self._dirs
+
+    def read(self, name):
+        """
+        Read a member.
+
+        :param name: member name relative to the archive root
+        :return: contents of the member as bytes
+        """
+        offset, size = self.members[name]
+        if self._stream is None:
+            self._stream = lzma.open(self.archive_path, 'rb')
+        # Seeking forward continues decompression from the current position, seeking backward starts over
+        self._stream.seek(offset)
+        return self._stream.read(size)
+
+    def read_many(self, names):
+        """
+        Read several members in archive order.
+
+        :param names: list of member names relative to the archive root
+        :return: iterable of ``(name, bytes)`` tuples
+        """
+        for name in sorted(names, key=lambda n: self.members[n][0]):
+            yield name, self.read(name)
+
+    def close(self):
+        """Close the archive."""
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
+# Archive indexes of the current process (None for archives that do not exist or cannot be read)
+_INDEXES = {}
+
+
+def _get_archive(directory):
+    archive_path = ARCHIVES[directory]
+    if not os.path.isfile(archive_path):
+        return None
+    stat = os.stat(archive_path)
+    cached = _INDEXES.get(archive_path)
+    if cached is not None and cached[1] == (stat.st_size, stat.st_mtime_ns):
+        return cached[0]
+    if cached is not None and cached[0] is not None:
+        cached[0].close()
+
+    try:
+        archive = ArchiveIndex(archive_path, os.path.basename(directory))
+    except (tarfile.TarError, lzma.LZMAError, EOFError):
+        # Not a valid archive (e.g., a Git LFS pointer that has not been fetched)
+        archive = None
+    _INDEXES[archive_path] = (archive, (stat.st_size, stat.st_mtime_ns))
+    return archive
+
+
+def _resolve(path):
+    """
+    Find the archive member corresponding to a path.
+
+    :return: tuple of :class:`ArchiveIndex` and member name or ``(None, None)``
+    """
+    path = os.path.abspath(path)
+    for directory in ARCHIVES:
+        if path == directory or path.startswith(directory + os.sep):
+            archive = _get_archive(directory)
+            if archive is not None:
+                return archive, '' if path == directory else os.path.relpath(path, directory).replace(os.sep, '/')
+    return None, None
+
+
+def isfile(path):
+    """
+    :param path: file path
+    :return: whether the file exists on disk or in an archive
+    """
+    if os.path.isfile(path):
+        return True
+    archive, name = _resolve(path)
+    return archive is not None and name in archive.members
+
+
+def isdir(path):
+    """
+    :param path: directory path
+    :return: whether the directory exists on disk or in an archive
+    """
+    if os.path.isdir(path):
+        return True
+    archive, name = _resolve(path)
+    return archive is not None and archive.isdir(name)
+
+
+def listdir(path):
+    """
+    :param path: directory path
+    :return: sorted list of the names of files and directories on disk and in the archive
+    """
+    names = set(os.listdir(path)) if os.path.isdir(path) else set()
+    archive, name = _resolve(path)
+    if archive is not None:
+        names.update(archive.listdir(name))
+    return sorted(names)
+
+
+def file_signature(path):
+    """
+    Get a signature of a file that changes whenever the file changes.
+
+    Directories on disk change their signature only when entries are added, removed, or renamed.
+    Directories in an archive have the signature of the archive.
+
+    :param path: file or directory path
+    :return: tuple of file size and modification time (of the archive for archive members) or ``None``
+    """
+    if os.path.exists(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    archive, name = _resolve(path)
+    if archive is None:
+        return None
+    if name in archive.members:
+        return archive.members[name][1], archive.signature[1]
+    if archive.isdir(name):
+        return archive.signature
+    return None
+
+
+def open_file(path, mode='r'):
+    """
+    Open a file on disk or in an archive for reading.
+
+    :param path: file path
+    :param mode: ``"r"`` for UTF-8 text or ``"rb"`` for binary mode
+    :return: file object
+    """
+    if os.path.isfile(path):
+        return open(path, mode)
+    archive, name = _resolve(path)
+    if archive is None or name not in archive.members:
+        raise FileNotFoundError(f'No such file: {path}')
+    f = io.BytesIO(archive.read(name))
+    return f if 'b' in mode else io.TextIOWrapper(f, encoding='utf-8')
+
+
+def read_csv(path, **kwargs):
+    """
+    Read a CSV file from disk or an archive into a data frame.
+
+    :param path: file path
+    :param kwargs: arguments for :func:`pandas.read_csv`
+    :return: data frame
+    """
+    import pandas as pd
+    with open_file(path) as f:
+        return pd.read_csv(f, **kwargs)
+
+
+def read_files(paths, keep_order=True):
+    """
+    Read several files from disk or archives efficiently.
+
+    Files in archives are always read in archive order in a single pass per archive. If ``keep_order`` is set,
+    files that are read ahead of their turn are buffered until they can be returned in the given order.
+
+    :param paths: list of file paths (missing files are skipped)
+    :param keep_order: return files in the order of ``paths`` instead of archive order
+    :return: iterable of ``(path, bytes)`` tuples
+    """
+    located = []
+    by_archive = {}
+    for p in dict.fromkeys(paths):
+        if os.path.isfile(p):
+            located.append((p, None, None))
+            continue
+        archive, name = _resolve(p)
+        if archive is not None and name in archive.members:
+            by_archive.setdefault(archive, {})[name] = p
+            located.append((p, archive, name))
+
+    if not keep_order:
+        for p, archive, _ in located:
+            if archive is None:
+                with open(p, 'rb') as f:
+                    yield p, f.read()
+        for archive, names in by_archive.items():
+            for name, data in archive.read_many(names):
+                yield names[name], data
+        return
+
+    streams = {archive: archive.read_many(names) for archive, names in by_archive.items()}
+    buffered = {}
+    for p, archive, name in located:
+        if archive is None:
+            with open(p, 'rb') as f:
+                yield p, f.read()
+            continue
+        while (archive, name) not in buffered:
+            n, data = next(streams[archive])
+            buffered[(archive, n)] = data
+        yield p, buffered.pop((archive, name))
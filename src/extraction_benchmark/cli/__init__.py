@@ -13,6 +13,7 @@
 # limitations under the License.
 
 from .complexity import complexity
+from .ensemble import ensemble
 from .eval import eval
 from .extract import convert_datasets, extract
 from .fetch_urls import fetch
@@ -0,0 +1,87 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import click
+from extraction_benchmark import archives
+from extraction_benchmark.globals import *
+
+
+def _parse_weights(ctx, param, values):
+    """Parse a list of ``MODEL=WEIGHT`` values into a dict."""
+    weights = {}
+    for v in values:
+        model, _, weight = v.partition('=')
+        if model not in MODELS:
+            raise click.BadParameter(f'Unknown model: {model}')
+        try:
+            weights[model] = float(weight)
+        except ValueError:
+            raise click.BadParameter(f'Invalid weight: {v}')
+    return weights
+
+
+@click.group()
+def ensemble():
+    """
+    Tune ensembles of extraction models.
+    """
+    pass
+
+
+@ensemble.command()
+@click.option('-m', '--model', type=click.Choice(['all', *MODELS]), default=['all'], multiple=True,
+              help='Candidate ensemble members')
+@click.option('-e', '--exclude-model', type=click.Choice(MODELS), default=[], multiple=True,
+              help='Exclude models if "all" are selected.')
+@click.option('-d', '--dataset', type=click.Choice(['all', *DATASETS]), default=['all'], multiple=True)
+@click.option('-x', '--exclude-dataset', type=click.Choice(DATASETS), default=[], multiple=True,
+              help='Exclude datasets if "all" are selected.')
+@click.option('-t', '--threshold', type=click.FloatRange(min=0), multiple=True, default=[0.33, 0.5, 0.66, 0.8],
+              show_default=True, help='Vote thresholds as fractions of the number of ensemble members')
+@click.option('-w', '--weight', multiple=True, callback=_parse_weights,
+              help='Model weight as MODEL=WEIGHT, tried in addition to uniform weights')
+@click.option('--min-size', type=click.IntRange(min=1), default=2, show_default=True,
+              help='Minimum number of ensemble members')
+@click.option('--max-size', type=click.IntRange(min=1), help='Maximum number of ensemble members')
+@click.option('-s', '--sample-pages', type=click.IntRange(min=1), help='Use a random sample of pages per dataset')
+@click.option('-n', '--top', type=click.IntRange(min=1), default=10, show_default=True,
+              help='Number of best configurations to show')
+@click.option('-p', '--parallelism', help='Number of threads to use', default=os.cpu_count())
+def search(model, exclude_model, dataset, exclude_dataset, threshold, weight, min_size, max_size, sample_pages,
+           top, parallelism):
+    """
+    Search for the best ensemble members, weights, and vote thresholds.
+
+    Votes of the candidate models are computed once per page from the existing model outputs, after which
+    all configurations are scored against the ground truth with a token-level F1 score.
+    """
+    if 'all' in dataset:
+        dataset = sorted(d for d in DATASETS if d not in exclude_dataset)
+    if 'all' in model:
+        model = sorted(m for m in MODELS if m not in exclude_model)
+
+    # Only models with outputs can be ensemble members
+    model = [m for m in model if any(archives.isfile(os.path.join(MODEL_OUTPUTS_PATH, d, m + '.jsonl'))
+                                     for d in dataset)]
+    if not dataset:
+        click.echo('No datasets selected.', err=True)
+        return
+    if not model:
+        raise click.UsageError('Model outputs need to be generated before ensembles can be searched.')
+
+    from extraction_benchmark.ensemble_search import search_ensembles
+    try:
+        search_ensembles(model, dataset, threshold, weight, min_size, max_size, sample_pages, top, parallelism)
+    except FileNotFoundError as e:
+        raise click.FileError(e.filename, 'Make sure you have converted the raw datasets using "convert-datasets".')
@@ -30,8 +30,10 @@ def eval():
 @click.option('-d', '--dataset', type=click.Choice(['all', *DATASETS]), default=['all'], multiple=True)
 @click.option('-m', '--model', type=click.Choice(['all', *MODELS_ALL]), default=['all'], multiple=True)
 @click.option('--eval-ensembles', help='Evaluate only ensembles', is_flag=True)
+@click.option('--include-variants', is_flag=True,
+              help='Also evaluate the variant outputs of ensemble parameter sweeps')
 @click.option('-p', '--parallelism', help='Number of threads to use', default=os.cpu_count())
-def score(metric, dataset, model, eval_ensembles, parallelism):
+def score(metric, dataset, model, eval_ensembles, include_variants, parallelism):
     """
     Calculate performance metrics on model answers.
     """
@@ -61,7 +63,7 @@ def score(metric, dataset, model, eval_ensembles, parallelism):
 
     from extraction_benchmark.eval import calculcate_scores
     try:
-        calculcate_scores(metric, dataset, model, parallelism)
+        calculcate_scores(metric, dataset, model, parallelism, include_variants)
     except FileNotFoundError as e:
         click.FileError(e.filename,
                         f'Make sure you have converted the raw datasets using "convert-datasets".')
@@ -74,7 +76,9 @@ def score(metric, dataset, model, eval_ensembles, parallelism):
 @click.option('-x', '--exclude-dataset', type=click.Choice(DATASETS), default=[], multiple=True)
 @click.option('-c', '--complexity', type=click.Choice(['all', *COMPLEXITIES]), default=['all', 'low', 'high'],
               required=True, multiple=True, show_default=True)
-def aggregate(score, model, dataset, exclude_dataset, complexity):
+@click.option('--include-variants', is_flag=True,
+              help='Also aggregate the scores of ensemble parameter sweep variants')
+def aggregate(score, model, dataset, exclude_dataset, complexity, include_variants):
     """
     Aggregate calculated performance metrics.
     """
@@ -96,7 +100,7 @@ def aggregate(score, model, dataset, exclude_dataset, complexity):
     from extraction_benchmark.eval import aggregate_scores
     try:
         for s in score:
-            aggregate_scores(s, model, dataset, complexity)
+            aggregate_scores(s, model, dataset, complexity, include_variants)
     except FileNotFoundError as e:
         raise click.FileError(e.filename, 'Please calculate complexity scores first.')
 
@@ -12,17 +12,54 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import os
 import logging
 import click
+from extraction_benchmark import archives
 from extraction_benchmark.globals import *
+from extraction_benchmark.page_catalog import COMPLEXITY_BUCKETS
 from extraction_benchmark.util import *
 
 
+def _parse_model_limits(ctx, param, values):
+    """Parse a list of ``LIMIT`` or ``MODEL=LIMIT`` values into a dict (``None`` key for the default limit)."""
+    limits = {}
+    for v in values:
+        model, _, limit = v.rpartition('=')
+        if model and model not in MODELS_ALL:
+            raise click.BadParameter(f'Unknown model: {model}')
+        try:
+            limits[model or None] = float(limit)
+        except ValueError:
+            raise click.BadParameter(f'Invalid limit: {v}')
+    return limits
+
+
+def _parse_model_options(ctx, param, values):
+    """Parse a list of ``MODEL.KEY=VALUE`` values into a dict of per-model option dicts."""
+    options = {}
+    for v in values:
+        key, sep, value = v.partition('=')
+        model, _, key = key.partition('.')
+        if not sep or not key:
+            raise click.BadParameter(f'Invalid option: {v}')
+        if model not in MODELS_ALL:
+            raise click.BadParameter(f'Unknown model: {model}')
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+        options.setdefault(model, {})[key] = value
+    return options
+
+
 @click.command()
 @click.option('-m', '--model', type=click.Choice(['all', *MODELS_ALL]), default=['all'],
               help='Extraction models ("all" does not include ensembles)', multiple=True)
 @click.option('--run-ensembles', is_flag=True, help='Run ensembles')
+@click.option('--inline-members', is_flag=True,
+              help='Compute ensemble member outputs on the fly instead of reading previously generated outputs')
 @click.option('-u','--url', help='Run selected models on a single URL (ignores --dataset)', default=None)
 @click.option('-f','--filename', help='Read list of urls from selected file (ignores --dataset)', default=None)
 @click.option('-p', '--pages', is_flag=True, help='Run selected models on HTML files (ignores --dataset)', default=False)
@@ -31,10 +68,40 @@ from extraction_benchmark.util import *
 @click.option('-d', '--dataset', type=click.Choice(['all', *DATASETS]), default=['all'], multiple=True)
 @click.option('-x', '--exclude-dataset', type=click.Choice(DATASETS), default=[],
               help='Exclude datasets if "all" are selected.', multiple=True)
-@click.option('-s', '--skip-existing', is_flag=True, help='Load existing answer and extract only new')
+@click.option('-s', '--skip-existing', is_flag=True,
+              help='Load existing answers and extract only new pages (resumes interrupted runs)')
 @click.option('-p', '--parallelism', help='Number of threads to use', default=os.cpu_count())
+@click.option('-c', '--chunk-size', type=click.IntRange(min=1), default=50, show_default=True,
+              help='Maximum number of pages per work chunk')
+@click.option('--no-cache', is_flag=True, help='Do not use the extraction cache')
+@click.option('-t', '--page-timeout', multiple=True, callback=_parse_model_limits,
+              help='Per-page timeout in seconds, 0 for no timeout (default: 300, '
+                   'use MODEL=SECONDS to set a limit for a specific model)')
+@click.option('--max-rss', multiple=True, callback=_parse_model_limits,
+              help='Worker memory limit in MiB, including processes started by the worker '
+                   '(use MODEL=MIB to set a limit for a specific model)')
+@click.option('--max-pages-per-worker', type=click.IntRange(min=0), default=1000, show_default=True,
+              help='Replace workers with fresh processes after this many pages (0 for never)')
+@click.option('--quarantine-after', type=click.IntRange(min=0), default=2, show_default=True,
+              help='Skip pages on which a model failed this many times due to resource limits (0 for never)')
+@click.option('--memory-budget', type=click.IntRange(min=0), default=None,
+              help='Memory budget in MiB for running heavy extractors in parallel '
+                   '(default: 80% of physical memory, 0 for no limit)')
+@click.option('-b', '--batch-size', type=click.IntRange(min=1), default=16, show_default=True,
+              help='Maximum number of pages per batch for models that support batching')
+@click.option('--complexity-range', type=click.FloatRange(0, 1), nargs=2, default=None,
+              help='Run only on pages with a complexity in this range (e.g., "0.5 1")')
+@click.option('--complexity-bucket', type=click.Choice(COMPLEXITY_BUCKETS), multiple=True,
+              help='Run only on pages in these complexity buckets')
+@click.option('--size-range', type=click.IntRange(min=0), nargs=2, default=None,
+              help='Run only on pages with an HTML size in this range (in KiB, e.g., "0 200")')
+@click.option('-o', '--model-option', multiple=True, callback=_parse_model_options,
+              help='Extractor option as MODEL.KEY=VALUE, e.g., go_domdistiller.instances=4')
 @click.option('-v', '--verbose', help='Verbose output', is_flag=True)
-def extract(model, run_ensembles, url, filename, pages, exclude_model, dataset, exclude_dataset, skip_existing, parallelism, verbose):
+def extract(model, run_ensembles, inline_members, url, filename, pages, exclude_model, dataset, exclude_dataset,
+            skip_existing, parallelism, chunk_size, no_cache, page_timeout, max_rss, max_pages_per_worker,
+            quarantine_after, memory_budget, batch_size, complexity_range, complexity_bucket, size_range, model_option,
+            verbose):
     """
     Run main content extractors on the datasets.
     """
@@ -52,7 +119,7 @@ def extract(model, run_ensembles, url, filename, pages, exclude_model, dataset,
         model = sorted(m for m in MODELS if m not in exclude_model)
         click.confirm('This will run ALL models. Continue?', abort=True)
 
-    if not os.path.isdir(MODEL_OUTPUTS_PATH):
+    if not inline_members and not archives.isdir(MODEL_OUTPUTS_PATH):
         for m in model:
             if m.startswith('ensemble_'):
                 raise click.UsageError('Model outputs need to be generated before ensemble can be run.')
@@ -81,7 +148,7 @@ def extract(model, run_ensembles, url, filename, pages, exclude_model, dataset,
 
     if pages or url or filename:
         dataset = ['custom']
-    elif not os.path.isdir(DATASET_COMBINED_PATH):
+    elif not archives.isdir(DATASET_COMBINED_PATH):
         raise click.UsageError('Combined dataset not found. '
                                'Please create the converted dataset first using the "convert-datasets" command.')
     
@@ -94,23 +161,49 @@ def extract(model, run_ensembles, url, filename, pages, exclude_model, dataset,
                    'under the current working directory.', err=True)
         return
 
-    if parallelism > 1 and ('web2text' in model or 'boilernet' in model):
-        click.echo('WARNING: Deep neural models selected. If you run into GPU memory issues, '
-                   'try running with --parallelism=1.', err=True)
+    page_timeout.setdefault(None, 300)
+    if memory_budget is None:
+        try:
+            memory_budget = int(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') * .8) // 1024 // 1024
+        except (ValueError, OSError, AttributeError):
+            memory_budget = 0
+
+    page_filter = {}
+    if complexity_range:
+        page_filter['complexity'] = complexity_range
+    if complexity_bucket:
+        page_filter['buckets'] = list(complexity_bucket)
+    if size_range:
+        page_filter['size'] = (size_range[0] * 1024, size_range[1] * 1024)
 
     print(dataset)
     from extraction_benchmark import extract
-    extract.extract(model, chosen_models, dataset, skip_existing, parallelism, verbose)
+    extract.extract(model, chosen_models, dataset, skip_existing, parallelism, chunk_size, not no_cache,
+                    page_timeout, max_rss, max_pages_per_worker, quarantine_after, batch_size, model_option,
+                    inline_members, memory_budget or None, page_filter, verbose)
 
 
 @click.command()
 @click.option('-d', '--dataset', type=click.Choice(['all', *DATASETS]), default=['all'], multiple=True)
 @click.option('-x', '--exclude-dataset', type=click.Choice(DATASETS), default=[], multiple=True)
-def convert_datasets(dataset, exclude_dataset):
+@click.option('-p', '--parallelism', help='Number of threads to use', default=os.cpu_count())
+@click.option('--no-pack', is_flag=True,
+              help='Write one HTML file per page instead of packed datasets (replaces existing packed datasets)')
+@click.option('--compress', is_flag=True, help='Compress the pages of packed datasets')
+@click.option('--pack-existing', is_flag=True,
+              help='Only pack existing per-page HTML files of the combined datasets (e.g., from combined.tar.xz)')
+def convert_datasets(dataset, exclude_dataset, parallelism, no_pack, compress, pack_existing):
     """
     Combine raw datasets and convert them to a line-delimieted JSON format.
     """
 
+    if pack_existing:
+        if 'all' in dataset:
+            dataset = sorted(d for d in DATASETS if d not in exclude_dataset)
+        from extraction_benchmark import extract
+        extract.pack_html(dataset, compress, parallelism)
+        return
+
     if not os.path.isdir(DATASET_RAW_PATH):
         raise click.UsageError('Raw datasets not found. '
                                'Make sure that all datasets have been extracted correctly to a folder "datasets/raw" '
@@ -120,7 +213,7 @@ def convert_datasets(dataset, exclude_dataset):
         dataset = sorted(d for d in DATASETS if d not in exclude_dataset)
 
     from extraction_benchmark import extract
-    page_ids = extract.extract_ground_truth(dataset)
-    extract.extract_raw_html(dataset, page_ids)
+    page_ids = extract.extract_ground_truth(dataset, parallelism)
+    extract.extract_raw_html(dataset, page_ids, parallelism, not no_pack, compress)
 
 
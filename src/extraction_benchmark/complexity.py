@@ -29,7 +29,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from resiliparse.parse.html import HTMLTree
 
-from extraction_benchmark.dataset_readers import read_datasets
+from extraction_benchmark import archives
+from extraction_benchmark.dataset_readers import get_page_catalog, read_datasets, update_page_catalog
 from extraction_benchmark.globals import *
 from extraction_benchmark import plt
 from extraction_benchmark.util import tokenize_words
@@ -39,6 +40,8 @@ def calculate(datasets):
     """
     Calculate page complexities for pages in the given datasets based on the ground truth.
 
+    Token counts are taken from the page catalog, which is updated first if necessary.
+
     :param datasets: list of dataset names
     """
     complexity_total = pd.DataFrame(columns=['complexity'])
@@ -49,28 +52,14 @@ def calculate(datasets):
 
     with click.progressbar(datasets, label='Calculating page complexity scores') as ds_progress:
         for ds in ds_progress:
-            tokens_truth = {}
-            tokens_src = {}
-            for h, truth in read_datasets([ds], True):
-                tokens_truth[h] = len(tokenize_words(truth['plaintext']))
-            for h, src in read_datasets([ds], False):
-                if h not in tokens_truth:
-                    continue
-                # Extract all text tokens except script / style
-                tree = HTMLTree.parse(src['html'])
-                for e in tree.body.query_selector_all('script, style'):
-                    e.decompose()
-                tokens_src[h] = len(tokenize_words(tree.body.text))
-
-            tokens_truth = pd.DataFrame.from_dict(tokens_truth, orient='index')
-            tokens_src = pd.DataFrame.from_dict(tokens_src, orient='index')
+            update_page_catalog([ds])
+            complexity = pd.DataFrame.from_dict(get_page_catalog().complexities(ds), orient='index',
+                                                columns=['complexity'], dtype=float)
 
             out_path_ds = os.path.join(METRICS_COMPLEXITY_PATH, ds)
             os.makedirs(out_path_ds, exist_ok=True)
 
-            complexity = 1 - (tokens_truth / tokens_src).clip(lower=0, upper=1)
             complexity.index.name = 'hash_key'
-            complexity.columns = ['complexity']
             complexity.to_csv(os.path.join(out_path_ds, f'{ds}_complexity.csv'))
             complexity['dataset'] = ds
             quantiles = complexity['complexity'].quantile(quantile_labels)
@@ -157,11 +146,11 @@ def _load_html_features(dataset):
     df_complexity = pd.DataFrame()
     with click.progressbar(dataset, label='Loading datasets') as progress:
         for ds in progress:
-            df_tmp = pd.read_csv(os.path.join(HTML_FEATURES_PATH, ds, f'{ds}_html_features.csv'))
+            df_tmp = archives.read_csv(os.path.join(HTML_FEATURES_PATH, ds, f'{ds}_html_features.csv'))
             df_tmp['dataset'] = ds
             df_features = pd.concat([df_features, df_tmp], ignore_index=True)
 
-            df_tmp = pd.read_csv(os.path.join(METRICS_COMPLEXITY_PATH, ds, f'{ds}_complexity.csv'))
+            df_tmp = archives.read_csv(os.path.join(METRICS_COMPLEXITY_PATH, ds, f'{ds}_complexity.csv'))
             df_tmp['dataset'] = ds
             df_complexity = pd.concat([df_complexity, df_tmp], ignore_index=True)
 
@@ -187,9 +176,9 @@ def _reduce_dim_2d(df, label_column):
 
 def _binarize_complexity(values, quantile):
     p = os.path.join(METRICS_COMPLEXITY_PATH, 'complexity_quantiles.csv')
-    if not os.path.isfile(p):
+    if not archives.isfile(p):
         raise click.FileError(p, 'Please calculate page complexity quantiles first.')
-    quantiles = pd.read_csv(p, index_col=0)
+    quantiles = archives.read_csv(p, index_col=0)
 
     return [int(x >= quantiles.loc[float(quantile)]['complexity']) for x in values]
 
@@ -260,10 +249,10 @@ def visualize_clusters(quantile):
     """
 
     in_path = os.path.join(METRICS_COMPLEXITY_PATH, 'complexity_clusters.csv')
-    if not os.path.isfile(in_path):
+    if not archives.isfile(in_path):
         raise click.FileError(in_path, 'Please calculate page complexities first.')
 
-    df = pd.read_csv(in_path, index_col=['hash_key', 'dataset'])
+    df = archives.read_csv(in_path, index_col=['hash_key', 'dataset'])
     df['complexity'] = _binarize_complexity(df['complexity'], quantile)
     df_2d = _reduce_dim_2d(df, 'kmeans_label')
 
@@ -284,10 +273,10 @@ def visualize_classes():
     """
 
     in_path = os.path.join(METRICS_COMPLEXITY_PATH, 'complexity_classes.csv')
-    if not os.path.isfile(in_path):
+    if not archives.isfile(in_path):
         raise click.FileError(in_path, 'Please calculate page complexities first.')
 
-    df = pd.read_csv(in_path, index_col=['hash_key', 'dataset'])
+    df = archives.read_csv(in_path, index_col=['hash_key', 'dataset'])
     df_2d = _reduce_dim_2d(df, 'logreg_label')
 
     _, (ax1, ax2) = plt.subplots(1, 2, figsize=(5, 2.5))
@@ -323,9 +312,9 @@ def visualize_datasets(datasets, low_quantile='0.25', high_quantile='0.75'):
     with click.progressbar(datasets, label='Loading datasets') as progress:
         for ds in progress:
             path = os.path.join(METRICS_COMPLEXITY_PATH, ds, f'{ds}_complexity.csv')
-            if not os.path.isfile(path):
+            if not archives.isfile(path):
                 continue
-            complexities.append(pd.read_csv(path)['complexity'])
+            complexities.append(archives.read_csv(path)['complexity'])
 
     # Sort by median
     complexities, datasets = zip(*sorted(zip(complexities, datasets), key=lambda x: x[0].median(), reverse=True))
@@ -348,7 +337,8 @@ def visualize_datasets(datasets, low_quantile='0.25', high_quantile='0.75'):
     plt.tight_layout()
     plt.savefig(os.path.join(METRICS_COMPLEXITY_PATH, f'complexity.pdf'))
 
-    complexity_quantiles = pd.read_csv(os.path.join(METRICS_COMPLEXITY_PATH, 'complexity_quantiles.csv'), index_col=0)
+    complexity_quantiles = archives.read_csv(os.path.join(METRICS_COMPLEXITY_PATH, 'complexity_quantiles.csv'),
+                                             index_col=0)
     quantile_threshold_low = complexity_quantiles.loc[float(low_quantile)]['complexity']
     quantile_threshold_high = complexity_quantiles.loc[float(high_quantile)]['complexity']
 
@@ -19,6 +19,7 @@ import gzip
 import hashlib
 from itertools import chain
 import json
+from multiprocessing import get_context
 import os
 import re
 from typing import Any, Dict, Iterable, Optional, Tuple
@@ -26,9 +27,69 @@ from typing import Any, Dict, Iterable, Optional, Tuple
 from resiliparse.parse import bytes_to_str, detect_encoding
 from resiliparse.parse.html import HTMLTree, NodeType
 
+from extraction_benchmark import archives
+from extraction_benchmark.file_manifest import FileManifest
 from extraction_benchmark.globals import DATASETS
+from extraction_benchmark.packed_dataset import PackedDataset
+from extraction_benchmark.page_catalog import PageCatalog, html_entry, truth_entry
 from extraction_benchmark.paths import *
 
+# Manifest of raw file hashes and encodings of the current process
+_MANIFEST = None
+
+
+def _get_manifest():
+    global _MANIFEST
+    if _MANIFEST is None:
+        _MANIFEST = FileManifest()
+    return _MANIFEST
+
+
+# Page catalog of the current process
+_PAGE_CATALOG = None
+
+
+def get_page_catalog():
+    """
+    :return: :class:`PageCatalog` of the current process
+    """
+    global _PAGE_CATALOG
+    if _PAGE_CATALOG is None:
+        _PAGE_CATALOG = PageCatalog()
+    return _PAGE_CATALOG
+
+
+# Open packed datasets of the current process and the modification times of their indexes
+_PACKED_DATASETS = {}
+
+
+def _get_packed_dataset(dataset):
+    """
+    Get the packed version of a combined dataset, which is kept open for subsequent reads.
+
+    :param dataset: dataset name
+    :return: :class:`PackedDataset` or ``None`` if the dataset has not been packed
+    """
+    if not PackedDataset.exists(dataset):
+        return None
+    mtime = os.stat(os.path.join(DATASET_COMBINED_PACKED_PATH, dataset + '.index.json')).st_mtime_ns
+    if dataset in _PACKED_DATASETS and _PACKED_DATASETS[dataset][1] != mtime:
+        _PACKED_DATASETS.pop(dataset)[0].close()
+    if dataset not in _PACKED_DATASETS:
+        _PACKED_DATASETS[dataset] = (PackedDataset(dataset), mtime)
+    return _PACKED_DATASETS[dataset][0]
+
+
+def remove_packed_dataset(dataset):
+    """
+    Close and delete the packed version of a combined dataset, so that its per-page HTML files are read instead.
+
+    :param dataset: dataset name
+    """
+    if dataset in _PACKED_DATASETS:
+        _PACKED_DATASETS.pop(dataset)[0].close()
+    PackedDataset.remove(dataset)
+
 
 class DatasetReader(ABC):
     """Abstract dataset reader class."""
@@ -51,7 +112,6 @@ class DatasetReader(ABC):
     def __len__(self):
         return self.dataset_size()
 
-    @abstractmethod
     def read(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
         """
         Return an iterable over the items in the dataset.
@@ -59,8 +119,64 @@ class DatasetReader(ABC):
         Returned items should be tuples with the case / page ID and the case / page data as a dict.
         The dicts should contain at least an ``"html"`` or ``"plaintext"`` key, depending on whether
         the iterated dataset is a raw HTML or a ground truth page.
+
+        The default implementation reads the work items returned by :meth:`list_items` one by one
+        with :meth:`read_item`.
         """
-        pass
+        for item in self.list_items():
+            yield self.read_item(item)
+
+    def list_items(self) -> Optional[Iterable[Any]]:
+        """
+        Return a list of independent work items (usually input file names) that make up the dataset.
+
+        :return: list of picklable work items or ``None`` if the dataset cannot be split into work items
+        """
+        return None
+
+    def read_item(self, item) -> Tuple[str, Dict[str, Any]]:
+        """
+        Read a single work item returned by :meth:`list_items`.
+
+        :param item: work item
+        :return: tuple of case / page ID and case / page data
+        """
+        raise NotImplementedError
+
+    def read_parallel(self, parallelism=1, chunksize=4, catalog_entries=False) -> Iterable[Tuple]:
+        """
+        Return an iterable over the items in the dataset, whose work items are read by several processes.
+
+        Items are returned in the same order as by :meth:`read`. Datasets that cannot be split into
+        work items are read sequentially.
+
+        :param parallelism: number of parallel processes
+        :param chunksize: number of work items sent to a process at once
+        :param catalog_entries: also return the page catalog entry of each item (see :meth:`catalog_entry`),
+                                which is computed by the reading processes
+        :return: iterable of ``(page_id, data)`` tuples or ``(page_id, data, catalog_entry)`` tuples
+        """
+        items = self.list_items() if parallelism > 1 else None
+        if items is None:
+            for page_id, data in self.read():
+                yield (page_id, data, self.catalog_entry(page_id, data)) if catalog_entries else (page_id, data)
+            return
+
+        with get_context('spawn').Pool(processes=parallelism, initializer=_init_worker_reader,
+                                       initargs=(type(self), self.is_truth, catalog_entries)) as pool:
+            yield from pool.imap(_read_worker_item, items, chunksize=chunksize)
+
+    def catalog_entry(self, page_id, data):
+        """
+        Compute the page catalog entry of an item returned by :meth:`read`.
+
+        :param page_id: page ID
+        :param data: page data
+        :return: entry for :meth:`PageCatalog.put_truth` or :meth:`PageCatalog.put_html`
+        """
+        if self.is_truth:
+            return truth_entry(page_id, data)
+        return html_entry(page_id, data.get('html') or '')
 
     @abstractmethod
     def dataset_size(self) -> Optional[int]:
@@ -88,11 +204,48 @@ class DatasetReader(ABC):
         """
         Return SHA-256 hash of a file that can be used as a page ID.
 
+        GZip-compressed files are hashed after decompression.
+
         :param file: input file name
         :return: hash of the file as hex string
         """
-        with open(file, 'rb') as f:
-            return cls._hash(f.read())
+        return cls._file_info(file)[0]
+
+    @classmethod
+    def _file_info(cls, path, file_bytes=None):
+        """
+        Return the SHA-256 hash and the detected encoding of a file.
+
+        Both are looked up in the raw file manifest and are computed and added to the manifest only if the file
+        is unknown or has changed since it was last recorded.
+
+        :param path: file path
+        :param file_bytes: (decompressed) file contents if they have been read already
+        :return: tuple of hash as hex string and encoding name
+        """
+        manifest = _get_manifest()
+        stat = os.stat(path)
+        info = manifest.get(path, stat)
+        if info is None:
+            if file_bytes is None:
+                file_bytes = cls._read_bytes(path)
+            info = cls._hash(file_bytes), detect_encoding(file_bytes, max_len=100000, html5_compatible=False) or 'utf-8'
+            manifest.put(path, stat, *info)
+        return info
+
+    @staticmethod
+    def _read_bytes(path):
+        """
+        Read the contents of a file and decompress them if the file is GZip-compressed.
+
+        :param path: file path
+        :return: file contents as bytes
+        """
+        with open(path, 'rb') as f:
+            file_bytes = f.read()
+        if path.endswith('.gz'):
+            file_bytes = gzip.decompress(file_bytes)
+        return file_bytes
 
     def _build_dict(self, source_dataset, source_case, content, **kwargs) -> Dict[str, Any]:
         """
@@ -111,28 +264,37 @@ class DatasetReader(ABC):
         }
         return d
 
-    @staticmethod
-    def _read_file(path, fixed_encoding=None):
+    @classmethod
+    def _read_file(cls, path, fixed_encoding=None):
         """
         Helper method for reading a file, detecting its encoding and returning the contents as UTF-8 string.
         If the input file is GZip-compressed, it will be decompressed automatically.
 
+        Unless a fixed encoding is given, the file's hash and encoding are recorded in the raw file manifest,
+        so that subsequent calls to :meth:`_file_hash` do not need to read the file again.
+
         :param path: file path
         :param fixed_encoding: use this fixed encoding instead of trying to detect if from the file
         :return: UTF-8 string of file contents
         """
-        with open(path, 'rb') as f:
-            file_bytes = f.read()
-            if path.endswith('.gz'):
-                file_bytes = gzip.decompress(file_bytes)
-            if fixed_encoding:
-                enc = fixed_encoding
-            else:
-                enc = detect_encoding(file_bytes, max_len=100000, html5_compatible=False) or 'utf-8'
-            return bytes_to_str(file_bytes, encoding=enc, fallback_encodings=['utf-8', 'cp1252'])
+        file_bytes = cls._read_bytes(path)
+        return cls._decode(file_bytes, fixed_encoding or cls._file_info(path, file_bytes)[1])
+
+    @staticmethod
+    def _decode(file_bytes, encoding):
+        """
+        Decode file contents.
+
+        :param file_bytes: file contents
+        :param encoding: encoding to try first
+        :return: decoded string
+        """
+        return bytes_to_str(file_bytes, encoding=encoding, fallback_encodings=['utf-8', 'cp1252'])
 
 
 class CleanEvalReader(DatasetReader):
+    _TEXT_TAG_RE = re.compile(r'(?:^<text [^>]+>\s*|\s*</text>$)', flags=re.MULTILINE)
+
     def __init__(self, ground_truth):
         super().__init__(ground_truth)
 
@@ -140,29 +302,28 @@ class CleanEvalReader(DatasetReader):
         self.dataset_path = os.path.join(DATASET_RAW_PATH, self.dataset_name, 'orig')
         self.dataset_path_truth = os.path.join(DATASET_RAW_PATH, self.dataset_name, 'clean')
 
-    def read(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    def list_items(self):
+        return os.listdir(self.dataset_path_truth if self.is_truth else self.dataset_path)
+
+    def read_item(self, file):
         read_path = self.dataset_path_truth if self.is_truth else self.dataset_path
+        abs_path = os.path.join(read_path, file)
+        content = self._read_file(abs_path)
+        url = None
+        if self.is_truth:
+            url = re.search(r'^\s*URL: (https?://.+)', content)
+            if url:
+                url = url.group(1)
+            content = HTMLTree.parse(content).body.text
+            content = re.sub(r'\n +', '\n', content)
+            content = re.sub(r'^\s*URL:[^\n]+\s*', '', content)    # Strip URL line
 
-        text_tag_re = re.compile(r'(?:^<text [^>]+>\s*|\s*</text>$)', flags=re.MULTILINE)
-
-        for file in os.listdir(read_path):
-            abs_path = os.path.join(read_path, file)
-            content = self._read_file(abs_path)
-            url = None
-            if self.is_truth:
-                url = re.search(r'^\s*URL: (https?://.+)', content)
-                if url:
-                    url = url.group(1)
-                content = HTMLTree.parse(content).body.text
-                content = re.sub(r'\n +', '\n', content)
-                content = re.sub(r'^\s*URL:[^\n]+\s*', '', content)    # Strip URL line
-
-            if self.is_truth:
-                abs_path = os.path.join(self.dataset_path, os.path.splitext(file)[0] + '.html')
-            else:
-                content = text_tag_re.sub('', content)
-            source = os.path.splitext(file)[0]
-            yield self._file_hash(abs_path), self._build_dict(self.dataset_name, source, content, url=url)
+        if self.is_truth:
+            abs_path = os.path.join(self.dataset_path, os.path.splitext(file)[0] + '.html')
+        else:
+            content = self._TEXT_TAG_RE.sub('', content)
+        source = os.path.splitext(file)[0]
+        return self._file_hash(abs_path), self._build_dict(self.dataset_name, source, content, url=url)
 
     def dataset_size(self) -> Optional[int]:
         return len(glob.glob(os.path.join(DATASET_RAW_PATH, self.dataset_name, 'clean', '*.txt')))
@@ -180,19 +341,21 @@ class CleanPortalEvalReader(CleanEvalReader):
 
 
 class DragnetReader(DatasetReader):
-    def read(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
-        dataset_path = os.path.join(DATASET_RAW_PATH, 'dragnet', 'HTML')
-        dataset_path_truth = os.path.join(DATASET_RAW_PATH, 'dragnet', 'corrected', 'Corrected')
-        read_path = dataset_path_truth if self.is_truth else dataset_path
-
-        for file in os.listdir(read_path):
-            abs_path = os.path.join(read_path, file)
-            content = self._read_file(abs_path)
-            if self.is_truth:
-                file = os.path.splitext(os.path.splitext(file)[0])[0]
-                abs_path = os.path.join(dataset_path, file)
-            source = os.path.splitext(file)[0]
-            yield self._file_hash(abs_path), self._build_dict('dragnet', source, content)
+    dataset_path = os.path.join(DATASET_RAW_PATH, 'dragnet', 'HTML')
+    dataset_path_truth = os.path.join(DATASET_RAW_PATH, 'dragnet', 'corrected', 'Corrected')
+
+    def list_items(self):
+        return os.listdir(self.dataset_path_truth if self.is_truth else self.dataset_path)
+
+    def read_item(self, file):
+        read_path = self.dataset_path_truth if self.is_truth else self.dataset_path
+        abs_path = os.path.join(read_path, file)
+        content = self._read_file(abs_path)
+        if self.is_truth:
+            file = os.path.splitext(os.path.splitext(file)[0])[0]
+            abs_path = os.path.join(self.dataset_path, file)
+        source = os.path.splitext(file)[0]
+        return self._file_hash(abs_path), self._build_dict('dragnet', source, content)
 
     def dataset_size(self) -> Optional[int]:
         return len(glob.glob(os.path.join(DATASET_RAW_PATH, 'dragnet', 'corrected', 'Corrected', '*.txt')))
@@ -203,17 +366,21 @@ class CETDReader(DatasetReader):
         super().__init__(ground_truth)
         self.verticals = ['arstechnica', 'BBC', 'Chaos', 'nytimes', 'wiki', 'YAHOO!']
 
-    def read(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
-        dataset_path = os.path.join(DATASET_RAW_PATH, 'cetd')
-        for vertical in self.verticals:
-            sub_path = os.path.join(dataset_path, vertical, 'gold' if self.is_truth else 'original')
-            for file in os.listdir(sub_path):
-                abs_path = os.path.join(sub_path, file)
-                content = self._read_file(abs_path)
-                if self.is_truth:
-                    abs_path = os.path.join(dataset_path, vertical, 'original', os.path.splitext(file)[0] + '.htm')
-                source = vertical + '_' + os.path.splitext(file)[0]
-                yield self._file_hash(abs_path), self._build_dict('cetd', source, content)
+    dataset_path = os.path.join(DATASET_RAW_PATH, 'cetd')
+
+    def list_items(self):
+        return [(vertical, file) for vertical in self.verticals
+                for file in os.listdir(os.path.join(self.dataset_path, vertical,
+                                                    'gold' if self.is_truth else 'original'))]
+
+    def read_item(self, item):
+        vertical, file = item
+        abs_path = os.path.join(self.dataset_path, vertical, 'gold' if self.is_truth else 'original', file)
+        content = self._read_file(abs_path)
+        if self.is_truth:
+            abs_path = os.path.join(self.dataset_path, vertical, 'original', os.path.splitext(file)[0] + '.htm')
+        source = vertical + '_' + os.path.splitext(file)[0]
+        return self._file_hash(abs_path), self._build_dict('cetd', source, content)
 
     def dataset_size(self) -> Optional[int]:
         return sum([len(glob.glob(os.path.join(DATASET_RAW_PATH, 'cetd', v, 'gold', '*.txt')))
@@ -221,60 +388,67 @@ class CETDReader(DatasetReader):
 
 
 class ReadabilityReader(DatasetReader):
-    def read(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
-        dataset_path = os.path.join(DATASET_RAW_PATH, 'readability', 'test-pages')
-        for case_dir in os.listdir(dataset_path):
-            sub_path = 'expected.html' if self.is_truth else 'source.html'
-            abs_path = os.path.join(dataset_path, os.path.join(case_dir, sub_path))
-            content = self._read_file(abs_path)
-            if self.is_truth:
-                content = HTMLTree.parse(content).body.text
-                abs_path = os.path.join(dataset_path, os.path.join(case_dir, 'source.html'))
-            yield self._file_hash(abs_path), self._build_dict('readability', case_dir, content)
+    dataset_path = os.path.join(DATASET_RAW_PATH, 'readability', 'test-pages')
+
+    def list_items(self):
+        return os.listdir(self.dataset_path)
+
+    def read_item(self, case_dir):
+        sub_path = 'expected.html' if self.is_truth else 'source.html'
+        abs_path = os.path.join(self.dataset_path, os.path.join(case_dir, sub_path))
+        content = self._read_file(abs_path)
+        if self.is_truth:
+            content = HTMLTree.parse(content).body.text
+            abs_path = os.path.join(self.dataset_path, os.path.join(case_dir, 'source.html'))
+        return self._file_hash(abs_path), self._build_dict('readability', case_dir, content)
 
     def dataset_size(self) -> Optional[int]:
         return len(glob.glob(os.path.join(DATASET_RAW_PATH, 'readability', 'test-pages', '*', 'expected.html')))
 
 
 class ScrapingHubReader(DatasetReader):
-    def read(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
-        dataset_path = os.path.join(DATASET_RAW_PATH, 'scrapinghub')
+    dataset_path = os.path.join(DATASET_RAW_PATH, 'scrapinghub')
 
+    def list_items(self):
         if self.is_truth:
-            truth_json = json.load(open(os.path.join(dataset_path, 'ground-truth.json'), 'r'))
-            for k, v in truth_json.items():
-                # Instead of using provided hash, re-calculate hash from original HTML file for consistency
-                with gzip.GzipFile(os.path.join(dataset_path, 'html', f'{k}.html.gz'), 'r') as f:
-                    file_hash = self._hash(f.read())
-                yield file_hash, self._build_dict('scrapinghub', k, v['articleBody'], url=v['url'])
-            return
+            with open(os.path.join(self.dataset_path, 'ground-truth.json'), 'r') as f:
+                return list(json.load(f).items())
+        return os.listdir(os.path.join(self.dataset_path, 'html'))
 
-        dataset_path = os.path.join(dataset_path, 'html')
-        for file in os.listdir(dataset_path):
-            abs_path = os.path.join(dataset_path, file)
-            hash_id = os.path.splitext(os.path.splitext(file)[0])[0]
-            with gzip.GzipFile(abs_path, 'r') as f:
-                file_hash = self._hash(f.read())
-            yield file_hash, self._build_dict('scrapinghub', hash_id, self._read_file(abs_path))
+    def read_item(self, item):
+        if self.is_truth:
+            k, v = item
+            # Instead of using provided hash, re-calculate hash from original HTML file for consistency
+            file_hash = self._file_hash(os.path.join(self.dataset_path, 'html', f'{k}.html.gz'))
+            return file_hash, self._build_dict('scrapinghub', k, v['articleBody'], url=v['url'])
+
+        abs_path = os.path.join(self.dataset_path, 'html', item)
+        hash_id = os.path.splitext(os.path.splitext(item)[0])[0]
+        content = self._read_file(abs_path)
+        return self._file_hash(abs_path), self._build_dict('scrapinghub', hash_id, content)
 
     def dataset_size(self) -> Optional[int]:
         return len(json.load(open(os.path.join(DATASET_RAW_PATH, 'scrapinghub', 'ground-truth.json'), 'r')))
 
 
 class L3SGN1Reader(DatasetReader):
-    def read(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
-        dataset_path = os.path.join(DATASET_RAW_PATH, 'l3s-gn1', 'original')
-        dataset_path_truth = os.path.join(DATASET_RAW_PATH, 'l3s-gn1', 'annotated')
-        read_path = dataset_path_truth if self.is_truth else dataset_path
-
-        for file in os.listdir(read_path):
-            abs_path = os.path.join(read_path, file)
-            content = self._read_file(abs_path)
-            if self.is_truth:
-                abs_path = os.path.join(dataset_path, file)
-                content = self._extract_with_css_selector(content, '.x-nc-sel1, .x-nc-sel2, .x-nc-sel3')
-            source = os.path.splitext(file)[0]
-            yield self._file_hash(abs_path), self._build_dict('l3s-gn1', source, content)
+    dataset_name = 'l3s-gn1'
+    dataset_path = os.path.join(DATASET_RAW_PATH, 'l3s-gn1', 'original')
+    dataset_path_truth = os.path.join(DATASET_RAW_PATH, 'l3s-gn1', 'annotated')
+    truth_selector = '.x-nc-sel1, .x-nc-sel2, .x-nc-sel3'
+
+    def list_items(self):
+        return os.listdir(self.dataset_path_truth if self.is_truth else self.dataset_path)
+
+    def read_item(self, file):
+        read_path = self.dataset_path_truth if self.is_truth else self.dataset_path
+        abs_path = os.path.join(read_path, file)
+        content = self._read_file(abs_path)
+        if self.is_truth:
+            abs_path = os.path.join(self.dataset_path, file)
+            content = self._extract_with_css_selector(content, self.truth_selector)
+        source = os.path.splitext(file)[0]
+        return self._file_hash(abs_path), self._build_dict(self.dataset_name, source, content)
 
     def dataset_size(self) -> Optional[int]:
         return len(glob.glob(os.path.join(DATASET_RAW_PATH, 'l3s-gn1', 'annotated', '*.html')))
@@ -299,60 +473,128 @@ class L3SGN1Reader(DatasetReader):
 
 
 class GoogleTrends2017Reader(L3SGN1Reader):
-    def read(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
-        dataset_path = os.path.join(DATASET_RAW_PATH, 'google-trends-2017', 'raw_html')
-        dataset_path_truth = os.path.join(DATASET_RAW_PATH, 'google-trends-2017', 'prepared_html')
-        read_path = dataset_path_truth if self.is_truth else dataset_path
-
-        for file in os.listdir(read_path):
-            abs_path = os.path.join(read_path, file)
-            content = self._read_file(abs_path)
-            if self.is_truth:
-                abs_path = os.path.join(dataset_path, file)
-                content = self._extract_with_css_selector(content, '[__boilernet_label="1"]')
-            source = os.path.splitext(file)[0]
-            yield self._file_hash(abs_path), self._build_dict('google-trends-2017', source, content)
+    dataset_name = 'google-trends-2017'
+    dataset_path = os.path.join(DATASET_RAW_PATH, 'google-trends-2017', 'raw_html')
+    dataset_path_truth = os.path.join(DATASET_RAW_PATH, 'google-trends-2017', 'prepared_html')
+    truth_selector = '[__boilernet_label="1"]'
 
     def dataset_size(self) -> Optional[int]:
         return len(glob.glob(os.path.join(DATASET_RAW_PATH, 'google-trends-2017', 'prepared_html', '*.html')))
 
 class CustomReader(DatasetReader):
+    def __init__(self, ground_truth, page_ids=None):
+        super().__init__(ground_truth)
+        self.page_ids = page_ids
+
+    def _filenames(self):
+        if self.page_ids is not None:
+            return [p + '.html' for p in self.page_ids]
+        if not os.path.isdir(CUSTOM_HTML_PROCESSED_PATH):
+            return []
+        return sorted(f for f in os.listdir(CUSTOM_HTML_PROCESSED_PATH) if f.endswith('.html'))
+
     def read(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
-        dataset_path = CUSTOM_HTML_PROCESSED_PATH
-        for filename in os.listdir(dataset_path):
-            abs_path = os.path.join(dataset_path, filename)
+        for filename in self._filenames():
+            abs_path = os.path.join(CUSTOM_HTML_PROCESSED_PATH, filename)
             page_id = os.path.splitext(os.path.basename(filename))[0]
             yield page_id, self._build_dict('custom', page_id, self._read_file(abs_path, 'utf-8'))
-        return 
-    
+
     def dataset_size(self) -> Optional[int]:
-        return super().dataset_size()
+        return len(self._filenames())
 
 class CombinedDatasetReader(DatasetReader):
-    def __init__(self, ground_truth, read_subsets=None):
+    def __init__(self, ground_truth, read_subsets=None, page_ids=None):
         super().__init__(ground_truth)
         self.subsets = sorted(read_subsets) if read_subsets else sorted(DATASETS)
+        self.page_ids = page_ids
 
     def read(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
         if self.is_truth:
+            page_ids = set(self.page_ids) if self.page_ids is not None else None
             for ds in self.subsets:
-                with open(os.path.join(DATASET_COMBINED_TRUTH_PATH, f'{ds}.jsonl')) as f:
+                with archives.open_file(os.path.join(DATASET_COMBINED_TRUTH_PATH, f'{ds}.jsonl')) as f:
                     for line in f:
                         j = json.loads(line)
+                        if page_ids is not None and j['page_id'] not in page_ids:
+                            continue
                         yield j['page_id'], {k: v for k, v in j.items() if k != 'page_id'}
             return
 
-        for ds in self.subsets:
-            for filename in glob.glob(os.path.join(DATASET_COMBINED_HTML_PATH, ds, '*.html')):
-                page_id = os.path.splitext(os.path.basename(filename))[0]
-                yield page_id, self._build_dict(ds, page_id, self._read_file(filename, 'utf-8'))
+        if self.page_ids is None:
+            for ds in self.subsets:
+                for page_id, html in self._read_html(ds, None):
+                    yield page_id, self._build_dict(ds, page_id, html)
+            return
+
+        subset_pages = {ds: self._existing_page_ids(ds, self.page_ids) for ds in self.subsets}
+        missing = set(self.page_ids).difference(*subset_pages.values())
+        for i, ds in enumerate(self.subsets):
+            # Keep the order of requested pages, which the extraction scheduler relies on. Pages that exist in
+            # none of the subsets are returned with an error in place of the first subset's pages, so that
+            # there is exactly one record per requested page.
+            existing = set(subset_pages[ds])
+            pages = self._read_html(ds, subset_pages[ds])
+            for page_id in self.page_ids:
+                if page_id in existing:
+                    yield page_id, self._build_dict(ds, page_id, next(pages)[1])
+                elif i == 0 and page_id in missing:
+                    yield page_id, self._build_dict(ds, page_id, '', error='missing')
+
+    @staticmethod
+    def _existing_page_ids(dataset, page_ids):
+        """Filter a list of page IDs for the HTML pages that exist in a dataset."""
+        packed = _get_packed_dataset(dataset)
+        if packed is not None:
+            return [p for p in page_ids if p in packed]
+        html_path = os.path.join(DATASET_COMBINED_HTML_PATH, dataset)
+        return [p for p in page_ids if archives.isfile(os.path.join(html_path, p + '.html'))]
+
+    def _read_html(self, dataset, page_ids):
+        """
+        Read the HTML pages of a dataset from its packed version, from disk, or from the combined dataset archive.
+
+        :param dataset: dataset name
+        :param page_ids: list of existing page IDs to read in this order (``None`` for all pages)
+        :return: iterable of ``(page_id, html)`` tuples
+        """
+        packed = _get_packed_dataset(dataset)
+        if packed is not None:
+            yield from packed.items(page_ids)
+            return
+
+        html_path = os.path.join(DATASET_COMBINED_HTML_PATH, dataset)
+        if page_ids is not None:
+            filenames = [os.path.join(html_path, p + '.html') for p in page_ids]
+        else:
+            filenames = [os.path.join(html_path, f) for f in archives.listdir(html_path) if f.endswith('.html')]
+        for filename, file_bytes in archives.read_files(filenames, keep_order=page_ids is not None):
+            yield os.path.splitext(os.path.basename(filename))[0], self._decode(file_bytes, 'utf-8')
 
     def dataset_size(self) -> Optional[int]:
+        if self.page_ids is not None:
+            return len(self.page_ids)
         # Count lines in all truth files
-        return sum(chain(*((1 for _ in open(
+        return sum(chain(*((1 for _ in archives.open_file(
             os.path.join(DATASET_COMBINED_TRUTH_PATH, f'{ds}.jsonl'), 'r')) for ds in self.subsets)))
 
 
+_WORKER_READER = None
+_WORKER_CATALOG_ENTRIES = False
+
+
+def _init_worker_reader(reader_cls, ground_truth, catalog_entries=False):
+    global _WORKER_READER, _WORKER_CATALOG_ENTRIES
+    _WORKER_READER = reader_cls(ground_truth)
+    _WORKER_CATALOG_ENTRIES = catalog_entries
+
+
+def _read_worker_item(item):
+    page_id, data = _WORKER_READER.read_item(item)
+    if _WORKER_CATALOG_ENTRIES:
+        return page_id, data, _WORKER_READER.catalog_entry(page_id, data)
+    return page_id, data
+
+
 def read_raw_dataset(dataset, ground_truth):
     """Read raw (unprocessed datasets)."""
     match dataset:
@@ -378,13 +620,98 @@ def read_raw_dataset(dataset, ground_truth):
             raise ValueError(f'Invalid dataset: {dataset}')
 
 
-def read_datasets(datasets: Iterable[str], ground_truth):
-    """Read (subsets of) processed and combined datasets."""
-    if not os.path.isdir(DATASET_COMBINED_PATH):
+def page_catalog_signatures(dataset):
+    """
+    Get the signatures of the sources of the page catalog entries of a dataset.
+
+    :param dataset: dataset name
+    :return: dict with the signatures of the ``"truth"`` file (not for custom pages) and the ``"html"`` source
+             (packed dataset index or HTML directory)
+    """
+    if dataset == 'custom':
+        return {'html': archives.file_signature(CUSTOM_HTML_PROCESSED_PATH)}
+    if PackedDataset.exists(dataset):
+        html = archives.file_signature(os.path.join(DATASET_COMBINED_PACKED_PATH, dataset + '.index.json'))
+    else:
+        html = archives.file_signature(os.path.join(DATASET_COMBINED_HTML_PATH, dataset))
+    return {
+        'truth': archives.file_signature(os.path.join(DATASET_COMBINED_TRUTH_PATH, f'{dataset}.jsonl')),
+        'html': html,
+    }
+
+
+def update_page_catalog(datasets: Iterable[str]):
+    """
+    Bring the page catalog entries of processed datasets up to date.
+
+    Entries are normally recorded while converting the datasets. Entries of datasets that have been changed or
+    extracted from an archive since are rebuilt from the ground truth and HTML pages.
+
+    :param datasets: list of dataset names
+    """
+    catalog = get_page_catalog()
+    for ds in datasets:
+        signatures = page_catalog_signatures(ds)
+        if signatures.get('truth') is not None and not catalog.is_current(ds, 'truth', signatures['truth']):
+            catalog.put_truth(ds, [truth_entry(p, t) for p, t in read_datasets([ds], True)], signatures['truth'])
+        if signatures['html'] is not None and not catalog.is_current(ds, 'html', signatures['html']):
+            catalog.put_html(ds, [html_entry(p, d['html']) for p, d in read_datasets([ds], False)],
+                             signatures['html'])
+
+
+def _select_page_ids(datasets, page_ids, complexity, size, buckets):
+    """Resolve page predicates against the page catalog."""
+    if complexity is None and size is None and buckets is None:
+        return page_ids
+    update_page_catalog(datasets)
+    catalog = get_page_catalog()
+    return sorted(chain(*(catalog.select(ds, page_ids, complexity, size, buckets) for ds in datasets)))
+
+
+def read_datasets(datasets: Iterable[str], ground_truth, page_ids=None, complexity=None, size=None, buckets=None):
+    """
+    Read (subsets of) processed and combined datasets.
+
+    Pages can be filtered by their complexity, size, or complexity bucket. These predicates are resolved against
+    the page catalog (see :mod:`extraction_benchmark.page_catalog`) before any pages are read. Pages without
+    a known complexity do not match complexity predicates.
+
+    :param datasets: list of dataset names
+    :param ground_truth: read ground truth instead of HTML pages
+    :param page_ids: optional list of page IDs to read
+    :param complexity: optional ``(min, max)`` tuple of page complexities (inclusive, either may be ``None``)
+    :param size: optional ``(min, max)`` tuple of HTML page sizes in bytes (inclusive, either may be ``None``)
+    :param buckets: optional list of complexity buckets (``"low"``, ``"medium"``, ``"high"``)
+    """
+    if not archives.isdir(DATASET_COMBINED_PATH):
         raise FileNotFoundError(errno.ENOENT, 'Combined dataset folder not found', DATASET_COMBINED_PATH)
     if not os.path.isdir(CUSTOM_PATH):
         raise FileNotFoundError(errno.ENOENT, 'URL folder not found', CUSTOM_HTML_PATH)
     if 'custom' in datasets:
-        return CustomReader(ground_truth)
+        return CustomReader(ground_truth, _select_page_ids(['custom'], page_ids, complexity, size, buckets))
+    else:
+        return CombinedDatasetReader(ground_truth, datasets,
+                                     _select_page_ids(datasets, page_ids, complexity, size, buckets))
+
+
+def list_page_ids(dataset, complexity=None, size=None, buckets=None):
+    """
+    List the IDs of all HTML pages in a processed dataset without reading them.
+
+    :param dataset: dataset name
+    :param complexity: optional ``(min, max)`` tuple of page complexities (see :func:`read_datasets`)
+    :param size: optional ``(min, max)`` tuple of HTML page sizes in bytes
+    :param buckets: optional list of complexity buckets
+    :return: sorted list of page IDs
+    """
+    if complexity is not None or size is not None or buckets is not None:
+        return _select_page_ids([dataset], None, complexity, size, buckets)
+    if dataset == 'custom':
+        html_path = CUSTOM_HTML_PROCESSED_PATH
+    elif PackedDataset.exists(dataset):
+        return _get_packed_dataset(dataset).page_ids()
     else:
-        return CombinedDatasetReader(ground_truth, datasets)
+        html_path = os.path.join(DATASET_COMBINED_HTML_PATH, dataset)
+    if not archives.isdir(html_path):
+        return []
+    return sorted(os.path.splitext(f)[0] for f in archives.listdir(html_path) if f.endswith('.html'))
@@ -0,0 +1,255 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from itertools import combinations
+import hashlib
+import json
+from multiprocessing import get_context
+import random
+
+import click
+import numpy as np
+import pandas as pd
+
+from extraction_benchmark import archives
+from extraction_benchmark.dataset_readers import read_datasets
+from extraction_benchmark.extractors import ensemble
+from extraction_benchmark.globals import *
+from extraction_benchmark.model_outputs import ModelAnswerStore
+from extraction_benchmark.util import tokenize_ws
+
+
+def _page_votes(args):
+    """
+    Build the vote matrix of a page and count the ground-truth tokens.
+
+    :return: page ID, token-by-model vote matrix, page-local token IDs, ground-truth counts of the page tokens,
+             and number of ground-truth tokens
+    """
+    page_id, dataset, html, truth, models = args
+    tokens, hits = ensemble.get_vote_matrix(html, page_id, models, dataset=dataset)
+    vocab = {}
+    token_ids = np.fromiter((vocab.setdefault(t, len(vocab)) for t in tokens), dtype=np.int32, count=len(tokens))
+    truth_tokens = tokenize_ws(truth)
+    gt_counts = np.zeros(len(vocab), dtype=np.int32)
+    for t in truth_tokens:
+        if t in vocab:
+            gt_counts[vocab[t]] += 1
+    return page_id, hits, token_ids, gt_counts, len(truth_tokens)
+
+
+def _cache_key(dataset, models, sample_pages):
+    """Get a key that changes whenever the model outputs or the ground truth of a dataset change."""
+    files = [os.path.join(MODEL_OUTPUTS_PATH, dataset, m + '.jsonl') for m in models]
+    files.append(os.path.join(DATASET_COMBINED_TRUTH_PATH, f'{dataset}.jsonl'))
+    stats = [archives.file_signature(f) for f in files]
+    return hashlib.sha256(json.dumps([models, sample_pages, stats]).encode()).hexdigest()
+
+
+def build_vote_matrices(dataset, models, sample_pages=None, parallelism=1):
+    """
+    Build the token-by-model vote matrices of all pages of a dataset, which are cached on disk.
+
+    The matrices of all pages are stacked into one array. Tokens are numbered per page and the ground truth is
+    represented by the counts of each page token in the ground truth and the total number of ground-truth tokens.
+
+    :param dataset: dataset name
+    :param models: list of candidate ensemble members
+    :param sample_pages: use only a random sample of this many pages
+    :param parallelism: number of parallel workers
+    :return: dict of arrays
+    """
+    cache_file = os.path.join(ENSEMBLE_SEARCH_PATH, f'{dataset}.npz')
+    key = _cache_key(dataset, models, sample_pages)
+    if os.path.isfile(cache_file):
+        with np.load(cache_file) as f:
+            if str(f['key']) == key:
+                return {k: f[k] for k in f.files}
+
+    truth = {p: t.get('plaintext') or '' for p, t in read_datasets([dataset], True)}
+    page_ids = sorted(truth)
+    if sample_pages and sample_pages < len(page_ids):
+        page_ids = sorted(random.Random(0).sample(page_ids, sample_pages))
+
+    with ModelAnswerStore() as store:
+        store.update(models)
+
+    def _args():
+        for p, in_data in read_datasets([dataset], False, page_ids=page_ids):
+            yield p, dataset, in_data['html'], truth[p], models
+
+    results = []
+    with get_context('spawn').Pool(processes=parallelism) as pool:
+        with click.progressbar(pool.imap(_page_votes, _args(), chunksize=8), length=len(page_ids),
+                               label=f'Building vote matrices for {dataset}') as progress:
+            for r in progress:
+                results.append(r)
+    results.sort(key=lambda r: r[0])
+
+    data = dict(
+        key=np.array(key),
+        models=np.array(models),
+        page_ids=np.array([r[0] for r in results]),
+        hits=np.concatenate([r[1] for r in results] or [np.zeros((0, len(models)), dtype=bool)]),
+        token_ids=np.concatenate([r[2] for r in results] or [np.zeros(0, dtype=np.int32)]),
+        token_offsets=np.cumsum([0] + [len(r[2]) for r in results]),
+        gt_counts=np.concatenate([r[3] for r in results] or [np.zeros(0, dtype=np.int32)]),
+        vocab_offsets=np.cumsum([0] + [len(r[3]) for r in results]),
+        gt_len=np.array([r[4] for r in results], dtype=np.int64),
+    )
+    os.makedirs(ENSEMBLE_SEARCH_PATH, exist_ok=True)
+    np.savez_compressed(cache_file + '.tmp.npz', **data)
+    os.replace(cache_file + '.tmp.npz', cache_file)
+    return data
+
+
+class _PageScorer:
+    """Token-level scoring of many ensemble configurations on the stacked vote matrices of a dataset."""
+
+    def __init__(self, data):
+        self.hits = data['hits'].astype(np.float32)
+        self.token_offsets = data['token_offsets']
+        self.vocab_offsets = data['vocab_offsets']
+        self.gt_counts = data['gt_counts']
+        self.gt_len = data['gt_len']
+        self.num_pages = len(self.gt_len)
+
+        # Group tokens by page-local token ID, which is unique across pages after adding the page vocab offsets
+        page_lengths = np.diff(self.token_offsets)
+        token_pages = np.repeat(np.arange(self.num_pages), page_lengths)
+        global_ids = data['token_ids'] + self.vocab_offsets[token_pages]
+        self.order = np.argsort(global_ids, kind='stable')
+        self.vocab_starts = np.searchsorted(global_ids[self.order], np.arange(len(self.gt_counts)))
+        self.non_empty = np.flatnonzero(page_lengths)
+
+    def score(self, weights, thresholds):
+        """
+        Score ensemble configurations.
+
+        :param weights: model-by-configuration weight matrix (0 for non-members)
+        :param thresholds: vote threshold of each configuration
+        :return: page-by-configuration precision, recall, and F1 matrices
+        """
+        num_configs = weights.shape[1]
+        selected = ((self.hits @ weights) >= thresholds).astype(np.int32)
+
+        overlap = np.zeros((self.num_pages, num_configs))
+        pred_len = np.zeros((self.num_pages, num_configs))
+        if len(self.non_empty):
+            # Bag-of-words overlap: per page and token, the smaller of predicted and ground-truth counts
+            token_counts = np.add.reduceat(selected[self.order], self.vocab_starts, axis=0)
+            token_overlap = np.minimum(token_counts, self.gt_counts[:, None])
+            overlap[self.non_empty] = np.add.reduceat(token_overlap, self.vocab_offsets[self.non_empty], axis=0)
+            pred_len[self.non_empty] = np.add.reduceat(selected, self.token_offsets[self.non_empty], axis=0)
+
+        # Same conventions for empty texts as in the evaluation
+        gt_len = self.gt_len[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prec = np.where(pred_len > 0, overlap / pred_len, (gt_len == 0).astype(float))
+            rec = np.where(gt_len > 0, overlap / gt_len, 1.0)
+            f1 = np.where(prec + rec > 0, 2 * prec * rec / (prec + rec), 0.0)
+        return prec, rec, f1
+
+
+def search_ensembles(models, datasets, thresholds, weights=None, min_size=2, max_size=None, sample_pages=None,
+                     top=10, parallelism=1):
+    """
+    Search for the best ensemble configurations.
+
+    Instead of running and evaluating each ensemble configuration separately, the votes of all candidate models
+    are determined only once per page. All subsets of the candidate models are then scored with all vote
+    thresholds and weightings directly against the ground truth using a token-level bag-of-words F1 score.
+    Scores are page averages (micro) and averages of the dataset averages (macro).
+
+    :param models: list of candidate ensemble members
+    :param datasets: list of dataset names
+    :param thresholds: list of vote thresholds as fractions of the number of ensemble members
+    :param weights: optional dict of model weights, which are tried in addition to uniform weights
+    :param min_size: minimum number of ensemble members
+    :param max_size: maximum number of ensemble members
+    :param sample_pages: evaluate only a random sample of this many pages per dataset
+    :param top: number of best configurations to print
+    :param parallelism: number of parallel workers for building the vote matrices
+    :return: data frame of all configurations and their scores sorted by micro F1
+    """
+    models = sorted(models)
+    max_size = min(max_size or len(models), len(models))
+    weightings = {'uniform': {m: 1 for m in models}}
+    if weights:
+        weightings['weighted'] = {m: weights.get(m, 1) for m in models}
+
+    configs = []
+    for k in range(max(1, min_size), max_size + 1):
+        for members in combinations(models, k):
+            for w in weightings:
+                if w != 'uniform' and all(weightings[w][m] == 1 for m in members):
+                    # Same as uniform weights
+                    continue
+                for t in thresholds:
+                    configs.append((members, w, t))
+    if not configs:
+        raise click.UsageError('No ensemble configurations to search.')
+
+    weight_matrix = np.zeros((len(models), len(configs)), dtype=np.float32)
+    vote_thresholds = np.zeros(len(configs), dtype=np.float32)
+    for ci, (members, w, t) in enumerate(configs):
+        for m in members:
+            weight_matrix[models.index(m), ci] = weightings[w][m]
+        vote_thresholds[ci] = int(len(members) * t)
+
+    sums = {k: np.zeros(len(configs)) for k in ('prec', 'rec', 'f1')}
+    macro_f1 = np.zeros(len(configs))
+    num_pages = 0
+    num_datasets = 0
+    for ds in datasets:
+        scorer = _PageScorer(build_vote_matrices(ds, models, sample_pages, parallelism))
+        if not scorer.num_pages:
+            continue
+
+        # Limit the size of the token-by-configuration matrices
+        chunk_size = max(1, 2 ** 25 // max(1, len(scorer.hits)))
+        ds_f1 = np.zeros(len(configs))
+        with click.progressbar(range(0, len(configs), chunk_size), label=f'Scoring configurations on {ds}') as progress:
+            for start in progress:
+                end = start + chunk_size
+                prec, rec, f1 = scorer.score(weight_matrix[:, start:end], vote_thresholds[start:end])
+                sums['prec'][start:end] += prec.sum(axis=0)
+                sums['rec'][start:end] += rec.sum(axis=0)
+                sums['f1'][start:end] += f1.sum(axis=0)
+                ds_f1[start:end] = f1.mean(axis=0)
+        macro_f1 += ds_f1
+        num_pages += scorer.num_pages
+        num_datasets += 1
+
+    if not num_pages:
+        raise click.UsageError('No pages with ground truth found.')
+
+    df = pd.DataFrame(dict(
+        members=[','.join(c[0]) for c in configs],
+        size=[len(c[0]) for c in configs],
+        weighting=[c[1] for c in configs],
+        threshold=[c[2] for c in configs],
+        vote_threshold=vote_thresholds.astype(int),
+        prec=sums['prec'] / num_pages,
+        rec=sums['rec'] / num_pages,
+        f1=sums['f1'] / num_pages,
+        f1_macro=macro_f1 / num_datasets,
+    )).sort_values('f1', ascending=False, kind='stable')
+
+    os.makedirs(METRICS_PATH, exist_ok=True)
+    out_file = os.path.join(METRICS_PATH, 'ensemble_search.csv')
+    df.to_csv(out_file, index=False)
+    click.echo(df.head(top).to_string(index=False, float_format='{:.3f}'.format))
+    click.echo(f'All {len(df)} configurations written to "{out_file}"')
+    return df
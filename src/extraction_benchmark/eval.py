@@ -12,7 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from itertools import pairwise, product
+from itertools import pairwise
 import math
 from multiprocessing import get_context
 
@@ -22,6 +22,7 @@ import pandas as pd
 from rouge_score import rouge_scorer, tokenizers
 from tqdm import tqdm
 
+from extraction_benchmark import archives
 from extraction_benchmark.globals import *
 from extraction_benchmark import plt
 from extraction_benchmark.util import jsonl_to_dict, read_jsonl, tokenize_ws
@@ -95,7 +96,28 @@ def _eval_expand_args(args):
     df.to_csv(os.path.join(store_path, f'{scorer}_{model}.csv'), index=False)
 
 
-def calculcate_scores(metrics, datasets, models, parallelism):
+def _find_variants(models, path, prefix='', suffix=''):
+    """
+    Find the variant outputs of parameter sweeps for a list of models (see
+    :func:`extraction_benchmark.extractors.get_output_variants`).
+
+    :param models: list of model names
+    :param path: directory containing files named ``<prefix><model><suffix>``
+    :param prefix: file name prefix
+    :param suffix: file name suffix
+    :return: list of models and their variants
+    """
+    found = []
+    files = archives.listdir(path)
+    for m in models:
+        found.append(m)
+        variant_files = [f for f in files if f.startswith(f'{prefix}{m}.') and f.endswith(suffix)
+                         and len(f) >= len(f'{prefix}{m}.{suffix}')]
+        found.extend(sorted(f[len(prefix):len(f) - len(suffix)] for f in variant_files))
+    return found
+
+
+def calculcate_scores(metrics, datasets, models, parallelism, include_variants=False):
     """
     Calculate performance scores for pages against the ground truth.
 
@@ -103,16 +125,20 @@ def calculcate_scores(metrics, datasets, models, parallelism):
     :param datasets: list of dataset names
     :param models: list of models to evaluate
     :param parallelism: number of parallel workers to run
+    :param include_variants: also evaluate the outputs of parameter sweeps of the selected models
     """
     jobs = []
     for ds in tqdm(datasets, desc='Loading extractions', leave=False):
         ground_truth_path = os.path.join(DATASET_COMBINED_TRUTH_PATH, f'{ds}.jsonl')
-        if not os.path.isfile(ground_truth_path):
+        if not archives.isfile(ground_truth_path):
             continue
 
-        for model in models:
+        ds_models = models
+        if include_variants:
+            ds_models = _find_variants(models, os.path.join(MODEL_OUTPUTS_PATH, ds), suffix='.jsonl')
+        for model in ds_models:
             model_answer_path = os.path.join(MODEL_OUTPUTS_PATH, ds,  f'{model}.jsonl')
-            if os.path.isfile(model_answer_path):
+            if archives.isfile(model_answer_path):
                 jobs.extend([met, model, ds, model_answer_path, ground_truth_path] for met in metrics)
 
     with get_context('spawn').Pool(processes=parallelism) as pool:
@@ -327,7 +353,7 @@ def _plot_score_histograms(title, score_df, out_file):
     plt.close()
 
 
-def aggregate_scores(score_name, models, datasets, complexities):
+def aggregate_scores(score_name, models, datasets, complexities, include_variants=False):
     """
     Aggregate evaluation statistics.
 
@@ -335,9 +361,10 @@ def aggregate_scores(score_name, models, datasets, complexities):
     :param models: list of input model names
     :param datasets: list of input dataset names
     :param complexities: list of complexity classes to include
+    :param include_variants: also aggregate the scores of parameter sweep outputs of the selected models
     """
     score_in_path = os.path.join(METRICS_PATH, score_name)
-    if not os.path.isdir(score_in_path):
+    if not archives.isdir(score_in_path):
         return
 
     if score_name == 'rouge':
@@ -348,7 +375,7 @@ def aggregate_scores(score_name, models, datasets, complexities):
         main_score_col = 'dist'
 
     comp_quant_path = os.path.join(METRICS_COMPLEXITY_PATH, 'complexity_quantiles.csv')
-    q = pd.read_csv(comp_quant_path, index_col=0)
+    q = archives.read_csv(comp_quant_path, index_col=0)
     compl_range = {'all': None}
     compl_range.update({k: v for k, v in zip(COMPLEXITIES, pairwise([0, float(q.loc[0.25]), float(q.loc[0.75]), 1]))})
 
@@ -366,16 +393,19 @@ def aggregate_scores(score_name, models, datasets, complexities):
         barplot_data = []
         for comp in progress:
             score_df = pd.DataFrame()
-            for d, m in product(datasets, models):
+            ds_models = [(d, m) for d in datasets for m in (
+                _find_variants(models, os.path.join(score_in_path, d), f'{score_name}_', '.csv')
+                if include_variants else models)]
+            for d, m in ds_models:
                 p = os.path.join(score_in_path, d, f'{score_name}_{m}.csv')
-                if not os.path.isfile(p):
+                if not archives.isfile(p):
                     continue
 
-                df = pd.read_csv(p, index_col=['model', 'dataset'])
+                df = archives.read_csv(p, index_col=['model', 'dataset'])
                 if compl_range[comp] is not None:
                     # Filter input dataframe to include only pages within chosen complexity range
-                    c = pd.read_csv(os.path.join(METRICS_COMPLEXITY_PATH, d, f'{d}_complexity.csv'),
-                                    index_col='hash_key')
+                    c = archives.read_csv(os.path.join(METRICS_COMPLEXITY_PATH, d, f'{d}_complexity.csv'),
+                                          index_col='hash_key')
                     c = c[(c['complexity'] >= compl_range[comp][0]) & (c['complexity'] <= compl_range[comp][1])]
                     df = df[df['hash_key'].isin(c.index)]
 
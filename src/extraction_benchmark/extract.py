@@ -12,22 +12,31 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from contextlib import redirect_stderr, redirect_stdout
+from contextlib import contextmanager, nullcontext, redirect_stderr, redirect_stdout
 from functools import partial
+import inspect
 import io
-from itertools import product
 import json
 import logging
 from multiprocessing import get_context
 import os
+import signal
 from typing import Any, Dict
 import warnings
 
 import click
 
-from extraction_benchmark.dataset_readers import read_datasets, read_raw_dataset
+from extraction_benchmark import archives
+from extraction_benchmark.dataset_readers import DatasetReader, get_page_catalog, list_page_ids, \
+    page_catalog_signatures, read_datasets, read_raw_dataset, remove_packed_dataset
+from extraction_benchmark.extraction_cache import ExtractionCache, html_hash
 from extraction_benchmark.extractors import extractors
+from extraction_benchmark.extractors.document import Document
+from extraction_benchmark.model_outputs import ModelAnswerStore, ModelOutputWriter, PageQuarantine
+from extraction_benchmark.packed_dataset import PackedDataset, PackedDatasetWriter
+from extraction_benchmark.page_catalog import html_entry
 from extraction_benchmark.paths import *
+from extraction_benchmark.scheduler import WorkStealingScheduler, interleave_chunks, split_chunks
 
 
 class GlobalVars:
@@ -49,117 +58,572 @@ def _dict_to_jsonl(filepath, lines_dict: Dict[str, Any]):
             f.write('\n')
 
 
-def extract_ground_truth(datasets):
+def extract_ground_truth(datasets, parallelism=1):
     """
-    Convert ground truth from raw dataset to JSON format.
+    Convert ground truth from raw dataset to JSON format and record the pages in the page catalog.
 
     :param datasets: list of input dataset
+    :param parallelism: number of parallel processes for reading the raw files
     :return: set of page IDs that were extracted
     """
 
     page_ids = set()
     for ds in datasets:
-        with click.progressbar(read_raw_dataset(ds, True), label=f'Converting ground truth of {ds}') as ds_progress:
-            extracted = {k: v for k, v in ds_progress}
+        reader = read_raw_dataset(ds, True)
+        extracted = {}
+        catalog_entries = []
+        with click.progressbar(reader.read_parallel(parallelism, catalog_entries=True), length=reader.dataset_size(),
+                               label=f'Converting ground truth of {ds}') as ds_progress:
+            for page_id, val, entry in ds_progress:
+                extracted[page_id] = val
+                catalog_entries.append(entry)
             page_ids.update(extracted.keys())
         _dict_to_jsonl(os.path.join(DATASET_COMBINED_TRUTH_PATH, f'{ds}.jsonl'), extracted)
+        get_page_catalog().put_truth(ds, catalog_entries, page_catalog_signatures(ds)['truth'])
     return page_ids
 
 
-def extract_raw_html(datasets, page_id_whitelist=None):
+def extract_raw_html(datasets, page_id_whitelist=None, parallelism=1, packed=True, compress=False):
     """
-    Convert HTML files from raw dataset to JSON format.
+    Convert HTML files from raw dataset to JSON format and record the pages in the page catalog.
 
     :param datasets: list of input dataset
     :param page_id_whitelist: optional list of page IDs to include (if set, IDs not in this list will be skipped)
+    :param parallelism: number of parallel processes for reading the raw files
+    :param packed: write a packed dataset (see :mod:`extraction_benchmark.packed_dataset`) instead of one file
+                   per page (an existing packed dataset is deleted otherwise)
+    :param compress: compress the records of packed datasets
     """
     if page_id_whitelist and type(page_id_whitelist) is not set:
         page_id_whitelist = set(page_id_whitelist)
 
     for ds in datasets:
         out_dir = os.path.join(DATASET_COMBINED_HTML_PATH, ds)
-        os.makedirs(out_dir, exist_ok=True)
-        with click.progressbar(read_raw_dataset(ds, False), label=f'Converting HTML of {ds}') as ds_progress:
-            for page_id, val in ds_progress:
-                if page_id_whitelist and page_id not in page_id_whitelist:
-                    continue
-                if not val.get('html'):
+        reader = read_raw_dataset(ds, False)
+        catalog_entries = []
+        with click.progressbar(reader.read_parallel(parallelism, catalog_entries=True), length=reader.dataset_size(),
+                               label=f'Converting HTML of {ds}') as ds_progress:
+            with (PackedDatasetWriter(ds, compress=compress) if packed else nullcontext()) as writer:
+                if not packed:
+                    os.makedirs(out_dir, exist_ok=True)
+                for page_id, val, entry in ds_progress:
+                    if page_id_whitelist and page_id not in page_id_whitelist:
+                        continue
+                    if not val.get('html'):
+                        continue
+                    catalog_entries.append(entry)
+                    if packed:
+                        writer.write(page_id, val['html'])
+                        continue
+                    with open(os.path.join(out_dir, page_id + '.html'), 'w') as f:
+                        f.write(val['html'])
+        if not packed:
+            # A previously packed version would otherwise shadow the newly converted HTML files
+            remove_packed_dataset(ds)
+        get_page_catalog().put_html(ds, catalog_entries, page_catalog_signatures(ds)['html'])
+
+
+def _decode_html_file(file):
+    """Decode an HTML file read by :func:`pack_html` and compute its page catalog entry."""
+    in_file, file_bytes = file
+    html = DatasetReader._decode(file_bytes, 'utf-8')
+    return html, html_entry(os.path.splitext(os.path.basename(in_file))[0], html)
+
+
+def pack_html(datasets, compress=False, parallelism=1):
+    """
+    Pack existing per-page HTML files of combined datasets into packed datasets.
+
+    The HTML files are read from disk or directly from the combined dataset archive.
+
+    :param datasets: list of dataset names
+    :param compress: compress the records of packed datasets
+    :param parallelism: number of parallel processes for decoding the pages and computing their catalog entries
+    """
+    for ds in datasets:
+        in_dir = os.path.join(DATASET_COMBINED_HTML_PATH, ds)
+        if not archives.isdir(in_dir):
+            continue
+        in_files = [os.path.join(in_dir, f) for f in archives.listdir(in_dir) if f.endswith('.html')]
+        catalog_entries = []
+        with (get_context('spawn').Pool(parallelism) if parallelism > 1 else nullcontext()) as pool:
+            files = archives.read_files(in_files, keep_order=False)
+            pages = pool.imap(_decode_html_file, files, chunksize=16) if pool else map(_decode_html_file, files)
+            with PackedDatasetWriter(ds, compress=compress) as writer:
+                with click.progressbar(pages, length=len(in_files), label=f'Packing HTML of {ds}') as progress:
+                    for html, entry in progress:
+                        catalog_entries.append(entry)
+                        writer.write(entry[0], html)
+        get_page_catalog().put_html(ds, catalog_entries, page_catalog_signatures(ds)['html'])
+
+
+class PageTimeoutError(BaseException):
+    """
+    Raised when an extractor exceeds its per-page time limit.
+
+    Derived from :class:`BaseException`, so that it cannot be swallowed by generic exception handlers
+    inside the extractors.
+    """
+
+
+@contextmanager
+def _time_limit(seconds):
+    """Raise a :class:`PageTimeoutError` if the context is not left within the given number of seconds."""
+    if not seconds:
+        yield
+        return
+
+    def _handler(signum, frame):
+        raise PageTimeoutError()
+
+    prev_handler = signal.signal(signal.SIGALRM, _handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, prev_handler)
+
+
+def _model_limit(limits, model_name):
+    """Get a per-model limit from a dict of model names and limits (``None`` key for the default)."""
+    if not limits:
+        return None
+    return limits.get(model_name, limits.get(None))
+
+
+def _failure_result(job, page_id, reason):
+    return {m: dict(plaintext='', model=m, error=reason) for m in job[0]}
+
+
+def _accepts_document(model_name):
+    """Check whether an extractor can work on a shared pre-parsed :class:`Document`."""
+    return 'doc' in inspect.signature(getattr(extractors, 'extract_' + model_name)).parameters
+
+
+def _extract_page(model_name, dataset, page_id, doc, chosen_models=(), cache=None, fingerprint=None,
+                  cache_key=None, page_timeout=None, options=None, logger=None, member_answers=None):
+    """
+    Run a single extraction model on a page.
+
+    :param member_answers: dict of precomputed member answers for ensembles
+    :return: output data
+    """
+    out_data = dict(plaintext='', model=model_name)
+    if cache is not None:
+        cached = cache.get(fingerprint, cache_key)
+        if cached is not None:
+            out_data['plaintext'] = cached
+            return out_data
+
+    model = getattr(extractors, 'extract_' + model_name)
+    kwargs = dict(page_id=page_id)
+    if model_name.startswith('ensemble_'):
+        kwargs['chosen_models'] = chosen_models
+        kwargs['dataset'] = dataset
+        if member_answers is not None:
+            kwargs['member_answers'] = member_answers
+    if _accepts_document(model_name):
+        kwargs['doc'] = doc
+    kwargs.update(options or {})
+
+    try:
+        with _time_limit(page_timeout):
+            text = model(doc.html, **kwargs)
+        if isinstance(text, dict):
+            # Parameter sweep with additional variant outputs
+            text = dict(text)
+            out_data['variants'] = text
+            text = text.pop(model_name, '')
+        out_data['plaintext'] = text or ''
+        if cache is not None:
+            cache.put(fingerprint, cache_key, out_data['plaintext'])
+    except PageTimeoutError:
+        logger.warning(f'Timeout in model {model_name} while extracting {dataset} ({page_id}).')
+        out_data['error'] = 'timeout'
+    except Exception as e:
+        logger.warning(f'Error in model {model_name} while extracting {dataset} ({page_id}):')
+        logger.warning(str(e))
+        out_data['error'] = 'exception'
+    return out_data
+
+
+def _extract_batch(model_name, dataset, pages, chosen_models=(), cache=None, fingerprint=None,
+                   page_timeout=None, options=None, logger=None):
+    """
+    Run a batched extraction model on a list of pages.
+
+    If the batch fails, its pages are extracted again one by one, so that errors are attributed to the right pages.
+    Pages for which the batch extractor returned ``None`` are extracted again one by one as well.
+
+    :param pages: list of ``(page_id, doc, cache_key)`` tuples
+    :return: list of output data in the order of ``pages``
+    """
+    results = [None] * len(pages)
+    todo = []
+    for i, (_, _, cache_key) in enumerate(pages):
+        cached = cache.get(fingerprint, cache_key) if cache is not None else None
+        if cached is not None:
+            results[i] = dict(plaintext=cached, model=model_name)
+        else:
+            todo.append(i)
+
+    if len(todo) > 1:
+        batch_model = extractors.get_batch_extractor(model_name)
+        try:
+            with _time_limit(page_timeout * len(todo) if page_timeout else None):
+                texts = batch_model([pages[i][1].html for i in todo], **(options or {}))
+            failed = []
+            for i, text in zip(todo, texts):
+                if text is None:
+                    failed.append(i)
                     continue
-                with open(os.path.join(out_dir, page_id + '.html'), 'w') as f:
-                    f.write(val['html'])
+                results[i] = dict(plaintext=text, model=model_name)
+                if cache is not None:
+                    cache.put(fingerprint, pages[i][2], results[i]['plaintext'])
+            if failed:
+                logger.warning(f'Model {model_name} failed on {len(failed)} pages of a batch on {dataset}, '
+                               f'retrying them one by one.')
+            todo = failed
+        except (Exception, PageTimeoutError):
+            logger.warning(f'Batch of model {model_name} failed on {dataset}, retrying pages one by one.')
 
+    for i in todo:
+        page_id, doc, cache_key = pages[i]
+        results[i] = _extract_page(model_name, dataset, page_id, doc, chosen_models, cache=cache,
+                                   fingerprint=fingerprint, cache_key=cache_key, page_timeout=page_timeout,
+                                   options=options, logger=logger)
+    return results
 
-def _extract_with_model_expand_args(args, chosen_models=[],  skip_existing=False, verbose=False):
-    _extract_with_model(*args, chosen_models, skip_existing=skip_existing, verbose=verbose)
+
+def _member_answers(members, dataset, page_id, doc, page_outputs, caches, fingerprints, cache_key,
+                    page_timeouts=None, model_options=None, logger=None):
+    """
+    Get the answers of ensemble members to a page, computing missing answers on the fly.
+
+    Answers are taken from the outputs computed for the same page already, from the extraction cache, or
+    from a fresh run of the member model. Failed members contribute empty answers.
+
+    :param members: list of member model names
+    :param page_outputs: dict of model names and output data of the page (updated with new member outputs)
+    :return: dict of member names and plaintext answers
+    """
+    for m in members:
+        if m not in page_outputs:
+            page_outputs[m] = _extract_page(m, dataset, page_id, doc,
+                                            cache=caches.get(m),
+                                            fingerprint=fingerprints[m],
+                                            cache_key=cache_key,
+                                            page_timeout=_model_limit(page_timeouts, m),
+                                            options=(model_options or {}).get(m),
+                                            logger=logger)
+    return {m: page_outputs[m]['plaintext'] for m in members}
 
 
-def _extract_with_model(model, dataset, chosen_models = [], skip_existing=False, verbose=False):
-    model, model_name = model
-    out_path = os.path.join(MODEL_OUTPUTS_PATH, dataset, model_name + '.jsonl')
+def _batch_size(job, batch_size):
+    """Get the batch size for a job (1 if the job's model does not support batching)."""
+    if len(job[0]) == 1 and extractors.get_batch_extractor(job[0][0]):
+        return max(1, batch_size)
+    return 1
+
+
+def _extract_chunk(job, page_ids, chosen_models=(), use_cache=True, page_timeouts=None, batch_size=16,
+                   model_options=None, inline_members=False, verbose=False):
+    """
+    Run one or more extraction models on a chunk of pages from a dataset.
+
+    Each page is parsed only once and the parsed :class:`Document` is shared among all models of the job.
+    Models with a batched entry point are run on batches of up to ``batch_size`` pages at once.
+
+    :param job: tuple of model names and dataset name
+    :param page_ids: list of page IDs to extract
+    :param chosen_models: member models for ensembles
+    :param use_cache: serve results from and add results to the extraction cache
+    :param page_timeouts: dict of per-model page timeouts in seconds (``None`` key for the default)
+    :param batch_size: maximum number of pages per batch for batched models
+    :param model_options: dict of model names and dicts of keyword arguments for the extractors
+    :param inline_members: compute ensemble member answers on the fly instead of looking up stored outputs
+    :param verbose: log error information
+    :return: iterable of ``(page_id, {model_name: out_data})`` tuples in the order of ``page_ids``
+    """
+    model_names, dataset = job
+    model_options = model_options or {}
+    members = {}
+    if inline_members:
+        members = {m: extractors.get_ensemble_members(m, chosen_models)
+                   for m in model_names if m.startswith('ensemble_')}
+    all_models = list(dict.fromkeys(list(model_names) + [m for ms in members.values() for m in ms]))
+    fingerprints = {m: extractors.get_extractor_fingerprint(m, model_options.get(m)) for m in all_models}
     logger = logging.getLogger('wceb-extract')
     logger.setLevel(logging.INFO if verbose else logging.ERROR)
 
-    extracted = {}
-    if skip_existing and os.path.isfile(out_path):
-        with open(out_path, 'r') as f:
-            for line in f:
-                j = json.loads(line)
-                extracted[j['page_id']] = {k: v for k, v in j.items() if k != 'page_id'}
-    with warnings.catch_warnings():
-        warnings.simplefilter('ignore')
-        for file_hash, in_data in read_datasets([dataset], False):
-            if file_hash in extracted:
-                continue
-            out_data = dict(plaintext='', model=model_name)
-            try:
-                if model_name.startswith('ensemble_'):
-                    out_data['plaintext'] = model(in_data['html'], page_id=file_hash, chosen_models = chosen_models) or ''
-                else:
-                    out_data['plaintext'] = model(in_data['html'], page_id=file_hash) or ''
-            except Exception as e:
-                logger.warning(f'Error in model {model_name} while extracting {dataset} ({file_hash}):')
-                logger.warning(str(e))
-
-            extracted[file_hash] = out_data
-
-    if not extracted:
-        return
+    # Ensemble outputs depend on the member outputs, not only on the page itself
+    caches = {}
+    if use_cache:
+        caches = {m: ExtractionCache(m) for m in all_models if not m.startswith('ensemble_')}
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+
+            # Initialise reusable extractor instances before the time limits start
+            for m in all_models:
+                try:
+                    extractors.init_extractor(m)
+                except Exception:
+                    # Reported for each page later
+                    pass
+
+            pages = read_datasets([dataset], False, page_ids=page_ids)
+            if _batch_size(job, batch_size) > 1:
+                m = model_names[0]
+
+                def _run_batch(batch):
+                    results = _extract_batch(m, dataset, batch, chosen_models,
+                                             cache=caches.get(m),
+                                             fingerprint=fingerprints[m],
+                                             page_timeout=_model_limit(page_timeouts, m),
+                                             options=model_options.get(m),
+                                             logger=logger)
+                    return [(p, {m: out_data}) for (p, _, _), out_data in zip(batch, results)]
+
+                batch = []
+                for page_id, in_data in pages:
+                    if in_data.get('error'):
+                        # Flush the current batch first to keep the page order
+                        if batch:
+                            yield from _run_batch(batch)
+                            batch = []
+                        yield page_id, _failure_result(job, page_id, in_data['error'])
+                        continue
+                    doc = Document(in_data['html'])
+                    batch.append((page_id, doc, html_hash(doc.html) if caches else None))
+                    if len(batch) >= batch_size:
+                        yield from _run_batch(batch)
+                        batch = []
+                if batch:
+                    yield from _run_batch(batch)
+                return
+
+            for page_id, in_data in pages:
+                if in_data.get('error'):
+                    # Page does not exist (anymore)
+                    yield page_id, _failure_result(job, page_id, in_data['error'])
+                    continue
+                doc = Document(in_data['html'])
+                cache_key = html_hash(doc.html) if caches else None
+                page_outputs = {}
+                # Run ensembles last, so that they can reuse the outputs of their members on the same page
+                for m in sorted(model_names, key=lambda m: m in members):
+                    member_answers = None
+                    if m in members:
+                        member_answers = _member_answers(members[m], dataset, page_id, doc, page_outputs, caches,
+                                                         fingerprints, cache_key, page_timeouts, model_options,
+                                                         logger)
+                    page_outputs[m] = _extract_page(m, dataset, page_id, doc, chosen_models,
+                                                    cache=caches.get(m),
+                                                    fingerprint=fingerprints[m],
+                                                    cache_key=cache_key,
+                                                    page_timeout=_model_limit(page_timeouts, m),
+                                                    options=model_options.get(m),
+                                                    logger=logger,
+                                                    member_answers=member_answers)
+                yield page_id, {m: page_outputs[m] for m in model_names}
+    finally:
+        for cache in caches.values():
+            cache.close()
+
+
+def _group_jobs(models, page_ids):
+    """
+    Group models that can share parsed documents into joint jobs.
+
+    Models are grouped by the set of pages they still need to process, so that a model is never run on a
+    page for which an output exists already.
+
+    :param models: list of model names
+    :param page_ids: dict of model names and lists of page IDs to process
+    :return: list of ``(model_names, page_ids)`` tuples
+    """
+    models_by_page = {}
+    jobs = []
+    for m in models:
+        if not _accepts_document(m):
+            jobs.append(((m,), page_ids[m]))
+            continue
+        for p in page_ids[m]:
+            models_by_page.setdefault(p, []).append(m)
 
-    _dict_to_jsonl(out_path, extracted)
+    page_groups = {}
+    for p, group in models_by_page.items():
+        page_groups.setdefault(tuple(group), []).append(p)
+    return [(g, sorted(p)) for g, p in page_groups.items()] + jobs
 
 
-def extract(models, chosen_models, datasets, skip_existing, parallelism, verbose=False):
+def extract(models, chosen_models, datasets, skip_existing, parallelism, chunk_size=50, use_cache=True,
+            page_timeouts=None, max_rss=None, max_pages_per_worker=None, quarantine_after=2, batch_size=16,
+            model_options=None, inline_members=False, memory_budget=None, page_filter=None, verbose=False):
     """
     Extract datasets with the selected extraction models.
 
+    Extraction jobs are split into chunks of pages per model and dataset, which are distributed dynamically
+    among the workers. Models that accept pre-parsed documents are run together, so that each page is parsed
+    only once for all of them. Model outputs are appended to partial output files as they come in and are
+    compacted into the final sorted output files once all pages of a model and dataset have been extracted.
+
+    Pages on which a model exceeds its time or memory limit are recorded as failures. Pages that fail this way
+    repeatedly are quarantined and not passed to the model again in later runs. If a worker running several
+    models on a page has to be killed, the page is recorded as failed for all of them.
+
+    Workers are admitted to jobs based on the resource classes of the extractors (see
+    :func:`extractors.get_extractor_info`). Jobs with extractors other than lightweight CPU extractors reserve
+    the expected memory footprint of their extractors, so that only as many of them run at the same time as fit
+    into the memory budget, while the remaining workers are filled with lightweight jobs. Extractors that are not
+    safe to run in parallel are run by only one worker at a time.
+
+    Ensembles that are run with ``thresholds`` or ``weightings`` options write an additional output file for
+    each variant of the parameter sweep (see :func:`extractors.get_output_variants`).
+
+    With ``inline_members``, ensembles do not depend on previously generated member outputs. Member answers
+    are computed on the fly in the same worker instead (or served from the extraction cache).
+
+    Datasets whose HTML pages are only available in the combined dataset archive are packed before the
+    extraction starts (see :func:`pack_html`).
+
     :param models: list of extraction model names (if ``ground_truth == False``)
+    :param chosen_models: list of member models for ensembles
     :param datasets: list of dataset names under "datasets/raw"
-    :param skip_existing: skip models for which an answer file exists already
+    :param skip_existing: skip pages for which an answer exists already and resume interrupted runs
     :param parallelism: number of parallel workers
+    :param chunk_size: maximum number of pages per work chunk
+    :param use_cache: serve unchanged pages from the extraction cache
+    :param page_timeouts: dict of per-model page timeouts in seconds (``None`` key for the default)
+    :param max_rss: dict of per-model worker memory limits in MiB (``None`` key for the default)
+    :param max_pages_per_worker: replace workers with fresh processes after this many pages
+    :param quarantine_after: quarantine pages after this many failures (0 to disable quarantine)
+    :param batch_size: maximum number of pages per batch for models that support batching
+    :param model_options: dict of model names and dicts of keyword arguments for the extractors
+    :param inline_members: compute ensemble member answers on the fly instead of looking up stored outputs
+    :param memory_budget: memory budget in MiB for running heavy extractors in parallel (``None`` for no limit)
+    :param page_filter: dict of page predicates for selecting pages from the page catalog (see
+                        :func:`dataset_readers.list_page_ids`)
     :param verbose: log error information
     """
 
-    model = [(getattr(extractors, 'extract_' + m), m) for m in models]
-    jobs = list(product(model, datasets))
+    if not inline_members and any(m.startswith('ensemble_') for m in models):
+        # Index member model answers once up front, so that ensemble workers only need to look them up
+        members = [m.__name__.replace('extract_', '') for m in
+                   extractors.list_extractors(names_only=False, include_ensembles=False, chosen_models=chosen_models)]
+        with ModelAnswerStore() as store:
+            store.update(members)
+
+    # Pack datasets that are only available in the combined dataset archive first, so that the archive is
+    # decompressed once per dataset instead of up to each chunk (XZ streams cannot be read at random offsets)
+    pack_html([ds for ds in datasets if ds != 'custom' and not PackedDataset.exists(ds) and
+               not os.path.isdir(os.path.join(DATASET_COMBINED_HTML_PATH, ds))], parallelism=parallelism)
+
+    quarantine = PageQuarantine(max_strikes=quarantine_after)
+    jobs = []
+    writers = {}
+    remaining = {}
+    # Additional outputs of parameter sweeps, which are written alongside the model's own output
+    variants = {m: extractors.get_output_variants(m, (model_options or {}).get(m)) for m in models}
+    for ds in datasets:
+        ds_page_ids = list_page_ids(ds, **(page_filter or {}))
+        todo = {}
+        for model_name in models:
+            writer = ModelOutputWriter(os.path.join(MODEL_OUTPUTS_PATH, ds, model_name + '.jsonl'),
+                                       resume=skip_existing)
+            variant_writers = {v: ModelOutputWriter(os.path.join(MODEL_OUTPUTS_PATH, ds, v + '.jsonl'),
+                                                    resume=skip_existing) for v in variants[model_name]}
+            todo[model_name] = []
+            for p in ds_page_ids:
+                if p in writer.existing_page_ids:
+                    continue
+                if quarantine.is_quarantined(model_name, p):
+                    writer.write(p, dict(plaintext='', model=model_name, error='quarantined'))
+                    for v, w in variant_writers.items():
+                        w.write(p, dict(plaintext='', model=v, error='quarantined'))
+                    continue
+                todo[model_name].append(p)
+            if not todo[model_name]:
+                # Compact quarantined pages and leftovers of an interrupted run
+                writer.close()
+                for w in variant_writers.values():
+                    w.close()
+                continue
+            writers[(model_name, ds)] = writer
+            writers.update({(v, ds): w for v, w in variant_writers.items()})
+            remaining[(model_name, ds)] = len(todo[model_name])
+
+        for group, page_ids in _group_jobs([m for m in models if todo[m]], todo):
+            jobs.append(((group, ds), split_chunks(page_ids, chunk_size)))
+
+    def _job_models(job):
+        # Inline ensemble members run in the same worker and count towards the limits of the ensemble
+        if not inline_members:
+            return job[0]
+        return list(job[0]) + [mm for m in job[0] if m.startswith('ensemble_')
+                               for mm in extractors.get_ensemble_members(m, chosen_models)]
+
+    def limits_func(job):
+        job_models = _job_models(job)
+        timeouts = [_model_limit(page_timeouts, m) for m in job_models]
+        timeout = None
+        if all(timeouts):
+            timeout = sum(timeouts)
+            # Results of batched models arrive all at once at the end of each batch (retries included)
+            job_batch_size = _batch_size(job, batch_size)
+            if job_batch_size > 1:
+                timeout *= job_batch_size + 1
+            # Give extractors a chance to time out gracefully before killing the worker
+            timeout += max(10, timeout / 2)
+        rss = [r for r in (_model_limit(max_rss, m) for m in job_models) if r]
+        return timeout, max(rss) * 1024 * 1024 if rss else None
+
+    def resources_func(job):
+        infos = [extractors.get_extractor_info(m) for m in dict.fromkeys(_job_models(job))]
+        resources = {'memory': sum(i['memory'] for i in infos if i['cost'] != 'cpu_light')}
+        resources.update({'exclusive_' + i['name']: 1 for i in infos if not i['thread_safe']})
+        return resources
+
+    capacities = {'exclusive_' + m: 1 for m in extractors.list_extractors(include_ensembles=True)}
+    capacities['memory'] = memory_budget
+
+    chunks = interleave_chunks(jobs)
+    chunk_func = partial(_extract_chunk, chosen_models=chosen_models, use_cache=use_cache,
+                         page_timeouts=page_timeouts, batch_size=batch_size, model_options=model_options,
+                         inline_members=inline_members, verbose=verbose)
+    scheduler = WorkStealingScheduler(chunk_func, parallelism, failure_func=_failure_result,
+                                      limits_func=limits_func, max_items_per_worker=max_pages_per_worker,
+                                      resources_func=resources_func, capacities=capacities)
 
     def item_show_func(j):
         if j:
-            return f'Model: {j[0][1]}, Dataset: {j[1]}'
-
-    if parallelism == 1:
-        with click.progressbar(jobs, label='Running extrators', item_show_func=item_show_func) as progress:
-            for job in progress:
-                _extract_with_model_expand_args(job, chosen_models=chosen_models)
-        return
+            return f'Model: {", ".join(j[0])}, Dataset: {j[1]}'
 
-    with get_context('spawn').Pool(processes=parallelism) as pool:
-        try:
-            with click.progressbar(pool.imap_unordered(partial(_extract_with_model_expand_args,
-                                                               skip_existing=skip_existing, verbose=verbose, chosen_models = chosen_models), jobs),
-                                   length=len(jobs), label='Running extrators') as progress:
-                for _ in progress:
-                    pass
-        except KeyboardInterrupt:
-            pool.terminate()
+    try:
+        with click.progressbar(length=sum(remaining.values()), label='Running extractors',
+                               item_show_func=item_show_func) as progress:
+            for job, page_id, results in scheduler.run(chunks):
+                ds = job[1]
+                for model_name, out_data in results.items():
+                    variant_texts = out_data.pop('variants', {})
+                    if out_data.get('error') in ['timeout', 'memory', 'crash']:
+                        quarantine.strike(model_name, page_id, out_data['error'])
+                    writers[(model_name, ds)].write(page_id, out_data)
+                    for v in variants[model_name]:
+                        writers[(v, ds)].write(page_id, dict(out_data, plaintext=variant_texts.get(v, ''), model=v))
+                    remaining[(model_name, ds)] -= 1
+                    if remaining[(model_name, ds)] == 0:
+                        writers.pop((model_name, ds)).close()
+                        for v in variants[model_name]:
+                            writers.pop((v, ds)).close()
+                progress.update(len(results), job)
+    finally:
+        # Keep partial outputs of unfinished jobs for resuming with skip_existing
+        for writer in writers.values():
+            writer.close(compact=False)
+        quarantine.save()
 
     click.echo(f'Model outputs written to {MODEL_OUTPUTS_PATH}')
@@ -0,0 +1,95 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import sqlite3
+from typing import Optional
+
+from extraction_benchmark.paths import *
+
+
+def html_hash(html: str):
+    """
+    Return the SHA-256 hash of an HTML string, which is used as the content address in the cache.
+
+    :param html: input HTML
+    :return: hash as hex string
+    """
+    return hashlib.sha256(html.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Persistent content-addressed cache of extraction results.
+
+    Results are stored in one SQLite database per extractor and are keyed by the extractor fingerprint
+    (see :func:`extraction_benchmark.extractors.extractors.get_extractor_fingerprint`) and the SHA-256 hash
+    of the input HTML. Entries of outdated extractor versions are never returned.
+    """
+
+    def __init__(self, model_name, cache_path=EXTRACTION_CACHE_PATH):
+        """
+        :param model_name: extractor name
+        :param cache_path: cache directory
+        """
+        self.model_name = model_name
+        self.db_path = os.path.join(cache_path, model_name + '.sqlite')
+        os.makedirs(cache_path, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=120)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS extractions (
+                                  fingerprint TEXT NOT NULL,
+                                  html_hash TEXT NOT NULL,
+                                  plaintext TEXT NOT NULL,
+                                  PRIMARY KEY (fingerprint, html_hash)
+                              ) WITHOUT ROWID''')
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, fingerprint, key) -> Optional[str]:
+        """
+        Look up a cached extraction result.
+
+        :param fingerprint: extractor fingerprint
+        :param key: HTML hash
+        :return: cached plaintext or ``None`` if not cached
+        """
+        row = self._conn.execute('SELECT plaintext FROM extractions WHERE fingerprint = ? AND html_hash = ?',
+                                 (fingerprint, key)).fetchone()
+        return row[0] if row else None
+
+    def put(self, fingerprint, key, plaintext):
+        """
+        Add an extraction result to the cache.
+
+        :param fingerprint: extractor fingerprint
+        :param key: HTML hash
+        :param plaintext: extracted plaintext
+        """
+        # Commit immediately to keep write locks short when several workers share a cache
+        with self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO extractions VALUES (?, ?, ?)', (fingerprint, key, plaintext))
+
+    def close(self):
+        """Close the cache."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
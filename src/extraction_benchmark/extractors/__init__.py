@@ -12,4 +12,4 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .extractors import list_extractors
+from .extractors import EXTRACTOR_COST_CLASSES, get_extractor_info, list_extractors
@@ -12,7 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from collections import defaultdict
 import json
 import os
 import warnings
@@ -20,11 +19,10 @@ import warnings
 import numpy as np
 from bs4 import BeautifulSoup
 import nltk
+from resiliparse.parse.html import HTMLTree
 
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-import tensorflow as tf
-
-from .net.preprocess import get_feature_vector, get_leaves, process
+from .net.inference import NumpyLeafClassifier
+from .net.preprocess import get_leaf_representation, get_leaves, get_leaves_html_tree, get_sparse_feature_vector
 
 BOILERNET_ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
 
@@ -33,15 +31,10 @@ _word_map = None
 _tag_map = None
 
 
-gpus = tf.config.experimental.list_physical_devices('GPU')
-for gpu in gpus:
-    tf.config.experimental.set_memory_growth(gpu, True)
-
-
 def load_model():
     global _model, _word_map, _tag_map
     if not _model:
-        _model = tf.keras.models.load_model(os.path.join(BOILERNET_ROOT_PATH, 'model.h5'))
+        _model = NumpyLeafClassifier(os.path.join(BOILERNET_ROOT_PATH, 'model.h5'))
         nltk.download('punkt', quiet=True)
         with open(os.path.join(BOILERNET_ROOT_PATH, 'words.json')) as f:
             _word_map = json.load(f)
@@ -50,25 +43,105 @@ def load_model():
     return _model, _word_map, _tag_map
 
 
-def extract(html):
-    model, word_map, tag_map = load_model()
+def _get_leaves(html, parser='html5lib'):
+    if parser == 'resiliparse':
+        tree = HTMLTree.parse(html)
+        # Template contents are not part of the Resiliparse DOM, use html5lib for these (rare) pages
+        if tree.document.query_selector('template') is None:
+            return get_leaves_html_tree(tree)
+    elif parser != 'html5lib':
+        raise ValueError(f'Unsupported parser: {parser}')
 
-    tags = defaultdict(int)
-    words = defaultdict(int)
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
         doc = BeautifulSoup(html, features='html5lib')
-    processed = process(doc, tags, words)
-    if not processed:
-        return ''
-
-    inputs = [get_feature_vector(w, t, word_map, tag_map) for w, t, _ in processed]
-    inputs = np.expand_dims(np.stack(inputs), 0)
-    predicted = np.around(model.predict(inputs, verbose=0))
-
-    main_content = ''
-    doc = BeautifulSoup(html, features='html5lib')
-    for i, (leaf, _, _) in enumerate(get_leaves(doc.find_all('html')[0])):
-        if predicted[0, i, 0]:
-            main_content += leaf + '\n'
-    return main_content.strip()
+    return get_leaves(doc.find_all('html')[0])
+
+
+def _get_windows(num_leaves, max_window=None, window_overlap=None):
+    """
+    Split a leaf sequence into overlapping windows.
+
+    Each window contributes predictions only for its inner part, so that all leaves (except those at the beginning
+    and end of the page) are classified with at least ``window_overlap`` leaves of context on either side.
+
+    :param num_leaves: length of the leaf sequence
+    :param max_window: maximum window length (``None`` for a single window)
+    :param window_overlap: number of context leaves on either side (default: a quarter of the window length)
+    :return: list of tuples ``(start, end, keep_start, keep_end)``
+    """
+    if not max_window or num_leaves <= max_window:
+        return [(0, num_leaves, 0, num_leaves)]
+
+    max_window = max(1, int(max_window))
+    if window_overlap is None:
+        window_overlap = max_window // 4
+    window_overlap = max(0, min(int(window_overlap), (max_window - 1) // 2))
+
+    windows = []
+    keep_start = 0
+    while keep_start < num_leaves:
+        start = max(0, keep_start - window_overlap)
+        end = min(num_leaves, start + max_window)
+        keep_end = end if end == num_leaves else end - window_overlap
+        windows.append((start, end, keep_start, keep_end))
+        keep_start = keep_end
+    return windows
+
+
+def extract_batch(htmls, parser='html5lib', max_window=None, window_overlap=None):
+    """
+    Extract the main content of a batch of HTML pages with a single model invocation.
+
+    Pages are parsed only once. Resiliparse is much faster than html5lib, which the model was trained with, and
+    builds the same HTML5 tree for almost all pages. Only heavily malformed markup (e.g., long runs of unclosed
+    formatting tags) can result in different leaf tag lists, since html5lib deviates from the HTML5 standard there.
+
+    If ``max_window`` is set, leaf sequences longer than that are classified in overlapping windows, and at most
+    ``len(htmls)`` windows are passed to the model at once. This bounds the memory needed for inference
+    regardless of the page length, but predictions near the window edges may differ from whole-page inference.
+
+    :param htmls: list of HTML strings
+    :param parser: ``"resiliparse"`` or ``"html5lib"``
+    :param max_window: maximum number of leaves per model input sequence (``None`` for whole pages)
+    :param window_overlap: number of context leaves on either side of a window (default: ``max_window // 4``)
+    :return: list of extracted texts
+    """
+    model, word_map, tag_map = load_model()
+
+    leaves = [_get_leaves(html, parser) for html in htmls]
+    features = [[get_sparse_feature_vector(*get_leaf_representation(*l)[:2], word_map, tag_map) for l in page]
+                for page in leaves]
+    windows = [(i, w) for i, page in enumerate(leaves) if page
+               for w in _get_windows(len(page), max_window, window_overlap)]
+    predicted = [np.zeros(len(page), dtype=bool) for page in leaves]
+
+    # Without windows, all pages are classified at once
+    chunk_size = max(1, len(htmls)) if max_window else max(1, len(windows))
+    for chunk_start in range(0, len(windows), chunk_size):
+        chunk = windows[chunk_start:chunk_start + chunk_size]
+
+        # Padded leaves are masked explicitly, which makes predictions for padded sequences the same as for
+        # sequences on their own
+        max_len = max(end - start for _, (start, end, _, _) in chunk)
+        valid = np.zeros((len(chunk), max_len), dtype=bool)
+        indices = []
+        values = []
+        for b, (i, (start, end, _, _)) in enumerate(chunk):
+            for j, (feature_idx, feature_val) in enumerate(features[i][start:end]):
+                indices.append(np.stack([np.full_like(feature_idx, b), np.full_like(feature_idx, j), feature_idx], 1))
+                values.append(feature_val)
+            valid[b, :end - start] = True
+
+        # Leaf features are sparse, so feed them as (batch, leaf, feature) indices and values
+        y = np.around(model.predict_sparse(np.concatenate(indices), np.concatenate(values),
+                                           (len(chunk), max_len), valid))
+        for b, (i, (start, _, keep_start, keep_end)) in enumerate(chunk):
+            predicted[i][keep_start:keep_end] = y[b, keep_start - start:keep_end - start, 0]
+
+    return ['\n'.join(leaf for (leaf, _, _), p in zip(page, pred) if p).strip()
+            for page, pred in zip(leaves, predicted)]
+
+
+def extract(html, parser='html5lib', max_window=None, window_overlap=None):
+    return extract_batch([html], parser, max_window, window_overlap)[0]
@@ -0,0 +1,234 @@
+#! /usr/bin/python3
+
+
+import argparse
+import json
+
+import h5py
+import numpy as np
+
+
+_ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+    'hard_sigmoid': lambda x: np.clip(0.2 * x + 0.5, 0, 1),
+}
+
+
+def _get_activation(name):
+    """Return a NumPy implementation of a Keras activation function."""
+    if name not in _ACTIVATIONS:
+        raise ValueError('unsupported activation: {}'.format(name))
+    return _ACTIVATIONS[name]
+
+
+def _lstm(x, mask, kernel, recurrent_kernel, bias, activation, recurrent_activation, go_backwards=False):
+    """
+    Run a Keras LSTM layer (gate order i, f, c, o) with return_sequences=True over a batch of sequences.
+    Masked time steps keep the previous state and output zeros, like an LSTM inside a Bidirectional wrapper.
+    """
+    batch_size, num_steps, _ = x.shape
+    units = recurrent_kernel.shape[0]
+    act = _get_activation(activation)
+    rec_act = _get_activation(recurrent_activation)
+
+    # input projections for all time steps at once
+    x_proj = x @ kernel
+    if bias is not None:
+        x_proj += bias
+
+    h = np.zeros((batch_size, units), dtype=x.dtype)
+    c = np.zeros((batch_size, units), dtype=x.dtype)
+    outputs = np.zeros((batch_size, num_steps, units), dtype=x.dtype)
+    steps = range(num_steps - 1, -1, -1) if go_backwards else range(num_steps)
+    for t in steps:
+        z = x_proj[:, t] + h @ recurrent_kernel
+        i = rec_act(z[:, :units])
+        f = rec_act(z[:, units:2 * units])
+        c_new = f * c + i * act(z[:, 2 * units:3 * units])
+        o = rec_act(z[:, 3 * units:])
+        h_new = o * act(c_new)
+
+        m = mask[:, t, None]
+        c = np.where(m, c_new, c)
+        h = np.where(m, h_new, h)
+        outputs[:, t] = np.where(m, h_new, 0)
+    return outputs
+
+
+class NumpyLeafClassifier(object):
+    """
+    Inference-only NumPy implementation of the leaf classifier network (see leaf_classifier.py), which reads the
+    weights from a Keras HDF5 model file and does not need TensorFlow.
+    """
+    def __init__(self, model_file):
+        """Load the layer configuration and weights."""
+        self.layers = []
+        with h5py.File(model_file, 'r') as f:
+            config = json.loads(_to_str(f.attrs['model_config']))['config']
+            layer_configs = config['layers'] if isinstance(config, dict) else config
+            weights = f['model_weights']
+            for layer in layer_configs:
+                name = layer['config']['name']
+                layer_weights = []
+                if name in weights:
+                    names = [_to_str(n) for n in weights[name].attrs['weight_names']]
+                    layer_weights = [(n, weights[name][n][()]) for n in names]
+                self.layers.append((layer['class_name'], layer['config'], layer_weights))
+
+    def predict(self, inputs, valid=None):
+        """
+        Return the predictions for a batch of zero-padded input sequences.
+
+        :param inputs: input features of shape (batch, steps, features)
+        :param valid: boolean array of shape (batch, steps) that marks non-padding steps (optional)
+        :return: predictions of shape (batch, steps, 1)
+        """
+        return self._forward(np.asarray(inputs, dtype='float32'), self._get_layers(), valid)
+
+    def predict_sparse(self, indices, values, shape, valid=None):
+        """
+        Return the predictions for a batch of sparse input sequences. The first dense layer is computed as a
+        sparse-dense product, so the dense input features are never materialized.
+
+        :param indices: integer array of shape (nnz, 3) with the (batch, step, feature) indices of non-zero inputs
+        :param values: array of shape (nnz,) with the non-zero input values
+        :param shape: tuple of batch size and number of steps
+        :param valid: boolean array of shape (batch, steps) that marks non-padding steps (optional)
+        :return: predictions of shape (batch, steps, 1)
+        """
+        layers = self._get_layers()
+        class_name, config, weights = layers[0]
+        if class_name != 'Dense':
+            raise ValueError('the first layer must be a dense layer for sparse inputs')
+
+        kernel = _get_weight(weights, 'kernel')
+        indices = np.asarray(indices).reshape(-1, 3)
+        x = np.zeros((shape[0] * shape[1], kernel.shape[1]), dtype='float32')
+        np.add.at(x, indices[:, 0] * shape[1] + indices[:, 1],
+                  np.asarray(values, dtype='float32')[:, None] * kernel[indices[:, 2]])
+        x = self._dense(x.reshape(shape[0], shape[1], -1), config, weights, skip_kernel=True)
+        return self._forward(x, layers[1:], valid)
+
+    def _get_layers(self):
+        return [l for l in self.layers if l[0] not in ('InputLayer', 'Dropout')]
+
+    @staticmethod
+    def _dense(x, config, weights, skip_kernel=False):
+        if not skip_kernel:
+            x = x @ _get_weight(weights, 'kernel')
+        if config.get('use_bias', True):
+            x = x + _get_weight(weights, 'bias')
+        return _get_activation(config['activation'])(x)
+
+    def _forward(self, x, layers, valid):
+        mask = None
+        for class_name, config, weights in layers:
+            if class_name == 'Dense':
+                x = self._dense(x, config, weights)
+            elif class_name == 'Masking':
+                mask = np.any(x != config.get('mask_value', 0.0), axis=-1)
+                if valid is not None:
+                    mask &= np.asarray(valid, dtype=bool)
+                x = x * mask[..., None]
+            elif class_name == 'Bidirectional':
+                x = self._bidirectional(x, mask, config, weights)
+            else:
+                raise ValueError('unsupported layer: {}'.format(class_name))
+        return x
+
+    @staticmethod
+    def _bidirectional(x, mask, config, weights):
+        lstm_config = config['layer']['config']
+        if config['layer']['class_name'] != 'LSTM' or not lstm_config.get('return_sequences'):
+            raise ValueError('only LSTMs returning sequences are supported in Bidirectional layers')
+        if mask is None:
+            mask = np.ones(x.shape[:2], dtype=bool)
+
+        outputs = []
+        for direction, go_backwards in [('forward', False), ('backward', True)]:
+            w = [(n, v) for n, v in weights if '/{}_'.format(direction) in '/' + n]
+            outputs.append(_lstm(
+                x, mask,
+                _get_weight(w, 'kernel'),
+                _get_weight(w, 'recurrent_kernel'),
+                _get_weight(w, 'bias') if lstm_config.get('use_bias', True) else None,
+                lstm_config.get('activation', 'tanh'),
+                lstm_config.get('recurrent_activation', 'sigmoid'),
+                go_backwards=go_backwards))
+
+        merge_mode = config.get('merge_mode', 'concat')
+        if merge_mode == 'concat':
+            return np.concatenate(outputs, axis=-1)
+        if merge_mode == 'sum':
+            return outputs[0] + outputs[1]
+        if merge_mode == 'mul':
+            return outputs[0] * outputs[1]
+        if merge_mode == 'ave':
+            return (outputs[0] + outputs[1]) / 2
+        raise ValueError('unsupported merge mode: {}'.format(merge_mode))
+
+
+def _to_str(s):
+    return s.decode('utf-8') if isinstance(s, bytes) else s
+
+
+def _get_weight(weights, name):
+    """Return the weight whose name ends with "<name>:0"."""
+    for n, v in weights:
+        if n.rsplit('/', 1)[-1].split(':')[0] == name:
+            return v
+    raise KeyError('weight not found: {}'.format(name))
+
+
+def main():
+    """Check that the dense and sparse NumPy implementations match the Keras predictions on a set of HTML files."""
+    ap = argparse.ArgumentParser()
+    ap.add_argument('MODEL_FILE', help='Keras model file (.h5)')
+    ap.add_argument('HTML_FILES', nargs='+', help='HTML files to classify')
+    ap.add_argument('-w', '--words', required=True, help='Word map (words.json)')
+    ap.add_argument('-t', '--tags', required=True, help='Tag map (tags.json)')
+    ap.add_argument('--atol', type=float, default=1e-4, help='Maximum absolute difference of predictions')
+    args = ap.parse_args()
+
+    import tensorflow as tf
+    from bs4 import BeautifulSoup
+    from .preprocess import get_feature_vector, get_leaf_representation, get_leaves, get_sparse_feature_vector
+
+    with open(args.words) as fp:
+        word_map = json.load(fp)
+    with open(args.tags) as fp:
+        tag_map = json.load(fp)
+    keras_model = tf.keras.models.load_model(args.MODEL_FILE)
+    numpy_model = NumpyLeafClassifier(args.MODEL_FILE)
+
+    max_diff = 0.0
+    num_flipped = 0
+    for f in args.HTML_FILES:
+        with open(f, 'rb') as hfile:
+            doc = BeautifulSoup(hfile, features='html5lib')
+        leaves = get_leaves(doc.find_all('html')[0])
+        if not leaves:
+            continue
+        inputs = np.expand_dims(np.stack([
+            get_feature_vector(*get_leaf_representation(*l)[:2], word_map, tag_map) for l in leaves]), 0)
+        y_keras = keras_model.predict(inputs, verbose=0)
+        y_numpy = numpy_model.predict(inputs)
+        sparse = [get_sparse_feature_vector(*get_leaf_representation(*l)[:2], word_map, tag_map) for l in leaves]
+        indices = np.concatenate([np.stack([np.zeros_like(i), np.full_like(i, j), i], axis=1)
+                                  for j, (i, _) in enumerate(sparse)])
+        y_sparse = numpy_model.predict_sparse(indices, np.concatenate([v for _, v in sparse]), (1, len(leaves)))
+        max_diff = max(max_diff, float(np.max(np.abs(y_numpy - y_sparse))))
+        max_diff = max(max_diff, float(np.max(np.abs(y_keras - y_numpy))))
+        num_flipped += int(np.sum(np.around(y_keras) != np.around(y_numpy)))
+
+    print('maximum absolute difference: {}'.format(max_diff))
+    print('flipped labels: {}'.format(num_flipped))
+    if max_diff > args.atol:
+        raise SystemExit('NumPy predictions differ from Keras predictions')
+
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,6 @@ from collections import defaultdict
 
 import nltk
 import numpy as np
-import tensorflow as tf
 from bs4 import BeautifulSoup, NavigableString
 from tqdm import tqdm
 
@@ -18,18 +17,63 @@ from .misc import util
 
 def get_leaves(node, tag_list=[], label=0):
     """Return all leaves (NavigableStrings) in a BS4 tree."""
-    tag_list_new = tag_list + [node.name]
-    if node.has_attr('__boilernet_label'):
-        label = int(node['__boilernet_label'])
+    def _enter(n, tags, lbl):
+        if n.has_attr('__boilernet_label'):
+            lbl = int(n['__boilernet_label'])
+        return iter(n.children), tags + [n.name], lbl
 
+    # iterative depth-first traversal, deep DOMs would exceed the recursion limit
     result = []
-    for c in node.children:
-        if isinstance(c, NavigableString):
-            # might be just whitespace
-            if c.string is not None and c.string.strip():
-                result.append((c, tag_list_new, label))
-        elif c.name not in util.TAGS_TO_IGNORE:
-            result.extend(get_leaves(c, tag_list_new, label))
+    stack = [_enter(node, tag_list, label)]
+    while stack:
+        children, tags, lbl = stack[-1]
+        for c in children:
+            if isinstance(c, NavigableString):
+                # might be just whitespace
+                if c.string is not None and c.string.strip():
+                    result.append((c, tags, lbl))
+            elif c.name not in util.TAGS_TO_IGNORE:
+                stack.append(_enter(c, tags, lbl))
+                break
+        else:
+            stack.pop()
+    return result
+
+
+def get_leaves_html_tree(tree):
+    """
+    Return all leaves (as strings) in a Resiliparse HTMLTree in the same format as get_leaves().
+    Resiliparse is much faster than html5lib and builds the same tree for all but heavily malformed pages.
+    Template contents are not part of the Resiliparse DOM and tag names of SVG elements are lower case.
+    """
+    from resiliparse.parse.html import NodeType
+
+    root = tree.document.first_child
+    while root is not None and not (root.type == NodeType.ELEMENT and root.tag == 'html'):
+        root = root.next
+    if root is None:
+        return []
+
+    def _enter(n, tags, lbl):
+        if n.hasattr('__boilernet_label'):
+            lbl = int(n.getattr('__boilernet_label'))
+        return n.first_child, tags + [n.tag], lbl
+
+    result = []
+    stack = [_enter(root, [], 0)]
+    while stack:
+        c, tags, lbl = stack.pop()
+        while c is not None:
+            if c.type in (NodeType.TEXT, NodeType.COMMENT, NodeType.CDATA_SECTION):
+                # comments are leaves, too (BS4 comments are NavigableStrings)
+                text = c.text
+                if text.strip():
+                    result.append((text, tags, lbl))
+            elif c.type == NodeType.ELEMENT and c.tag not in util.TAGS_TO_IGNORE:
+                stack.append((c.next, tags, lbl))
+                stack.append(_enter(c, tags, lbl))
+                break
+            c = c.next
     return result
 
 
@@ -39,7 +83,7 @@ def get_leaf_representation(node, tag_list, label):
     for tag in tag_list:
         tags_dict[tag] += 1
     words_dict = defaultdict(int)
-    for word in nltk.word_tokenize(node.string):
+    for word in nltk.word_tokenize(str(node)):
         words_dict[word.lower()] += 1
     return dict(words_dict), dict(tags_dict), label
 
@@ -96,6 +140,21 @@ def get_feature_vector(words_dict, tags_dict, word_map, tag_map):
     return np.concatenate([vocab_vec, tags_vec])
 
 
+def get_sparse_feature_vector(words_dict, tags_dict, word_map, tag_map):
+    """
+    Return the non-zero entries of the feature vector from get_feature_vector() as index and value arrays.
+    Like in the dense vector, the count of a later OOV word or tag replaces that of an earlier one.
+    """
+    entries = {}
+    for word, num in words_dict.items():
+        entries[word_map.get(word, 0)] = num
+    for tag, num in tags_dict.items():
+        entries[len(word_map) + tag_map.get(tag, 0)] = num
+    entries = {i: num for i, num in entries.items() if num != 0}
+    return np.fromiter(entries.keys(), dtype='int64', count=len(entries)), \
+        np.fromiter(entries.values(), dtype='int32', count=len(entries))
+
+
 def get_vocabulary(d, num=None):
     """Return an integer map of the top-k vocabulary items and add <UNK>."""
     l = sorted(d.keys(), key=d.get, reverse=True)
@@ -108,6 +167,7 @@ def get_vocabulary(d, num=None):
 
 def get_doc_inputs(docs, word_map, tag_map):
     """Transform "docs" into the input format accepted by the classifier."""
+    import tensorflow as tf
 
     def _int64_feature(l):
         """Return an int64_list."""
@@ -127,6 +187,7 @@ def get_doc_inputs(docs, word_map, tag_map):
 
 def write_tfrecords(filename, dataset, word_map, tag_map):
     """Write the dataset to a .tfrecords file."""
+    import tensorflow as tf
     with tf.io.TFRecordWriter(filename) as writer:
         for doc_feature_list, doc_label_list in get_doc_inputs(dataset, word_map, tag_map):
             f = {'doc_feature_list': doc_feature_list, 'doc_label_list': doc_label_list}
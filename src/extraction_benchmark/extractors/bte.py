@@ -13,6 +13,15 @@ Python implementation by Jan Pomikalek <xpomikal@fi.muni.cz>
 
 import re
 
+_BODY_START_RE = re.compile(r'^.*<body(\s[^>]*)?>', re.S | re.I)
+_BODY_END_RE = re.compile(r'</body>.*$', re.S | re.I)
+# (.|\s)*? and \s+[^>]* match the same as .*? and \s[^>]* (with re.S), but backtrack exponentially
+# or quadratically on unterminated elements
+_SCRIPT_RE = re.compile(r'<script(\s[^>]*)?>.*?</script>', re.S | re.I)
+_STYLE_RE = re.compile(r'<style(\s[^>]*)?>.*?</style>', re.S | re.I)
+_TOKEN_RE = re.compile(r'<[^>]+>|[^\s<]+')
+_TAG_NAME_RE = re.compile(r'^<([^\s>]+)')
+
 
 def html2text(html_text, preserve_par=False, preserve_head_list_par=False):
     """
@@ -33,7 +42,7 @@ def html2text(html_text, preserve_par=False, preserve_head_list_par=False):
     blocks = []
     block = []
     for token in cleaned_body:
-        if token_value(token) > 0:
+        if not token.startswith('<'):
             block.append(token)
         else:
             if len(block) > 0:
@@ -54,18 +63,14 @@ def preclean(html_text):
     """
 
     # strip all but body
-    cleaned_text = re.compile('^.*<body(\s+[^>]*)?>', re.S | re.I
-            ).sub('', html_text)
-    cleaned_text = re.compile('</body>.*$', re.S | re.I
-            ).sub('', cleaned_text)
+    cleaned_text = _BODY_START_RE.sub('', html_text)
+    cleaned_text = _BODY_END_RE.sub('', cleaned_text)
 
     # strip scripts
-    cleaned_text = re.compile('<script(\s+[^>]*)?>(.|\s)*?</script>',
-            re.S | re.I).sub('<script></script>', cleaned_text)
+    cleaned_text = _SCRIPT_RE.sub('<script></script>', cleaned_text)
 
     # strip styles
-    cleaned_text = re.compile('<style(\s+[^>]*)?>(.|\s)*?</style>',
-            re.S | re.I).sub('<style></style>', cleaned_text)
+    cleaned_text = _STYLE_RE.sub('<style></style>', cleaned_text)
 
     # html entities
     cleaned_text = html_entities(cleaned_text)
@@ -75,9 +80,9 @@ def preclean(html_text):
 
 def html_entities(html_text):
     "Substitution of the most commonly used HTML entities."
-    html_text = re.sub('&quot;', '"', html_text)
-    html_text = re.sub('&nbsp;', ' ', html_text)
-    html_text = re.sub('&#39;', "'", html_text)
+    html_text = html_text.replace('&quot;', '"')
+    html_text = html_text.replace('&nbsp;', ' ')
+    html_text = html_text.replace('&#39;', "'")
     return html_text
 
 
@@ -86,7 +91,7 @@ def tokenise(html_text):
     Tokenises HTML document to a sequence of HTML tags and strings of
     non-whitespace characters (words).
     """
-    return [g1 for (g1, g2) in re.findall('(<([^>]|\s)+>|[^\s<]+)', html_text)]
+    return _TOKEN_RE.findall(html_text)
 
 
 def bte(tokens):
@@ -94,14 +99,17 @@ def bte(tokens):
     BTE algorithm. Expects a sequence of HTML tags and words as input parameter.
     Outputs a pair of indices which indicate the beginning and end of the main
     body.
+
+    Among several breakpoint ranges with the maximum score, the one with the
+    smallest start and then the smallest end is returned.
     """
 
-    # find breakpoints
+    # find breakpoints (end index and score of each run of tags or words)
     breakpoints = []
     prev_value = None
     sum_value = 0
-    for i in range(len(tokens)):
-        cur_value = token_value(tokens[i])
+    for i, token in enumerate(tokens):
+        cur_value = -1 if token.startswith('<') else 1
         if prev_value and cur_value != prev_value:
             breakpoints.append((i-1, sum_value))
             sum_value = 0
@@ -109,59 +117,61 @@ def bte(tokens):
         prev_value = cur_value
     breakpoints.append((len(tokens)-1, sum_value))
 
-    # find breakpoints range which maximises the score
-    max_score = 0
-    max_start = 0
-    max_end   = 0
-    for i in range(len(breakpoints)):
-        score = breakpoints[i][1]
-        if score > max_score:
-            max_score = score
-            if i > 0: max_start = breakpoints[i-1][0]+1
-            else:     max_start = 0
-            max_end   = breakpoints[i][0]
-        for j in range(i+1, len(breakpoints)):
-            score+= breakpoints[j][1]
-            if score > max_score:
-                max_score = score
-                if i > 0: max_start = breakpoints[i-1][0]+1
-                else:     max_start = 0
-                max_end   = breakpoints[j][0]
+    # find breakpoints range which maximises the score, the score of range
+    # i..j is prefix[j+1] - prefix[i]
+    prefix = [0]
+    for _, score in breakpoints:
+        prefix.append(prefix[-1] + score)
 
+    max_score = 0
+    min_prefix = prefix[0]
+    for p in prefix[1:]:
+        max_score = max(max_score, p - min_prefix)
+        min_prefix = min(min_prefix, p)
+    if max_score <= 0:
+        return (0, 0)
+
+    # first start i whose best range reaches the maximum score
+    suffix_max = prefix[-1]
+    best_i = None
+    for i in range(len(breakpoints) - 1, -1, -1):
+        suffix_max = max(suffix_max, prefix[i+1])
+        if suffix_max - prefix[i] == max_score:
+            best_i = i
+
+    # first end j for this start
+    best_j = best_i
+    while prefix[best_j+1] - prefix[best_i] != max_score:
+        best_j+= 1
+
+    max_start = breakpoints[best_i-1][0]+1 if best_i > 0 else 0
+    max_end = breakpoints[best_j][0]
     return (max_start, max_end)
 
 
-def token_value(token):
-    "Returns -1 if the token is HTML tag, 1 otherwise (if word)."
-    if token.startswith('<'):
-        return -1
-    else:
-        return 1
-
-
 def find_paragraphs(tokens, tag_h_l=False):
     """
     Marks paragraph blocks with <p>. If tag_h_l set to True, headers and
     list items are also detected and marked with <h> and <l> respectively.
     """
 
-    PAR_FIND_TAGS = ['p', 'div', 'hr', 'blockquote', 'table']
+    PAR_FIND_TAGS = {'p', 'div', 'hr', 'blockquote', 'table'}
     PAR_REPLACE_TAG = '<p>'
-    HEADER_FIND_TAGS = ['h1', 'h2', 'h3']
+    HEADER_FIND_TAGS = {'h1', 'h2', 'h3'}
     HEADER_REPLACE_TAG = '<h>'
-    LIST_FIND_TAGS = ['li']
+    LIST_FIND_TAGS = {'li'}
     LIST_REPLACE_TAG = '<l>'
     result = [PAR_REPLACE_TAG]
 
     in_paragraph = False
     for token in tokens:
-        if token_value(token) > 0:
+        if not token.startswith('<'):
             result.append(token)
             in_paragraph = True
         else:
             if not in_paragraph:
                 continue
-            m = re.search('^<([^\s>]+)', token)
+            m = _TAG_NAME_RE.search(token)
             if not m:
                 continue
             tag = m.group(1).lower()
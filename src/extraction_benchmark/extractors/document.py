@@ -0,0 +1,59 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+
+
+class Document:
+    """
+    Handle for a single HTML page that builds each parser representation of the page lazily and only once.
+
+    The same document can be passed to all extractors running on a page, so that the page is not parsed
+    again by every extractor. Shared trees must be treated as read-only. Extractors that need to modify a
+    tree should request a copy instead.
+    """
+
+    def __init__(self, html):
+        """
+        :param html: HTML string
+        """
+        self.html = html
+        self._trees = {}
+
+    def _get_tree(self, kind, builder):
+        if kind not in self._trees:
+            self._trees[kind] = builder(self.html)
+        return self._trees[kind]
+
+    @property
+    def lxml_tree(self):
+        """Shared :mod:`lxml.html` tree as returned by :func:`lxml.html.fromstring`."""
+        import lxml.html
+        return self._get_tree('lxml', lxml.html.fromstring)
+
+    def lxml_tree_copy(self):
+        """Mutable copy of :attr:`lxml_tree` (much cheaper than parsing the page again)."""
+        return copy.deepcopy(self.lxml_tree)
+
+    @property
+    def html_text_tree(self):
+        """Shared :mod:`lxml.html` tree as returned by :func:`html_text.parse_html`."""
+        import html_text
+        return self._get_tree('html_text', html_text.parse_html)
+
+    @property
+    def html_tree(self):
+        """Shared Resiliparse :class:`~resiliparse.parse.html.HTMLTree`."""
+        from resiliparse.parse.html import HTMLTree
+        return self._get_tree('resiliparse', HTMLTree.parse)
@@ -12,55 +12,85 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from collections import defaultdict
-
+import numpy as np
 from resiliparse.extract.html2text import extract_plain_text
 from resiliparse.parse.html import HTMLTree
 
-from extraction_benchmark.paths import *
-from extraction_benchmark.util import read_jsonl, tokenize_ws
+from extraction_benchmark.model_outputs import ModelAnswerStore
+from extraction_benchmark.util import tokenize_ws
 
 
-_MODEL_ANSWERS = defaultdict(dict)
+_ANSWER_STORE = None
+_INDEXED_MODELS = set()
 _ENSEMBLE_MODELS = {}
 
 
-def _load_model_answers(input_models):
-    for m in input_models:
-        if m in _MODEL_ANSWERS:
-            continue
-        for ds in os.listdir(MODEL_OUTPUTS_PATH):
-            in_file = os.path.join(MODEL_OUTPUTS_PATH, ds, m + '.jsonl')
-            if not os.path.isfile(in_file):
-                continue
-            for answer in read_jsonl(in_file):
-                _MODEL_ANSWERS[m][answer['page_id']] = ' '.join(tokenize_ws(answer['plaintext']))
+def _get_model_answers(page_id, input_models, answers=None, dataset=None):
+    """
+    Look up the answers of the input models to a page.
+
+    :param answers: dict of precomputed model answers to use instead of the stored model outputs
+    :param dataset: dataset of the page (stored answers from any dataset if ``None``)
+    :return: dict of model names and whitespace-normalized answers
+    """
+    if answers is not None:
+        return {m: ' '.join(tokenize_ws(answers.get(m) or '')) for m in input_models}
+
+    global _ANSWER_STORE
+    if _ANSWER_STORE is None:
+        _ANSWER_STORE = ModelAnswerStore()
+    missing = [m for m in input_models if m not in _INDEXED_MODELS]
+    if missing:
+        _ANSWER_STORE.update(missing)
+        _INDEXED_MODELS.update(missing)
+    answers = _ANSWER_STORE.get(page_id, input_models, dataset)
+    return {m: ' '.join(tokenize_ws(answers.get(m, ''))) for m in input_models}
 
 
 def pad_str_zero(s, n):
     return ('\0 ' * n) + s + (' \0' * n)
 
 
-def pad_str_space(s):
-    return ' ' + s + ' '
+def _answer_ngrams(answer, n):
+    """
+    Get the set of n-grams of a padded answer string which a substring search for the space-padded n-gram
+    ``" t1 ... tn "`` in the answer would find, i.e., all n-grams that include neither the first nor the last token.
 
+    :param answer: answer padded with :func:`pad_str_zero`
+    :param n: n-gram size
+    :return: set of n-gram token tuples
+    """
+    tokens = answer.split(' ')[1:-1]
+    return {tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1)}
 
-def extract_majority_vote(html, page_id, input_models, model_weights, vote_threshold, ngram_size=5):
-    _load_model_answers(input_models)
-    tree = HTMLTree.parse(html)
+
+def _page_ngrams(html, ngram_size, doc=None):
+    """
+    Get the padded tokens and the n-grams of a page's plain text.
+
+    :return: list of tokens and list of n-gram token tuples starting at each token
+    """
+    tree = doc.html_tree if doc is not None else HTMLTree.parse(html)
     text = pad_str_zero(extract_plain_text(
         tree, main_content=False, preserve_formatting=False, list_bullets=False,
         links=False, alt_texts=False, noscript=False, form_fields=False), ngram_size - 1)
     tokens = tokenize_ws(text)
+    return tokens, [tuple(tokens[i:i + ngram_size]) for i in range(len(tokens) - ngram_size + 1)]
+
+
+def extract_majority_vote(html, page_id, input_models, model_weights, vote_threshold, ngram_size=5, doc=None,
+                          answers=None, dataset=None):
+    answers = _get_model_answers(page_id, input_models, answers, dataset)
+    answer_ngrams = [_answer_ngrams(pad_str_zero(answers[m], ngram_size), ngram_size) for m in input_models]
+    tokens, ngrams = _page_ngrams(html, ngram_size, doc)
     token_votes = [0] * len(tokens)
 
     for ti in range(ngram_size - 1, len(tokens) - ngram_size + 1):
-        ngram_str_l = pad_str_space(' '.join(tokens[ti - ngram_size + 1:ti + 1]))
-        ngram_str_r = pad_str_space(' '.join(tokens[ti:ti + ngram_size]))
+        ngram_l = ngrams[ti - ngram_size + 1]
+        ngram_r = ngrams[ti]
 
-        for m, w in zip(input_models, model_weights):
-            answer = pad_str_zero(_MODEL_ANSWERS[m].get(page_id, ''), ngram_size)
-            if ngram_str_l in answer or ngram_str_r in answer:
+        for m_ngrams, w in zip(answer_ngrams, model_weights):
+            if ngram_l in m_ngrams or ngram_r in m_ngrams:
                 token_votes[ti] += 1 * w
             if token_votes[ti] >= vote_threshold:
                 break
@@ -70,3 +100,54 @@ def extract_majority_vote(html, page_id, input_models, model_weights, vote_thres
     token_votes = token_votes[ngram_size - 1:len(token_votes) - ngram_size + 1]
 
     return ' '.join(t for t, v in zip(tokens, token_votes) if v >= vote_threshold)
+
+
+def get_vote_matrix(html, page_id, input_models, ngram_size=5, doc=None, answers=None, dataset=None):
+    """
+    Determine which input models vote for which tokens of a page.
+
+    :param answers: dict of precomputed model answers to use instead of the stored model outputs
+    :param dataset: dataset of the page for looking up stored model answers
+    :return: list of page tokens and boolean token-by-model vote matrix
+    """
+    answers = _get_model_answers(page_id, input_models, answers, dataset)
+    answer_ngrams = [_answer_ngrams(pad_str_zero(answers[m], ngram_size), ngram_size) for m in input_models]
+    tokens, ngrams = _page_ngrams(html, ngram_size, doc)
+
+    # Strip padding
+    tokens = tokens[ngram_size - 1:len(tokens) - ngram_size + 1]
+    hits = np.zeros((len(tokens), len(input_models)), dtype=bool)
+    for ti in range(len(tokens)):
+        ngram_l = ngrams[ti]
+        ngram_r = ngrams[ti + ngram_size - 1]
+        for mi, m_ngrams in enumerate(answer_ngrams):
+            hits[ti, mi] = ngram_l in m_ngrams or ngram_r in m_ngrams
+    return tokens, hits
+
+
+def sweep_majority_vote(html, page_id, input_models, weightings, thresholds, ngram_size=5, doc=None,
+                        answers=None, dataset=None):
+    """
+    Run majority votes with several model weightings and vote thresholds at once.
+
+    Which input models vote for a token is determined only once per page. The token votes of all weightings are
+    then computed as a single product of the token-by-model vote matrix and the weighting matrix. With
+    non-negative weights, the outputs are the same as those of :func:`extract_majority_vote`.
+
+    :param weightings: dict of weighting keys and lists of model weights in the order of ``input_models``
+    :param thresholds: dict of threshold keys and vote thresholds
+    :param answers: dict of precomputed model answers to use instead of the stored model outputs
+    :param dataset: dataset of the page for looking up stored model answers
+    :return: dict of ``(weighting key, threshold key)`` tuples and extracted texts
+    """
+    tokens, hits = get_vote_matrix(html, page_id, input_models, ngram_size, doc, answers, dataset)
+
+    weighting_keys = list(weightings)
+    weight_matrix = np.array([weightings[k] for k in weighting_keys], dtype=float).reshape(-1, len(input_models))
+    votes = hits.astype(float) @ weight_matrix.T
+
+    results = {}
+    for wi, w in enumerate(weighting_keys):
+        for t, threshold in thresholds.items():
+            results[(w, t)] = ' '.join(tok for tok, v in zip(tokens, votes[:, wi] >= threshold) if v)
+    return results
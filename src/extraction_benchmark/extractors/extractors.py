@@ -12,8 +12,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from functools import lru_cache
+import hashlib
+from importlib import metadata
+import inspect
+import json
+import os
 import re
 
+from extraction_benchmark.extractors.document import Document
+from extraction_benchmark.extractors.instances import InstancePool
+
+# Initialised extractor instances of the current worker process
+_INSTANCES = InstancePool()
+
+
 def extract_bs4(html, **_):
     from bs4 import BeautifulSoup
     soup = BeautifulSoup(html, 'html.parser')
@@ -29,9 +42,8 @@ def extract_boilerpipe(html, **_):
     return str(text)
 
 
-def extract_xpath_text(html, **_):
-    import lxml.html
-    root = lxml.html.fromstring(html)
+def extract_xpath_text(html, doc=None, **_):
+    root = (doc or Document(html)).lxml_tree
     text = ' '.join(root.xpath('//body[1]//*[not(name()="script") and not(name()="style")]/text()'))
     text = re.sub(r'(\s+\n\s*)', '\n', text)
     return re.sub(r'[ \t]{2,}', ' ', text)
@@ -49,9 +61,14 @@ def extract_readability(html, **_):
     return text
 
 
-def extract_go_domdistiller(html, **_):
+def extract_go_domdistiller(html, instances=1, **_):
     from extraction_benchmark.extractors import go_domdistiller
-    return go_domdistiller.extract(html)
+    return go_domdistiller.extract(html, instances=instances)
+
+
+def batch_extract_go_domdistiller(htmls, instances=1, **_):
+    from extraction_benchmark.extractors import go_domdistiller
+    return go_domdistiller.extract_batch(htmls, instances=instances)
 
 
 def extract_inscriptis(html, **_):
@@ -60,15 +77,15 @@ def extract_inscriptis(html, **_):
     return text
 
 
-def extract_html_text(html, **_):
+def extract_html_text(html, doc=None, **_):
     import html_text
-    return html_text.extract_text(html)
+    # html_text cleans a copy of the tree, so the shared tree can be passed directly
+    return html_text.extract_text((doc or Document(html)).html_text_tree)
 
 
-def extract_resiliparse(html, **_):
+def extract_resiliparse(html, doc=None, **_):
     from resiliparse.extract import html2text
-    from resiliparse.parse.html import HTMLTree
-    return html2text.extract_plain_text(HTMLTree.parse(html),
+    return html2text.extract_plain_text((doc or Document(html)).html_tree,
                                         preserve_formatting=True,
                                         main_content=True,
                                         list_bullets=False,
@@ -87,26 +104,39 @@ def extract_trafilatura(html, **_):
     return trafilatura.extract(html, include_comments=False)
 
 
+def _make_justext_stoplist():
+    import justext
+    return justext.get_stoplist("English")
+
+
 def extract_justext(html, **_):
     import justext
-    article = ' '.join(
-        [p.text for p in justext.justext(html, justext.get_stoplist("English"), 50, 200, 0.1, 0.2, 0.2, 200, True)
-         if not p.is_boilerplate])
+    with _INSTANCES.use('justext') as stoplist:
+        article = ' '.join(
+            [p.text for p in justext.justext(html, stoplist, 50, 200, 0.1, 0.2, 0.2, 200, True)
+             if not p.is_boilerplate])
     return article
 
 
-def extract_goose3(html, **_):
+def _make_goose3():
     from goose3 import Goose, configuration
     c = configuration.Configuration()
     c.http_timeout = 5
+    return Goose(c)
+
+
 
-    with Goose(c) as g:
+def _close_goose3(g):
+    g.close()
+
+
+def extract_goose3(html, **_):
+    with _INSTANCES.use('goose3') as g:
         article = g.extract(raw_html=html)
         return article.cleaned_text
 
 
-def extract_lxml_cleaner(html, **_):
-    from bs4 import BeautifulSoup
+def _make_lxml_cleaner():
     from lxml.html.clean import Cleaner
 
     tag_blacklist = [
@@ -122,7 +152,7 @@ def extract_lxml_cleaner(html, **_):
         'style', 'track', 'template', 'textarea', 'time', 'use',
     ]
 
-    cleaner = Cleaner(
+    return Cleaner(
         annoying_tags=False,  # True
         comments=True,
         embedded=False,  # True
@@ -139,12 +169,28 @@ def extract_lxml_cleaner(html, **_):
         style=False,
         kill_tags=tag_blacklist
     )
-    return BeautifulSoup(cleaner.clean_html(html), 'html.parser').get_text(separator=' ', strip=True)
 
 
-def extract_boilernet(html, **_):
+def extract_lxml_cleaner(html, doc=None, **_):
+    from bs4 import BeautifulSoup
+    import lxml.html
+
+    # Same as cleaner.clean_html(html), but cleans a copy of the shared tree in place
+    tree = (doc or Document(html)).lxml_tree_copy()
+    with _INSTANCES.use('lxml_cleaner') as cleaner:
+        cleaner(tree)
+    soup = BeautifulSoup(lxml.html.tostring(tree, encoding='unicode'), 'html.parser')
+    return soup.get_text(separator=' ', strip=True)
+
+
+def extract_boilernet(html, parser='html5lib', max_window=None, window_overlap=None, **_):
+    from extraction_benchmark.extractors import boilernet
+    return boilernet.extract(html, parser=parser, max_window=max_window, window_overlap=window_overlap)
+
+
+def batch_extract_boilernet(htmls, parser='html5lib', max_window=None, window_overlap=None, **_):
     from extraction_benchmark.extractors import boilernet
-    return boilernet.extract(html)
+    return boilernet.extract_batch(htmls, parser=parser, max_window=max_window, window_overlap=window_overlap)
 
 
 def extract_web2text(html, **_):
@@ -152,6 +198,11 @@ def extract_web2text(html, **_):
     return web2text.extract(html)
 
 
+def batch_extract_web2text(htmls, **_):
+    from extraction_benchmark.extractors import web2text
+    return web2text.extract_batch(htmls)
+
+
 def extract_newspaper3k(html, **_):
     import newspaper
     article = newspaper.Article('')
@@ -165,9 +216,14 @@ def extract_dragnet(html, **_):
     return extract_content(html, encoding='utf8')
 
 
-def extract_extractnet(html, **_):
+def _make_extractnet():
     from extractnet import Extractor
-    return Extractor().extract(html, encoding='utf8').get('content', '')
+    return Extractor()
+
+
+def extract_extractnet(html, **_):
+    with _INSTANCES.use('extractnet') as extractor:
+        return extractor.extract(html, encoding='utf8').get('content', '')
 
 
 def _get_ensemble_model_list(best_only=False, weighted=False, chosen_models = []):
@@ -191,29 +247,195 @@ def _get_ensemble_model_list(best_only=False, weighted=False, chosen_models = []
     return return_value
 
 
-def extract_ensemble_majority(html, page_id, chosen_models = []):
+def get_output_variants(name, options=None):
+    """
+    Get the names of the additional outputs that an extractor produces with the given options.
+
+    Ensembles run with a ``thresholds`` option (list of vote thresholds as fractions of the number of input
+    models) and/or a ``weightings`` option (dict of weighting names and dicts of model weights, missing models
+    have weight 1) produce one output for each combination of weighting and threshold in addition to their
+    default output. Variants are named ``<ensemble>[.<weighting>][.t<threshold>]``.
+
+    :param name: extractor name
+    :param options: dict of extractor options
+    :return: dict of variant names and ``(weighting, threshold)`` tuples (``None`` for the default)
+    """
+    options = options or {}
+    if not name.startswith('ensemble_'):
+        return {}
+    variants = {}
+    for w in [None, *(options.get('weightings') or {})]:
+        for t in [None, *(options.get('thresholds') or [])]:
+            if w is None and t is None:
+                continue
+            variants[name + (f'.{w}' if w is not None else '') + (f'.t{t}' if t is not None else '')] = (w, t)
+    return variants
+
+
+def get_ensemble_members(name, chosen_models=()):
+    """
+    Get the member models of an ensemble.
+
+    :param name: ensemble name
+    :param chosen_models: chosen member models
+    :return: list of member model names
+    """
+    if name == 'ensemble_majority' or chosen_models:
+        models, _ = _get_ensemble_model_list(chosen_models=chosen_models)
+    else:
+        models, _ = _get_ensemble_model_list(chosen_models=chosen_models, best_only=True)
+    return list(models)
+
+
+def _majority_vote(name, html, page_id, models, weights, doc=None, thresholds=None, weightings=None,
+                   member_answers=None, dataset=None):
     from extraction_benchmark.extractors import ensemble
+    if not thresholds and not weightings:
+        return ensemble.extract_majority_vote(html, page_id, models, weights, int(len(models) * .66), doc=doc,
+                                              answers=member_answers, dataset=dataset)
+
+    # Parameter sweep, votes are counted only once for all variants
+    weight_lists = {None: list(weights)}
+    weight_lists.update({w: [m_weights.get(m, 1) for m in models] for w, m_weights in (weightings or {}).items()})
+    threshold_values = {None: int(len(models) * .66)}
+    threshold_values.update({t: int(len(models) * t) for t in thresholds or []})
+    texts = ensemble.sweep_majority_vote(html, page_id, models, weight_lists, threshold_values, doc=doc,
+                                         answers=member_answers, dataset=dataset)
+
+    results = {name: texts[(None, None)]}
+    for v, key in get_output_variants(name, dict(thresholds=thresholds, weightings=weightings)).items():
+        results[v] = texts[key]
+    return results
+
+
+def extract_ensemble_majority(html, page_id, chosen_models = [], doc=None, thresholds=None, weightings=None,
+                              member_answers=None, dataset=None, **_):
     models, weights = _get_ensemble_model_list(chosen_models = chosen_models)
-    return ensemble.extract_majority_vote(html, page_id, models, weights, int(len(models) * .66))
+    return _majority_vote('ensemble_majority', html, page_id, models, weights, doc, thresholds,
+                          weightings, member_answers, dataset)
 
 
-def extract_ensemble_best(html, page_id, chosen_models = []):
-    from extraction_benchmark.extractors import ensemble
-    if models:
-        models, weights = _get_ensemble_model_list(shosen_models = chosen_models)
+def extract_ensemble_best(html, page_id, chosen_models = [], doc=None, thresholds=None, weightings=None,
+                          member_answers=None, dataset=None, **_):
+    if chosen_models:
+        models, weights = _get_ensemble_model_list(chosen_models = chosen_models)
     else:
         models, weights = _get_ensemble_model_list(chosen_models = chosen_models, best_only = True)
-    return ensemble.extract_majority_vote(html, page_id, models, weights, int(len(models) * .66))
+    return _majority_vote('ensemble_best', html, page_id, models, weights, doc, thresholds,
+                          weightings, member_answers, dataset)
 
 
-def extract_ensemble_weighted(html, page_id, chosen_models = []):
-    from extraction_benchmark.extractors import ensemble
-    if models:
+def extract_ensemble_weighted(html, page_id, chosen_models = [], doc=None, thresholds=None, weightings=None,
+                              member_answers=None, dataset=None, **_):
+    if chosen_models:
         models, weights = _get_ensemble_model_list(chosen_models = chosen_models)
     else:
         models, weights = _get_ensemble_model_list(chosen_models = chosen_models, best_only = True, weighted = True)
-    models, weights = _get_ensemble_model_list(chosen_models = chosen_models, best_only=True, weighted=True)
-    return ensemble.extract_majority_vote(html, page_id, models, weights, int(len(models) * .66))
+    return _majority_vote('ensemble_weighted', html, page_id, models, weights, doc, thresholds,
+                          weightings, member_answers, dataset)
+
+
+def init_extractor(name):
+    """
+    Create the reusable instances of an extractor in the current process ahead of its first use.
+
+    :param name: extractor name
+    """
+    if _INSTANCES.is_registered(name):
+        _INSTANCES.get(name)
+
+
+def get_batch_extractor(name):
+    """
+    Get the batched entry point of an extractor.
+
+    Batched extractors take a list of HTML strings instead of a single HTML string and return a list of
+    extracted texts in the same order. Pages on which a batched extractor failed are returned as ``None``.
+
+    :param name: extractor name
+    :return: batch extraction routine or ``None`` if the extractor does not support batching
+    """
+    return _EXTRACTORS[name]['batch'] if name in _EXTRACTORS else None
+
+
+# Resource classes of extractors:
+#   cpu_light:  fast pure-Python or native extractors with a small memory footprint
+#   cpu_heavy:  slow or memory-hungry extractors running in the worker process
+#   subprocess: extractors that delegate to external processes (JVMs, Go binaries, other Python interpreters)
+#   ml_model:   extractors that load a machine learning model
+EXTRACTOR_COST_CLASSES = ['cpu_light', 'cpu_heavy', 'subprocess', 'ml_model']
+
+_EXTRACTOR_DEFAULTS = dict(
+    thread_safe=True,
+    packages=[],
+    files=[],
+    batch=None,
+    factory=None,
+    reset=None,
+    close=None,
+    execution_options=set(),
+)
+
+# Supported extractors and their properties (missing properties are taken from the defaults above):
+#   cost:              resource class (one of EXTRACTOR_COST_CLASSES)
+#   memory:            expected worker memory footprint in MiB
+#   thread_safe:       whether several workers can run the extractor at the same time (not the case for
+#                      extractors that need exclusive access to a GPU)
+#   packages:          Python distributions whose versions determine the output of the extractor
+#   files:             bundled files or directories (relative to this module) that determine its output
+#   batch:             batched entry point (see get_batch_extractor)
+#   factory:           factory of a reusable per-process instance with optional reset and close hooks
+#                      (see InstancePool.register)
+#   execution_options: extractor options that only affect how the extractor is run, but not its output
+_EXTRACTORS = {name: {**_EXTRACTOR_DEFAULTS, **spec} for name, spec in dict(
+    bs4=dict(cost='cpu_light', memory=150, packages=['beautifulsoup4']),
+    boilerpipe=dict(cost='cpu_heavy', memory=600, packages=['boilerpipe3']),
+    xpath_text=dict(cost='cpu_light', memory=150, packages=['lxml']),
+    news_please=dict(cost='cpu_heavy', memory=400, packages=['news-please']),
+    readability=dict(cost='cpu_heavy', memory=250, packages=['readability-lxml', 'html-text']),
+    go_domdistiller=dict(cost='subprocess', memory=400, files=['go_domdistiller'],
+                         batch=batch_extract_go_domdistiller, execution_options={'instances'}),
+    inscriptis=dict(cost='cpu_light', memory=150, packages=['inscriptis']),
+    html_text=dict(cost='cpu_light', memory=150, packages=['html-text']),
+    resiliparse=dict(cost='cpu_light', memory=100, packages=['resiliparse']),
+    bte=dict(cost='cpu_light', memory=150, files=['bte.py']),
+    trafilatura=dict(cost='cpu_heavy', memory=300, packages=['trafilatura']),
+    justext=dict(cost='cpu_heavy', memory=250, packages=['justext'], factory=_make_justext_stoplist),
+    goose3=dict(cost='cpu_heavy', memory=400, packages=['goose3'], factory=_make_goose3, close=_close_goose3),
+    lxml_cleaner=dict(cost='cpu_light', memory=150, packages=['lxml', 'beautifulsoup4'],
+                      factory=_make_lxml_cleaner),
+    boilernet=dict(cost='ml_model', memory=1500,
+                   packages=['numpy', 'h5py', 'beautifulsoup4', 'html5lib', 'resiliparse', 'nltk'],
+                   files=['boilernet'], batch=batch_extract_boilernet),
+    web2text=dict(cost='subprocess', memory=4000, thread_safe=False, files=['web2text'],
+                  batch=batch_extract_web2text),
+    newspaper3k=dict(cost='cpu_heavy', memory=400, packages=['newspaper3k']),
+    dragnet=dict(cost='ml_model', memory=600, packages=['dragnet']),
+    extractnet=dict(cost='ml_model', memory=1000, packages=['extractnet'], factory=_make_extractnet),
+    ensemble_majority=dict(cost='cpu_light', memory=200),
+    ensemble_best=dict(cost='cpu_light', memory=200),
+    ensemble_weighted=dict(cost='cpu_light', memory=200),
+).items()}
+
+for _name, _spec in _EXTRACTORS.items():
+    if _spec['factory'] is not None:
+        _INSTANCES.register(_name, _spec['factory'], reset=_spec['reset'], close=_spec['close'])
+
+
+def get_extractor_info(name):
+    """
+    Get the resource requirements and capabilities of an extractor.
+
+    :param name: extractor name
+    :return: dict with the extractor's resource class (``cost``, one of :data:`EXTRACTOR_COST_CLASSES`),
+             expected worker memory footprint in MiB (``memory``), whether several workers can run it at
+             the same time (``thread_safe``), and whether it supports batching (``batched``)
+    """
+    if name not in _EXTRACTORS:
+        raise ValueError(f'Unknown extractor: {name}')
+    spec = _EXTRACTORS[name]
+    return dict(name=name, cost=spec['cost'], memory=spec['memory'], thread_safe=spec['thread_safe'],
+                batched=spec['batch'] is not None)
 
 
 def list_extractors(names_only=True, include_ensembles=False, chosen_models = []):
@@ -225,9 +447,70 @@ def list_extractors(names_only=True, include_ensembles=False, chosen_models = []
     :return: list of extractor names or functions
     """
 
-    models = [(n.replace('extract_', '') if names_only else m) for n, m in globals().items()
-            if n.startswith('extract_') and (not n.startswith('extract_ensemble') or include_ensembles)]
+    models = [(n if names_only else globals()['extract_' + n]) for n in _EXTRACTORS
+              if not n.startswith('ensemble') or include_ensembles]
     if not names_only and chosen_models:
         models = [m for m in models if m.__name__.replace('extract_', '') in chosen_models]
     return models
 
+
+def _hash_files(paths):
+    m = hashlib.sha256()
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(r, f) for r, d, fs in os.walk(path) if '__pycache__' not in r for f in fs)
+        else:
+            files = [path]
+        for f in files:
+            if not os.path.isfile(f):
+                continue
+            m.update(os.path.relpath(f, os.path.dirname(__file__)).encode())
+            with open(f, 'rb') as fp:
+                for block in iter(lambda: fp.read(1 << 20), b''):
+                    m.update(block)
+    return m.hexdigest()
+
+
+def get_extractor_fingerprint(name, options=None):
+    """
+    Get a fingerprint of an extractor's installed version and configuration.
+
+    The fingerprint changes whenever the installed version of one of the extractor's Python dependencies,
+    one of its bundled files, the source code of its ``extract_*`` function or instance factory (and with it
+    its settings), or the extractor options change. Options that do not affect the output (such as the number of
+    server processes) are ignored.
+
+    :param name: extractor name
+    :param options: dict of extractor options passed as keyword arguments
+    :return: fingerprint as hex string
+    """
+    options = {k: v for k, v in (options or {}).items() if k not in _EXTRACTORS[name]['execution_options']}
+    # Serialize options for caching, since option values may be lists or dicts
+    return _get_extractor_fingerprint(name, json.dumps(options, sort_keys=True))
+
+
+@lru_cache
+def _get_extractor_fingerprint(name, options_json):
+    options = sorted(json.loads(options_json).items())
+    spec = _EXTRACTORS[name]
+    versions = {}
+    for p in spec['packages']:
+        try:
+            versions[p] = metadata.version(p)
+        except metadata.PackageNotFoundError:
+            versions[p] = None
+
+    source = inspect.getsource(globals()['extract_' + name])
+    if spec['batch'] is not None:
+        source += inspect.getsource(spec['batch'])
+    if _INSTANCES.is_registered(name):
+        source += _INSTANCES.source(name)
+
+    fingerprint = {
+        'versions': versions,
+        'files': _hash_files([os.path.join(os.path.dirname(__file__), f) for f in spec['files']]),
+        'source': source,
+    }
+    if options:
+        fingerprint['options'] = options
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
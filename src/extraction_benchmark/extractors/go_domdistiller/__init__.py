@@ -1,14 +1,191 @@
+from concurrent.futures import ThreadPoolExecutor
 import os
+from queue import SimpleQueue
+import struct
 import subprocess
 from tempfile import TemporaryDirectory
 
+CLI_PATH = os.path.join(os.path.dirname(__file__), 'go_domdistiller_cli')
 
-def extract(html, **_):
-    cli_path = os.path.join(os.path.dirname(__file__), 'go_domdistiller_cli')
+_pool = None
 
+# Whether the CLI supports the --serve mode (None until the first server has been started)
+_serve_supported = None
+
+
+class ServeModeUnsupported(RuntimeError):
+    """Raised if the CLI binary was built without support for the ``--serve`` mode."""
+
+
+def extract_file(html):
+    """
+    Extract a page with a separate CLI run per page (for CLI binaries without ``--serve`` mode).
+
+    :param html: HTML string
+    :return: extracted text
+    """
     with TemporaryDirectory() as tmp_dir:
         p = os.path.join(tmp_dir, 'go_domdistiller.html')
         with open(p, 'w') as f:
             f.write(html)
-        result = subprocess.run([cli_path, p], stdout=subprocess.PIPE)
+        result = subprocess.run([CLI_PATH, p], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
     return result.stdout.decode().strip()
+
+
+def _read_exact(stream, n):
+    data = stream.read(n)
+    if data is None or len(data) < n:
+        raise EOFError('Unexpected end of stream.')
+    return data
+
+
+class DistillerProcess:
+    """
+    Long-running ``go_domdistiller_cli --serve`` process, which receives pages over a length-prefixed
+    stdin/stdout protocol. The process is (re-)started on demand, so it is replaced automatically after a crash.
+
+    Each new process is sent an empty document first. CLI binaries built before the ``--serve`` mode was added
+    treat the flag as an input file name and exit without a response, in which case
+    :class:`ServeModeUnsupported` is raised.
+    """
+
+    def __init__(self):
+        self._proc = None
+
+    def _request(self, data):
+        proc = self._proc
+        proc.stdin.write(struct.pack('>I', len(data)) + data)
+        proc.stdin.flush()
+        status, length = struct.unpack('>BI', _read_exact(proc.stdout, 5))
+        return status, _read_exact(proc.stdout, length)
+
+    def _start(self):
+        global _serve_supported
+        self._proc = subprocess.Popen([CLI_PATH, '--serve'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL)
+        try:
+            self._request(b'')
+        except (OSError, EOFError):
+            self.close()
+            if _serve_supported:
+                raise RuntimeError('go_domdistiller process died.')
+            _serve_supported = False
+            raise ServeModeUnsupported('go_domdistiller_cli does not support --serve, rebuild it from cli.go.')
+        _serve_supported = True
+
+    def extract(self, html):
+        """
+        Extract a page.
+
+        :param html: HTML string
+        :return: extracted text (empty if the distiller failed on the page)
+        """
+        if self._proc is None or self._proc.poll() is not None:
+            self._start()
+
+        try:
+            status, result = self._request(html.encode())
+        except (OSError, EOFError):
+            self.close()
+            raise RuntimeError('go_domdistiller process died.')
+        except BaseException:
+            # Interrupted in the middle of a request (e.g., by a timeout), the stream is out of sync now
+            self.close()
+            raise
+
+        if status != 0:
+            # Same as a panicking CLI run with empty output
+            return ''
+        return result.decode().strip()
+
+    def close(self):
+        """Terminate the process."""
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        proc.kill()
+        proc.wait()
+        proc.stdin.close()
+        proc.stdout.close()
+
+
+class DistillerPool:
+    """Pool of distiller processes for extracting several pages concurrently."""
+
+    def __init__(self, size=1):
+        """
+        :param size: number of distiller processes
+        """
+        self.size = max(1, size)
+        self._processes = [DistillerProcess() for _ in range(self.size)]
+        self._idle = SimpleQueue()
+        for p in self._processes:
+            self._idle.put(p)
+
+    def extract(self, html):
+        """
+        Extract a page with the next idle process.
+
+        Falls back to a separate CLI run per page if the CLI binary does not support the ``--serve`` mode.
+
+        :param html: HTML string
+        :return: extracted text
+        """
+        if _serve_supported is False:
+            return extract_file(html)
+        p = self._idle.get()
+        try:
+            return p.extract(html)
+        except ServeModeUnsupported:
+            return extract_file(html)
+        finally:
+            self._idle.put(p)
+
+    def extract_batch(self, htmls):
+        """
+        Extract a batch of pages with all processes of the pool.
+
+        :param htmls: list of HTML strings
+        :return: list of extracted texts
+        """
+        if self.size == 1 or len(htmls) < 2:
+            return [self.extract(h) for h in htmls]
+
+        executor = ThreadPoolExecutor(self.size)
+        try:
+            return list(executor.map(self.extract, htmls))
+        except BaseException:
+            # Unblock remaining threads
+            self.close()
+            raise
+        finally:
+            executor.shutdown()
+
+    def close(self):
+        """Terminate all processes."""
+        for p in self._processes:
+            p.close()
+
+
+def get_pool(instances=1):
+    """
+    Get the distiller process pool of the current process.
+
+    :param instances: number of concurrent distiller processes
+    :return: process pool
+    """
+    global _pool
+    instances = max(1, int(instances))
+    if _pool is None or _pool.size != instances:
+        if _pool is not None:
+            _pool.close()
+        _pool = DistillerPool(instances)
+    return _pool
+
+
+def extract(html, instances=1, **_):
+    return get_pool(instances).extract(html)
+
+
+def extract_batch(htmls, instances=1, **_):
+    return get_pool(instances).extract_batch(htmls)
@@ -1,12 +1,62 @@
 package main
 
 import (
+	"bufio"
+	"bytes"
+	"encoding/binary"
 	"fmt"
+	"io"
 	"os"
 
 	distiller "github.com/markusmobius/go-domdistiller"
 )
 
+// distill extracts a single document and recovers from panics, so that a bad
+// page does not take down a server process.
+func distill(input []byte, opts *distiller.Options) (status byte, output []byte) {
+	defer func() {
+		if r := recover(); r != nil {
+			status, output = 1, []byte(fmt.Sprint(r))
+		}
+	}()
+
+	article, err := distiller.ApplyForReader(bytes.NewReader(input), opts)
+	if err != nil {
+		return 1, []byte(err.Error())
+	}
+	return 0, []byte(article.HTML)
+}
+
+// serve reads length-prefixed HTML documents from stdin and writes one response
+// per document to stdout until stdin is closed.
+//
+// Request:  uint32 big-endian length, HTML bytes
+// Response: uint8 status (0 = success, 1 = error), uint32 big-endian length, result or error message
+func serve(opts *distiller.Options) {
+	in := bufio.NewReader(os.Stdin)
+	out := bufio.NewWriter(os.Stdout)
+	header := make([]byte, 5)
+
+	for {
+		if _, err := io.ReadFull(in, header[:4]); err != nil {
+			return
+		}
+		input := make([]byte, binary.BigEndian.Uint32(header[:4]))
+		if _, err := io.ReadFull(in, input); err != nil {
+			return
+		}
+
+		status, output := distill(input, opts)
+		header[0] = status
+		binary.BigEndian.PutUint32(header[1:], uint32(len(output)))
+		out.Write(header)
+		out.Write(output)
+		if err := out.Flush(); err != nil {
+			return
+		}
+	}
+}
+
 func main() {
 	if len(os.Args) < 2 {
 		panic("Input file not provided in args")
@@ -21,6 +71,11 @@ func main() {
 		SkipPagination: true,
 	}
 
+	if input == "--serve" {
+		serve(opts)
+		return
+	}
+
 	article, err := distiller.ApplyForFile(input, opts)
 	if err != nil {
 		panic(err)
@@ -0,0 +1,107 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from contextlib import contextmanager
+import inspect
+
+
+class InstancePool:
+    """
+    Per-process registry of initialised extractor instances.
+
+    Expensive extractor state (models, stoplists, configured cleaners, etc.) is created once per worker process
+    by a registered factory and reused for all pages processed by that worker. Libraries that keep per-document
+    state can register a reset hook, which is called after each page. Instances are discarded and re-created
+    if an extractor fails on a page, since they may have been left in an inconsistent state.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+
+    def register(self, name, factory, reset=None, close=None):
+        """
+        Register an instance factory.
+
+        :param name: instance name
+        :param factory: function without arguments returning a new instance
+        :param reset: function called with the instance after each use to clear per-document state
+        :param close: function called with the instance when it is discarded
+        """
+        self._factories[name] = (factory, reset, close)
+
+    def is_registered(self, name):
+        """
+        :param name: instance name
+        :return: whether a factory has been registered for the given name
+        """
+        return name in self._factories
+
+    def source(self, name):
+        """
+        :param name: instance name
+        :return: source code of the factory and hooks (for fingerprinting extractor settings)
+        """
+        return ''.join(inspect.getsource(f) for f in self._factories[name] if f is not None)
+
+    def get(self, name):
+        """
+        Get an instance and create it if it does not exist yet.
+
+        :param name: instance name
+        :return: instance
+        """
+        if name not in self._instances:
+            self._instances[name] = self._factories[name][0]()
+        return self._instances[name]
+
+    @contextmanager
+    def use(self, name):
+        """
+        Context manager for using an instance on a single document.
+
+        The instance is reset when the context is left and discarded if an exception (including a page timeout)
+        is raised inside the context.
+
+        :param name: instance name
+        :return: instance
+        """
+        instance = self.get(name)
+        try:
+            yield instance
+        except BaseException:
+            self.discard(name)
+            raise
+        reset = self._factories[name][1]
+        if reset is not None:
+            reset(instance)
+
+    def discard(self, name):
+        """
+        Discard an instance, so that it is re-created on its next use.
+
+        :param name: instance name
+        """
+        instance = self._instances.pop(name, None)
+        close = self._factories[name][2]
+        if instance is not None and close is not None:
+            try:
+                close(instance)
+            except Exception:
+                pass
+
+    def clear(self):
+        """Discard all instances."""
+        for name in list(self._instances):
+            self.discard(name)
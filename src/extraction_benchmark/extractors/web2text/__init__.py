@@ -36,15 +36,35 @@ if not os.path.isdir(WEB2TEXT_VENV):
                             'Please follow README instructions to create one')
 
 
-def extract(html):
+WEB2TEXT_BATCH_STAGE = os.path.join(os.path.dirname(__file__), 'batch_stage.scala')
+WEB2TEXT_BATCH_CLASSIFY = os.path.join(os.path.dirname(__file__), 'batch_classify.py')
+
+
+def _get_commands():
     scala_cmd = ['scala', '-cp', os.path.join(THIRD_PARTY_PATH, 'web2text.jar')]
     python_cmd = ['python', os.path.join(WEB2TEXT_PYTHONPATH, 'main.py')]
-    hash_id = hashlib.sha256(html.encode()).hexdigest()
 
     proc_env = os.environ.copy()
     proc_env['VIRTUAL_ENV'] = WEB2TEXT_VENV
     proc_env['PATH'] = '{}/bin:{}'.format(proc_env['VIRTUAL_ENV'], proc_env['PATH'])
     proc_env['JAVA_HOME'] = '/usr/lib/jvm/java-8-openjdk-amd64'
+    return scala_cmd, python_cmd, proc_env
+
+
+def _run(cmd, env, error_msg):
+    exit_code = subprocess.Popen(
+        cmd,
+        env=env,
+        stderr=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL
+    ).wait()
+    if exit_code != 0:
+        raise RuntimeError(error_msg)
+
+
+def extract(html):
+    scala_cmd, python_cmd, proc_env = _get_commands()
+    hash_id = hashlib.sha256(html.encode()).hexdigest()
 
     with tempfile.TemporaryDirectory() as tmp_dir:
         file_base = os.path.join(tmp_dir, hash_id)
@@ -54,31 +74,62 @@ def extract(html):
         text_file = file_base + '.txt'
 
         open(html_file, 'w').write(html)
-        exit_code = subprocess.Popen(
-            scala_cmd + ['ch.ethz.dalab.web2text.ExtractPageFeatures', html_file, features_file],
-            env=proc_env,
-            stderr=subprocess.DEVNULL,
-            stdout=subprocess.DEVNULL
-        ).wait()
-        if exit_code != 0:
-            raise RuntimeError('Web2Text ExtractPageFeatures failed.')
-
-        exit_code = subprocess.Popen(
-            python_cmd + ['classify', features_file, labels_file],
-            env=proc_env,
-            stderr=subprocess.DEVNULL,
-            stdout=subprocess.DEVNULL
-        ).wait()
-        if exit_code != 0:
-            raise RuntimeError('Web2Text DOM node classification failed.')
-
-        exit_code = subprocess.Popen(
-            scala_cmd + ['ch.ethz.dalab.web2text.ApplyLabelsToPage', html_file, labels_file, text_file],
-            env=proc_env,
-            stderr=subprocess.DEVNULL,
-            stdout=subprocess.DEVNULL
-        ).wait()
-        if exit_code != 0:
-            raise RuntimeError('Web2Text ApplyLabelsToPage failed.')
+        _run(scala_cmd + ['ch.ethz.dalab.web2text.ExtractPageFeatures', html_file, features_file],
+             proc_env, 'Web2Text ExtractPageFeatures failed.')
+        _run(python_cmd + ['classify', features_file, labels_file],
+             proc_env, 'Web2Text DOM node classification failed.')
+        _run(scala_cmd + ['ch.ethz.dalab.web2text.ApplyLabelsToPage', html_file, labels_file, text_file],
+             proc_env, 'Web2Text ApplyLabelsToPage failed.')
 
         return open(text_file, 'r').read()
+
+
+def _run_batch_stage(cmd, env, args_file, jobs, error_msg):
+    """
+    Run a batch stage on all pages whose previous stage succeeded.
+
+    :param jobs: list of tuples of the output file of the previous stage and the arguments of the stage
+    """
+    args = [a for prev_output, a in jobs if os.path.isfile(prev_output)]
+    if not args:
+        return
+    with open(args_file, 'w') as f:
+        f.writelines('\t'.join(a) + '\n' for a in args)
+    _run(cmd + [args_file], env, error_msg)
+
+
+def extract_batch(htmls):
+    """
+    Extract a batch of pages with a single JVM per Scala stage and a single classifier process.
+
+    :param htmls: list of HTML strings
+    :return: list of extracted texts (``None`` for pages on which any stage failed)
+    """
+    scala_cmd, _, proc_env = _get_commands()
+    python_cmd = ['python', WEB2TEXT_BATCH_CLASSIFY, os.path.join(WEB2TEXT_PYTHONPATH, 'main.py')]
+    scala_cmd += [WEB2TEXT_BATCH_STAGE]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_bases = [os.path.join(tmp_dir, str(i)) for i in range(len(htmls))]
+        for file_base, html in zip(file_bases, htmls):
+            open(file_base + '.html', 'w').write(html)
+
+        args_file = os.path.join(tmp_dir, 'batch.args')
+        _run_batch_stage(scala_cmd + ['ExtractPageFeatures'], proc_env, args_file,
+                         [(b + '.html', (b + '.html', b + '.features')) for b in file_bases],
+                         'Web2Text ExtractPageFeatures failed.')
+        _run_batch_stage(python_cmd, proc_env, args_file,
+                         [(b + '.features', (b + '.features', b + '.labels')) for b in file_bases],
+                         'Web2Text DOM node classification failed.')
+        _run_batch_stage(scala_cmd + ['ApplyLabelsToPage'], proc_env, args_file,
+                         [(b + '.labels', (b + '.html', b + '.labels', b + '.txt')) for b in file_bases],
+                         'Web2Text ApplyLabelsToPage failed.')
+
+        results = []
+        for b in file_bases:
+            if not os.path.isfile(b + '.txt'):
+                results.append(None)
+                continue
+            with open(b + '.txt', 'r') as f:
+                results.append(f.read())
+        return results
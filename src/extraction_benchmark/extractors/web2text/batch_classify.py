@@ -0,0 +1,58 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Run ``main.py classify`` of Web2Text on many feature files within a single Python process, so that TensorFlow
+is imported only once per batch.
+
+Usage: python batch_classify.py <path to main.py> <args file>
+
+Each line of the args file contains a tab-separated pair of input features file and output labels file.
+Failures are reported on stderr and do not stop the batch. Callers detect them by missing output files.
+
+This script runs inside the Web2Text venv (Python 3.7, TensorFlow 1.x) and must not import anything
+from the benchmark package.
+"""
+
+import os
+import runpy
+import sys
+import traceback
+
+import tensorflow as tf
+
+
+def main():
+    main_path, args_file = sys.argv[1:3]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(main_path)))
+
+    with open(args_file, 'r') as f:
+        jobs = [l.rstrip('\n').split('\t') for l in f if l.strip()]
+
+    for features_file, labels_file in jobs:
+        # Each run builds its own graph and session
+        tf.reset_default_graph()
+        sys.argv = [main_path, 'classify', features_file, labels_file]
+        try:
+            runpy.run_path(main_path, run_name='__main__')
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                sys.stderr.write('Classification failed on {} (exit code {}).\n'.format(features_file, e.code))
+        except Exception:
+            sys.stderr.write('Classification failed on {}:\n'.format(features_file))
+            traceback.print_exc()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+// Run a Web2Text page processing stage on many pages within a single JVM.
+//
+// Usage: scala -cp web2text.jar batch_stage.scala <ExtractPageFeatures|ApplyLabelsToPage> <args file>
+//
+// Each line of the args file contains the tab-separated command line arguments of one stage invocation.
+// Failures are reported on stderr and do not stop the batch. Callers detect them by missing output files.
+
+import scala.io.Source
+
+import ch.ethz.dalab.web2text.{ApplyLabelsToPage, ExtractPageFeatures}
+
+val stage: Array[String] => Unit = args(0) match {
+  case "ExtractPageFeatures" => ExtractPageFeatures.main
+  case "ApplyLabelsToPage" => ApplyLabelsToPage.main
+  case s => throw new IllegalArgumentException(s"Unknown stage: $s")
+}
+
+val argsSource = Source.fromFile(args(1), "UTF-8")
+for (line <- argsSource.getLines() if line.nonEmpty) {
+  try {
+    stage(line.split("\t"))
+  } catch {
+    case e: Throwable => System.err.println(s"${args(0)} failed on ${line}: $e")
+  }
+}
+argsSource.close()
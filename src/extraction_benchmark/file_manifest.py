@@ -0,0 +1,84 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sqlite3
+from typing import Optional, Tuple
+
+from extraction_benchmark.paths import *
+
+
+class FileManifest:
+    """
+    Persistent manifest of the SHA-256 hashes and detected encodings of raw dataset files.
+
+    Entries are keyed by the file path and are valid only as long as the file's size and modification time
+    are unchanged, so that each file has to be read and hashed only once across all dataset readers and runs.
+    """
+
+    def __init__(self, db_path=DATASET_RAW_MANIFEST_PATH):
+        """
+        :param db_path: database file path
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=120)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS files (
+                                  path TEXT NOT NULL PRIMARY KEY,
+                                  size INTEGER NOT NULL,
+                                  mtime_ns INTEGER NOT NULL,
+                                  sha256 TEXT NOT NULL,
+                                  encoding TEXT NOT NULL
+                              ) WITHOUT ROWID''')
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, path, stat) -> Optional[Tuple[str, str]]:
+        """
+        Look up the hash and encoding of a file.
+
+        :param path: file path
+        :param stat: current ``os.stat()`` result of the file
+        :return: tuple of SHA-256 hash and encoding or ``None`` if the file is unknown or has changed
+        """
+        row = self._conn.execute('SELECT sha256, encoding FROM files WHERE path = ? AND size = ? AND mtime_ns = ?',
+                                 (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)).fetchone()
+        return tuple(row) if row else None
+
+    def put(self, path, stat, sha256, encoding):
+        """
+        Record the hash and encoding of a file.
+
+        :param path: file path
+        :param stat: ``os.stat()`` result of the file at the time it was read
+        :param sha256: SHA-256 hash of the file contents
+        :param encoding: detected encoding of the file contents
+        """
+        # Commit immediately to keep write locks short when several processes share the manifest
+        with self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)',
+                               (os.path.realpath(path), stat.st_size, stat.st_mtime_ns, sha256, encoding))
+
+    def close(self):
+        """Close the manifest."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
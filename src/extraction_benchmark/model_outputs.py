@@ -0,0 +1,332 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import sqlite3
+import time
+
+from extraction_benchmark import archives
+from extraction_benchmark.paths import *
+
+
+_PAGE_ID_PREFIX = b'{"page_id": "'
+
+
+def _line_page_id(line: bytes):
+    """Get the page ID of a JSONL record without decoding the whole record if possible."""
+    if line.startswith(_PAGE_ID_PREFIX):
+        end = line.find(b'"', len(_PAGE_ID_PREFIX))
+        if end != -1:
+            return line[len(_PAGE_ID_PREFIX):end].decode()
+    return json.loads(line)['page_id']
+
+
+def _index_jsonl(path):
+    """
+    Index the complete records of a JSONL file.
+
+    :param path: input file
+    :return: dict of page IDs mapped to ``(offset, length)`` tuples and the end offset of the last complete record
+    """
+    index = {}
+    offset = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                # Incomplete record from an interrupted write
+                break
+            try:
+                index[_line_page_id(line)] = (offset, len(line))
+            except (ValueError, KeyError):
+                break
+            offset += len(line)
+    return index, offset
+
+
+class ModelOutputWriter:
+    """
+    Crash-safe streaming writer for model output JSONL files.
+
+    Records are appended to a ``.part`` file next to the final output file as they come in and are flushed to
+    disk periodically. An interrupted run can be resumed from the last complete record. Once all records have
+    been written, :meth:`close` compacts the partial and any previous output into the final output file,
+    sorted by page ID.
+    """
+
+    def __init__(self, out_path, resume=False, checkpoint_records=100, checkpoint_interval=30):
+        """
+        :param out_path: final output file path
+        :param resume: resume from existing final and partial outputs (otherwise existing outputs are replaced)
+        :param checkpoint_records: fsync partial output after this many records
+        :param checkpoint_interval: fsync partial output after this many seconds
+        """
+        self.out_path = out_path
+        self.part_path = out_path + '.part'
+        self.checkpoint_records = checkpoint_records
+        self.checkpoint_interval = checkpoint_interval
+        self._num_unsynced = 0
+        self._last_checkpoint = time.monotonic()
+        self._part_file = None
+
+        self.existing_page_ids = set()
+        if resume and os.path.isfile(self.out_path):
+            self.existing_page_ids.update(_index_jsonl(self.out_path)[0])
+        self._resume_final = resume and bool(self.existing_page_ids)
+
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        if resume and os.path.isfile(self.part_path):
+            part_index, valid_end = _index_jsonl(self.part_path)
+            self.existing_page_ids.update(part_index)
+            with open(self.part_path, 'r+b') as f:
+                # Drop incomplete trailing record
+                f.truncate(valid_end)
+        elif os.path.isfile(self.part_path):
+            os.unlink(self.part_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(compact=exc_type is None)
+
+    def write(self, page_id, out_data):
+        """
+        Append a record to the partial output.
+
+        :param page_id: page ID
+        :param out_data: record data
+        """
+        if self._part_file is None:
+            self._part_file = open(self.part_path, 'ab')
+        line = json.dumps({'page_id': page_id, **out_data}, indent=None, ensure_ascii=False) + '\n'
+        self._part_file.write(line.encode())
+        self._num_unsynced += 1
+        if self._num_unsynced >= self.checkpoint_records or \
+                time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Flush the partial output to disk."""
+        if self._part_file is not None:
+            self._part_file.flush()
+            os.fsync(self._part_file.fileno())
+        self._num_unsynced = 0
+        self._last_checkpoint = time.monotonic()
+
+    def close(self, compact=True):
+        """
+        Close the writer.
+
+        :param compact: write the sorted final output file and remove the partial output
+        """
+        if self._part_file is not None:
+            self.checkpoint()
+            self._part_file.close()
+            self._part_file = None
+        if compact:
+            self.compact()
+
+    def compact(self):
+        """Merge partial and previous outputs into the final output file sorted by page ID."""
+        if not os.path.isfile(self.part_path):
+            return
+
+        sources = [self.part_path]
+        if self._resume_final:
+            sources.append(self.out_path)
+
+        # Index records of all sources, records from the partial output take precedence
+        index = {}
+        for src_idx, src in reversed(list(enumerate(sources))):
+            for page_id, (offset, length) in _index_jsonl(src)[0].items():
+                index[page_id] = (src_idx, offset, length)
+
+        tmp_path = self.out_path + '.tmp'
+        src_files = [open(src, 'rb') for src in sources]
+        try:
+            with open(tmp_path, 'wb') as out_file:
+                for page_id in sorted(index):
+                    src_idx, offset, length = index[page_id]
+                    src_files[src_idx].seek(offset)
+                    out_file.write(src_files[src_idx].read(length))
+                out_file.flush()
+                os.fsync(out_file.fileno())
+        finally:
+            for f in src_files:
+                f.close()
+
+        os.replace(tmp_path, self.out_path)
+        os.unlink(self.part_path)
+        self._resume_final = True
+
+
+class PageQuarantine:
+    """
+    Persistent list of pages on which extractors repeatedly exceeded their time or memory limits.
+
+    Each failure counts as a strike against a page for a particular model. Pages with at least ``max_strikes``
+    strikes are quarantined and should not be passed to the model again.
+    """
+
+    def __init__(self, path=EXTRACTION_QUARANTINE_PATH, max_strikes=2):
+        """
+        :param path: quarantine file path
+        :param max_strikes: number of strikes after which a page is quarantined (0 to disable quarantine)
+        """
+        self.path = path
+        self.max_strikes = max_strikes
+        self._strikes = {}
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                self._strikes = json.load(f)
+
+    def is_quarantined(self, model, page_id):
+        """
+        :param model: model name
+        :param page_id: page ID
+        :return: whether the page is quarantined for the given model
+        """
+        if not self.max_strikes:
+            return False
+        return self._strikes.get(model, {}).get(page_id, {}).get('strikes', 0) >= self.max_strikes
+
+    def strike(self, model, page_id, reason):
+        """
+        Record a failure of a model on a page.
+
+        :param model: model name
+        :param page_id: page ID
+        :param reason: failure reason
+        """
+        entry = self._strikes.setdefault(model, {}).setdefault(page_id, {'strikes': 0, 'reasons': []})
+        entry['strikes'] += 1
+        entry['reasons'].append(reason)
+
+    def save(self):
+        """Write the quarantine list to disk."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self._strikes, f, indent=2, sort_keys=True)
+        os.replace(self.path + '.tmp', self.path)
+
+
+class ModelAnswerStore:
+    """
+    On-disk index of model answers for looking up the answers of several models to a page without loading whole
+    model output files into memory.
+
+    Answers are stored in an SQLite database, which is kept in sync with the model output files under
+    ``MODEL_OUTPUTS_PATH`` by :meth:`update`. Output files are re-indexed only if their size or modification
+    time have changed. Output files that do not exist on disk are indexed directly from the model outputs
+    archive (see :mod:`extraction_benchmark.archives`).
+    """
+
+    def __init__(self, db_path=MODEL_ANSWER_STORE_PATH, outputs_path=MODEL_OUTPUTS_PATH):
+        """
+        :param db_path: database file path
+        :param outputs_path: model outputs directory
+        """
+        self.db_path = db_path
+        self.outputs_path = outputs_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=120)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS sources (
+                                  model TEXT NOT NULL,
+                                  dataset TEXT NOT NULL,
+                                  size INTEGER NOT NULL,
+                                  mtime_ns INTEGER NOT NULL,
+                                  PRIMARY KEY (model, dataset)
+                              ) WITHOUT ROWID''')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS answers (
+                                  page_id TEXT NOT NULL,
+                                  model TEXT NOT NULL,
+                                  dataset TEXT NOT NULL,
+                                  plaintext TEXT NOT NULL,
+                                  PRIMARY KEY (page_id, model, dataset)
+                              ) WITHOUT ROWID''')
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def update(self, models):
+        """
+        Index new or changed output files of the given models in all datasets.
+
+        Answers from output files that no longer exist are removed from the index.
+
+        :param models: list of model names
+        """
+        indexed = {(m, ds): (size, mtime_ns) for m, ds, size, mtime_ns in
+                   self._conn.execute('SELECT model, dataset, size, mtime_ns FROM sources')}
+        for m, ds in indexed:
+            if archives.file_signature(os.path.join(self.outputs_path, ds, m + '.jsonl')) is None:
+                with self._conn:
+                    self._conn.execute('DELETE FROM answers WHERE model = ? AND dataset = ?', (m, ds))
+                    self._conn.execute('DELETE FROM sources WHERE model = ? AND dataset = ?', (m, ds))
+
+        if not archives.isdir(self.outputs_path):
+            return
+        for ds in archives.listdir(self.outputs_path):
+            for m in models:
+                in_file = os.path.join(self.outputs_path, ds, m + '.jsonl')
+                signature = archives.file_signature(in_file)
+                if signature is None or indexed.get((m, ds)) == signature:
+                    continue
+                self._index_file(m, ds, in_file, signature)
+
+    def _index_file(self, model, dataset, in_file, signature):
+        def _rows():
+            with archives.open_file(in_file, 'r') as f:
+                for line in f:
+                    answer = json.loads(line)
+                    yield answer['page_id'], model, dataset, answer.get('plaintext') or ''
+
+        # Replace all answers of the file in one transaction, so that readers never see a partial index
+        with self._conn:
+            self._conn.execute('DELETE FROM answers WHERE model = ? AND dataset = ?', (model, dataset))
+            self._conn.executemany('INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)', _rows())
+            self._conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)', (model, dataset, *signature))
+
+    def get(self, page_id, models, dataset=None):
+        """
+        Look up the answers of several models to a page.
+
+        :param page_id: page ID
+        :param models: list of model names
+        :param dataset: dataset of the page (answers from any dataset if ``None``)
+        :return: dict of model names and plaintext answers (models without an answer are missing)
+        """
+        models = list(models)
+        if not models:
+            return {}
+        query = f'''SELECT model, plaintext FROM answers
+                     WHERE page_id = ? AND model IN ({', '.join('?' * len(models))})'''
+        params = [page_id, *models]
+        if dataset is not None:
+            query += ' AND dataset = ?'
+            params.append(dataset)
+        return dict(self._conn.execute(query + ' ORDER BY dataset', params))
+
+    def close(self):
+        """Close the store."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,208 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Packed storage format for the HTML pages of combined datasets.
+
+All pages of a dataset are stored in a single data file ``<dataset>.data``, which is accompanied by an index
+file ``<dataset>.index.json`` that maps page IDs to the offset, length, text encoding, and compression of their
+records in the data file. Pages are read through a memory map of the data file, so that individual pages can be
+fetched by their ID without scanning directories or opening one file per page.
+"""
+
+import json
+import mmap
+import os
+from typing import Iterable, Optional, Tuple
+import zlib
+
+from extraction_benchmark.paths import *
+
+
+_FORMAT_VERSION = 1
+
+
+def _index_path(dataset, path):
+    return os.path.join(path, dataset + '.index.json')
+
+
+def _data_path(dataset, path):
+    return os.path.join(path, dataset + '.data')
+
+
+class PackedDatasetWriter:
+    """
+    Writer for packed datasets.
+
+    Records are appended to temporary files, which replace a previous version of the packed dataset only once
+    the writer is closed successfully. If a page ID is written more than once, the last record wins.
+    """
+
+    def __init__(self, dataset, path=DATASET_COMBINED_PACKED_PATH, compress=False):
+        """
+        :param dataset: dataset name
+        :param path: output directory
+        :param compress: compress each record with zlib
+        """
+        self.dataset = dataset
+        self.index_path = _index_path(dataset, path)
+        self.data_path = _data_path(dataset, path)
+        self.compress = compress
+        self._pages = {}
+        self._offset = 0
+        os.makedirs(path, exist_ok=True)
+        self._data_file = open(self.data_path + '.tmp', 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(commit=exc_type is None)
+
+    def write(self, page_id, html):
+        """
+        Append a page to the data file.
+
+        :param page_id: page ID
+        :param html: HTML string
+        """
+        data = html.encode('utf-8')
+        if self.compress:
+            data = zlib.compress(data)
+        self._data_file.write(data)
+        self._pages[page_id] = (self._offset, len(data), 'utf-8', 'zlib' if self.compress else None)
+        self._offset += len(data)
+
+    def close(self, commit=True):
+        """
+        Close the writer.
+
+        :param commit: replace the previous packed dataset with the written records (otherwise discard them)
+        """
+        if self._data_file is None:
+            return
+        self._data_file.flush()
+        os.fsync(self._data_file.fileno())
+        self._data_file.close()
+        self._data_file = None
+        if not commit:
+            os.unlink(self.data_path + '.tmp')
+            return
+
+        with open(self.index_path + '.tmp', 'w') as f:
+            json.dump({'version': _FORMAT_VERSION, 'data_size': self._offset,
+                       'pages': dict(sorted(self._pages.items()))}, f, indent=None)
+        # The index is replaced last, since it is validated against the size of the data file
+        os.replace(self.data_path + '.tmp', self.data_path)
+        os.replace(self.index_path + '.tmp', self.index_path)
+
+
+class PackedDataset:
+    """Random access to the pages of a packed dataset."""
+
+    def __init__(self, dataset, path=DATASET_COMBINED_PACKED_PATH):
+        """
+        :param dataset: dataset name
+        :param path: packed datasets directory
+        """
+        self.dataset = dataset
+        with open(_index_path(dataset, path), 'r') as f:
+            index = json.load(f)
+        if index.get('version') != _FORMAT_VERSION:
+            raise ValueError(f'Unsupported packed dataset version: {index.get("version")}')
+        self._pages = index['pages']
+
+        self._data_file = open(_data_path(dataset, path), 'rb')
+        data_size = os.fstat(self._data_file.fileno()).st_size
+        if data_size != index['data_size']:
+            self._data_file.close()
+            raise ValueError(f'Data file of packed dataset {dataset} does not match its index.')
+        self._mmap = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ) if data_size else b''
+
+    @staticmethod
+    def exists(dataset, path=DATASET_COMBINED_PACKED_PATH):
+        """
+        :param dataset: dataset name
+        :param path: packed datasets directory
+        :return: whether a packed version of the dataset exists
+        """
+        return os.path.isfile(_index_path(dataset, path))
+
+    @staticmethod
+    def remove(dataset, path=DATASET_COMBINED_PACKED_PATH):
+        """
+        Delete the packed version of a dataset if it exists.
+
+        :param dataset: dataset name
+        :param path: packed datasets directory
+        """
+        # The index is removed first, so that a partially deleted packed dataset is never considered to exist
+        for p in (_index_path(dataset, path), _data_path(dataset, path)):
+            if os.path.exists(p):
+                os.unlink(p)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._pages)
+
+    def __contains__(self, page_id):
+        return page_id in self._pages
+
+    def page_ids(self):
+        """
+        :return: sorted list of page IDs
+        """
+        return list(self._pages)
+
+    def get(self, page_id) -> Optional[str]:
+        """
+        Read a page.
+
+        :param page_id: page ID
+        :return: HTML string or ``None`` if the page does not exist
+        """
+        if page_id not in self._pages:
+            return None
+        offset, length, encoding, compression = self._pages[page_id]
+        data = self._mmap[offset:offset + length]
+        if compression == 'zlib':
+            data = zlib.decompress(data)
+        return data.decode(encoding)
+
+    def items(self, page_ids=None) -> Iterable[Tuple[str, str]]:
+        """
+        Iterate pages.
+
+        :param page_ids: optional list of page IDs to read (missing pages are skipped)
+        :return: iterable of ``(page_id, html)`` tuples (in data file order if no page IDs are given)
+        """
+        if page_ids is None:
+            page_ids = sorted(self._pages, key=lambda p: self._pages[p][0])
+        for p in page_ids:
+            html = self.get(p)
+            if html is not None:
+                yield p, html
+
+    def close(self):
+        """Close the packed dataset."""
+        if self._data_file is not None:
+            if isinstance(self._mmap, mmap.mmap):
+                self._mmap.close()
+            self._data_file.close()
+            self._data_file = None
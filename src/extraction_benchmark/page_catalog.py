@@ -0,0 +1,259 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Catalog of per-page metadata of the combined datasets.
+
+For each page, the catalog records its source case, the byte size of its HTML, the number of word tokens in its
+ground truth and in the visible text of its HTML, its extraction complexity, and its complexity bucket. Pages can
+thus be selected by complexity or size without opening any HTML. Complexity buckets are determined by the
+0.25 and 0.75 quantiles of the complexities of all catalogued pages.
+"""
+
+import json
+import os
+import sqlite3
+from typing import Iterable, List, Optional, Tuple
+
+from resiliparse.parse.html import HTMLTree
+
+from extraction_benchmark.paths import *
+from extraction_benchmark.util import tokenize_words
+
+
+COMPLEXITY_BUCKETS = ['low', 'medium', 'high']
+_BUCKET_QUANTILES = (0.25, 0.75)
+
+
+def count_truth_tokens(plaintext):
+    """
+    :param plaintext: ground-truth text
+    :return: number of word tokens in the ground truth
+    """
+    return len(tokenize_words(plaintext or ''))
+
+
+def count_html_tokens(html):
+    """
+    :param html: HTML page
+    :return: number of word tokens in the page text (without scripts and styles)
+    """
+    tree = HTMLTree.parse(html)
+    if tree.body is None:
+        return 0
+    for e in tree.body.query_selector_all('script, style'):
+        e.decompose()
+    return len(tokenize_words(tree.body.text))
+
+
+def truth_entry(page_id, truth):
+    """
+    :param page_id: page ID
+    :param truth: ground-truth record as returned by the dataset readers
+    :return: ``(page_id, source_case, truth_tokens)`` tuple for :meth:`PageCatalog.put_truth`
+    """
+    source = truth.get('source') or []
+    return page_id, source[1] if len(source) > 1 else None, count_truth_tokens(truth.get('plaintext'))
+
+
+def html_entry(page_id, html):
+    """
+    :param page_id: page ID
+    :param html: HTML page
+    :return: ``(page_id, html_size, html_tokens)`` tuple for :meth:`PageCatalog.put_html`
+    """
+    return page_id, len(html.encode()), count_html_tokens(html)
+
+
+def _quantile(values, q):
+    """Quantile of sorted values with linear interpolation."""
+    pos = (len(values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+class PageCatalog:
+    """
+    Persistent catalog of per-page metadata of the combined datasets.
+
+    Ground-truth and HTML metadata of a dataset are recorded separately together with a signature of the files
+    they were read from, so that outdated entries can be detected with :meth:`is_current`.
+    """
+
+    def __init__(self, db_path=DATASET_PAGE_CATALOG_PATH):
+        """
+        :param db_path: database file path
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=120)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS sources (
+                                  dataset TEXT NOT NULL,
+                                  kind TEXT NOT NULL,
+                                  signature TEXT NOT NULL,
+                                  PRIMARY KEY (dataset, kind)
+                              ) WITHOUT ROWID''')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS pages (
+                                  dataset TEXT NOT NULL,
+                                  page_id TEXT NOT NULL,
+                                  source_case TEXT,
+                                  html_size INTEGER,
+                                  truth_tokens INTEGER,
+                                  html_tokens INTEGER,
+                                  complexity REAL,
+                                  bucket TEXT,
+                                  PRIMARY KEY (dataset, page_id)
+                              ) WITHOUT ROWID''')
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def is_current(self, dataset, kind, signature):
+        """
+        :param dataset: dataset name
+        :param kind: ``"truth"`` or ``"html"``
+        :param signature: current signature of the ground-truth file or the HTML source
+        :return: whether the ground-truth or HTML metadata of the dataset are up to date
+        """
+        row = self._conn.execute('SELECT signature FROM sources WHERE dataset = ? AND kind = ?',
+                                 (dataset, kind)).fetchone()
+        return row is not None and row[0] == json.dumps(signature)
+
+    def put_truth(self, dataset, pages: Iterable[Tuple[str, Optional[str], int]], signature):
+        """
+        Replace the ground-truth metadata of a dataset.
+
+        :param dataset: dataset name
+        :param pages: iterable of ``(page_id, source_case, truth_tokens)`` tuples
+        :param signature: signature of the ground-truth file
+        """
+        with self._conn:
+            self._conn.execute('UPDATE pages SET source_case = NULL, truth_tokens = NULL WHERE dataset = ?',
+                               (dataset,))
+            self._conn.executemany('''INSERT INTO pages (dataset, page_id, source_case, truth_tokens)
+                                      VALUES (?, ?, ?, ?)
+                                      ON CONFLICT (dataset, page_id) DO UPDATE
+                                      SET source_case = excluded.source_case, truth_tokens = excluded.truth_tokens''',
+                                   ((dataset, *p) for p in pages))
+            self._update(dataset, 'truth', signature)
+
+    def put_html(self, dataset, pages: Iterable[Tuple[str, int, int]], signature):
+        """
+        Replace the HTML metadata of a dataset.
+
+        :param dataset: dataset name
+        :param pages: iterable of ``(page_id, html_size, html_tokens)`` tuples
+        :param signature: signature of the HTML source (packed dataset index or HTML directory)
+        """
+        with self._conn:
+            self._conn.execute('UPDATE pages SET html_size = NULL, html_tokens = NULL WHERE dataset = ?', (dataset,))
+            self._conn.executemany('''INSERT INTO pages (dataset, page_id, html_size, html_tokens)
+                                      VALUES (?, ?, ?, ?)
+                                      ON CONFLICT (dataset, page_id) DO UPDATE
+                                      SET html_size = excluded.html_size, html_tokens = excluded.html_tokens''',
+                                   ((dataset, *p) for p in pages))
+            self._update(dataset, 'html', signature)
+
+    def _update(self, dataset, kind, signature):
+        """Update the source signature, complexities, and buckets after changing the pages of a dataset."""
+        self._conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?)', (dataset, kind, json.dumps(signature)))
+        self._conn.execute('DELETE FROM pages WHERE dataset = ? AND truth_tokens IS NULL AND html_tokens IS NULL',
+                           (dataset,))
+
+        # Same definition as in complexity.calculate(): the fraction of page tokens that are not main content
+        self._conn.execute('''UPDATE pages SET complexity = CASE
+                                  WHEN truth_tokens IS NULL OR html_tokens IS NULL THEN NULL
+                                  WHEN html_tokens > 0 THEN 1.0 - MIN(MAX(CAST(truth_tokens AS REAL) / html_tokens,
+                                                                          0.0), 1.0)
+                                  WHEN truth_tokens > 0 THEN 0.0
+                              END
+                              WHERE dataset = ?''', (dataset,))
+
+        values = [c for c, in self._conn.execute(
+            'SELECT complexity FROM pages WHERE complexity IS NOT NULL ORDER BY complexity')]
+        if not values:
+            self._conn.execute('UPDATE pages SET bucket = NULL')
+            return
+        low, high = (_quantile(values, q) for q in _BUCKET_QUANTILES)
+        self._conn.execute('''UPDATE pages SET bucket = CASE
+                                  WHEN complexity IS NULL THEN NULL
+                                  WHEN complexity < ? THEN 'low'
+                                  WHEN complexity < ? THEN 'medium'
+                                  ELSE 'high'
+                              END''', (low, high))
+
+    def select(self, dataset, page_ids=None, complexity=None, size=None, buckets=None) -> List[str]:
+        """
+        Select the IDs of pages that match all given predicates.
+
+        :param dataset: dataset name
+        :param page_ids: optional list of page IDs to select from
+        :param complexity: optional ``(min, max)`` tuple of page complexities (inclusive, either may be ``None``)
+        :param size: optional ``(min, max)`` tuple of HTML sizes in bytes (inclusive, either may be ``None``)
+        :param buckets: optional list of complexity buckets (see :data:`COMPLEXITY_BUCKETS`)
+        :return: sorted list of page IDs
+        """
+        query = 'SELECT page_id FROM pages WHERE dataset = ? AND html_size IS NOT NULL'
+        params = [dataset]
+        for col, value_range in (('complexity', complexity), ('html_size', size)):
+            if value_range is None:
+                continue
+            if value_range[0] is not None:
+                query += f' AND {col} >= ?'
+                params.append(value_range[0])
+            if value_range[1] is not None:
+                query += f' AND {col} <= ?'
+                params.append(value_range[1])
+        if buckets is not None:
+            query += f' AND bucket IN ({", ".join("?" * len(buckets))})'
+            params.extend(buckets)
+        selected = (p for p, in self._conn.execute(query + ' ORDER BY page_id', params))
+        if page_ids is not None:
+            page_ids = set(page_ids)
+            return [p for p in selected if p in page_ids]
+        return list(selected)
+
+    def complexities(self, dataset):
+        """
+        :param dataset: dataset name
+        :return: dict of the IDs of all pages with ground truth and their complexities (``None`` if unknown)
+        """
+        return dict(self._conn.execute('''SELECT page_id, complexity FROM pages
+                                          WHERE dataset = ? AND truth_tokens IS NOT NULL
+                                          ORDER BY page_id''', (dataset,)))
+
+    def get(self, dataset, page_id):
+        """
+        :param dataset: dataset name
+        :param page_id: page ID
+        :return: dict of page metadata or ``None`` if the page is unknown
+        """
+        cursor = self._conn.execute('SELECT * FROM pages WHERE dataset = ? AND page_id = ?', (dataset, page_id))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip((c[0] for c in cursor.description), row))
+
+    def close(self):
+        """Close the catalog."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -24,14 +24,22 @@ CUSTOM_HTML_PROCESSED_PATH = os.path.join(CUSTOM_HTML_PATH, 'processed')
 CUSTOM_HTML_RAW_PATH = os.path.join(CUSTOM_HTML_PATH, 'raw')
 
 DATASET_RAW_PATH = os.path.join(DATASET_PATH, 'raw')
+DATASET_RAW_MANIFEST_PATH = os.path.join(DATASET_PATH, 'raw-manifest.sqlite')
+DATASET_PAGE_CATALOG_PATH = os.path.join(DATASET_PATH, 'page-catalog.sqlite')
 DATASET_COMBINED_PATH = os.path.join(DATASET_PATH, 'combined')
 
 DATASET_COMBINED_TRUTH_PATH = os.path.join(DATASET_COMBINED_PATH, 'ground-truth')
 DATASET_COMBINED_HTML_PATH = os.path.join(DATASET_COMBINED_PATH, 'html')
+DATASET_COMBINED_PACKED_PATH = os.path.join(DATASET_COMBINED_PATH, 'html-packed')
 
 OUTPUTS_PATH = os.path.join(ROOT_PATH, 'outputs')
 HTML_FEATURES_PATH = os.path.join(OUTPUTS_PATH, 'html-features')
 MODEL_OUTPUTS_PATH = os.path.join(OUTPUTS_PATH, 'model-outputs')
+EXTRACTION_CACHE_PATH = os.path.join(OUTPUTS_PATH, 'extraction-cache')
+EXTRACTION_QUARANTINE_PATH = os.path.join(OUTPUTS_PATH, 'extraction-quarantine.json')
+MODEL_ANSWER_STORE_PATH = os.path.join(OUTPUTS_PATH, 'model-answers.sqlite')
+ENSEMBLE_SEARCH_PATH = os.path.join(OUTPUTS_PATH, 'ensemble-search')
+ARCHIVE_INDEX_PATH = os.path.join(OUTPUTS_PATH, 'archive-index')
 METRICS_PATH = os.path.join(OUTPUTS_PATH, 'metrics-computed')
 METRICS_AGG_PATH = os.path.join(METRICS_PATH, '_aggregated')
 METRICS_COMPLEXITY_PATH = os.path.join(METRICS_PATH, '_complexity')
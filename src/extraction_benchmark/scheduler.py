@@ -0,0 +1,455 @@
+# Copyright 2023 Janek Bevendorff
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Work-stealing scheduler for running extraction jobs at page granularity.
+
+Jobs are split into chunks of page IDs, which are handed out to idle workers one by one. Once no unassigned
+chunks are left, idle workers steal the unprocessed tail of the chunk with the most remaining work from a busy
+worker, so that all workers stay busy until the very end of a run.
+
+Each worker communicates with the scheduler through its own pipe, so that workers which exceed their time or
+memory limits can be killed without affecting the remaining workers.
+
+Jobs can reserve shared resources (such as memory) while their chunks are being processed. Chunks of jobs whose
+resource demands exceed the remaining capacity are held back while idle workers are filled with chunks of other
+jobs.
+"""
+
+from collections import deque
+import glob
+from itertools import zip_longest
+from multiprocessing import get_context
+from multiprocessing.connection import wait
+import os
+import signal
+import time
+
+
+def split_chunks(items, chunk_size):
+    """
+    Split a list of items into chunks of at most ``chunk_size`` items.
+
+    :param items: list of items
+    :param chunk_size: maximum chunk size
+    :return: list of chunks
+    """
+    chunk_size = max(1, chunk_size)
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def interleave_chunks(jobs):
+    """
+    Interleave the chunks of several jobs, so that each job is started as early as possible.
+
+    :param jobs: iterable of ``(job_key, chunks)`` tuples
+    :return: list of ``(job_key, chunk)`` tuples
+    """
+    jobs = [[(k, c) for c in chunks] for k, chunks in jobs]
+    return [c for round_robin in zip_longest(*jobs) for c in round_robin if c is not None]
+
+
+def _get_descendant_pids(pid):
+    """Get the PIDs of all descendants of a process (from the child lists of its threads)."""
+    descendants = []
+    todo = [pid]
+    while todo:
+        for task in glob.glob(f'/proc/{todo.pop()}/task/*/children'):
+            try:
+                with open(task, 'r') as f:
+                    children = [int(c) for c in f.read().split()]
+            except (OSError, ValueError):
+                # Process has exited in the meantime
+                continue
+            descendants.extend(children)
+            todo.extend(children)
+    return descendants
+
+
+def _get_rss(pid):
+    """
+    Get the resident set size of a process and its descendants in bytes (or ``None`` if unavailable).
+
+    Descendants are included, so that the memory of helper processes started by extractors (e.g., external
+    CLIs) counts towards the limit of their worker.
+    """
+    rss = None
+    for p in [pid, *_get_descendant_pids(pid)]:
+        try:
+            with open(f'/proc/{p}/statm', 'r') as f:
+                rss = (rss or 0) + int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            continue
+    return rss
+
+
+def _kill_process_tree(process):
+    """Kill a worker process and its descendants, which would otherwise be orphaned."""
+    for p in _get_descendant_pids(process.pid):
+        try:
+            os.kill(p, signal.SIGKILL)
+        except OSError:
+            pass
+    process.kill()
+
+
+def _poll_messages(conn, chunk_id, pos, end):
+    """
+    Check for pending steal or shutdown requests.
+
+    :return: (possibly reduced) end of the current chunk and whether shutdown was requested
+    """
+    shutdown = False
+    while conn.poll():
+        msg = conn.recv()
+        if msg is None:
+            # Shutdown request while working, finish the current chunk early
+            shutdown = True
+            end = pos
+            continue
+        if msg[0] != 'steal' or msg[1] != chunk_id:
+            # Stale steal request for a previous chunk
+            continue
+        end = min(end, max(pos, msg[2]))
+        conn.send(('stolen', chunk_id, end))
+    return end, shutdown
+
+
+def _worker_main(chunk_func, conn, max_items=None):
+    """Worker process main loop."""
+    num_items = 0
+    shutdown = False
+    while not shutdown:
+        msg = conn.recv()
+        if msg is None:
+            break
+        if msg[0] != 'chunk':
+            continue
+
+        _, chunk_id, job_key, items = msg
+        end = len(items)
+        pos = 0
+        results = iter(chunk_func(job_key, items))
+        try:
+            while True:
+                end, s = _poll_messages(conn, chunk_id, pos, end)
+                shutdown |= s
+                if pos >= end:
+                    break
+                try:
+                    item_id, result = next(results)
+                except StopIteration:
+                    break
+                conn.send(('result', chunk_id, item_id, result))
+                pos += 1
+        finally:
+            if hasattr(results, 'close'):
+                results.close()
+
+        num_items += pos
+        exiting = bool(max_items and num_items >= max_items) and not shutdown
+        conn.send(('done', chunk_id, exiting))
+        if exiting:
+            # Recycle worker, but stay alive until the scheduler has replaced it, so that messages sent to the
+            # worker in the meantime (such as steal requests) do not fail
+            try:
+                while conn.recv() is not None:
+                    pass
+            except EOFError:
+                pass
+            break
+
+
+class _WorkerState:
+    def __init__(self, worker_id, process, conn):
+        self.worker_id = worker_id
+        self.process = process
+        self.conn = conn
+        self.chunk_id = None
+        self.job_key = None
+        self.items = None
+        self.pos = 0
+        self.end = 0
+        self.steal_pending = False
+        self.item_started = 0.0
+
+    def assign(self, chunk_id, job_key, items):
+        self.chunk_id = chunk_id
+        self.job_key = job_key
+        self.items = items
+        self.pos = 0
+        self.end = len(items)
+        self.steal_pending = False
+        self.item_started = time.monotonic()
+        self.conn.send(('chunk', chunk_id, job_key, items))
+
+    def release(self):
+        self.chunk_id = None
+        self.job_key = None
+        self.items = None
+        self.steal_pending = False
+
+    @property
+    def busy(self):
+        return self.chunk_id is not None
+
+    @property
+    def remaining(self):
+        return self.end - self.pos if self.busy else 0
+
+
+class WorkStealingScheduler:
+    """
+    Scheduler for processing chunks of items with a pool of worker processes.
+
+    Chunks are processed by a ``chunk_func(job_key, items)``, which must be a picklable callable that returns
+    an iterable of ``(item_id, result)`` tuples in the same order as ``items``.
+
+    If a ``failure_func`` is given, workers that exceed the time or memory limits returned by ``limits_func``
+    for their current job or that die unexpectedly are killed and replaced. The item they were processing is
+    reported with the result of ``failure_func(job_key, item_id, reason)``, where reason is one of ``"timeout"``,
+    ``"memory"``, or ``"crash"``, and the rest of their chunk is re-scheduled. Limits are not enforced if
+    ``parallelism == 1``.
+
+    If a ``resources_func`` is given, each worker reserves the resources returned by ``resources_func(job_key)``
+    for the job it is currently working on. A chunk is assigned to an idle worker only if the reserved amounts
+    plus its own demands do not exceed the ``capacities`` of any resource. A resource that is not in use by any
+    worker can always be reserved, so that jobs with demands larger than the capacity still make progress.
+    """
+
+    def __init__(self, chunk_func, parallelism, min_steal_size=2,
+                 failure_func=None, limits_func=None, max_items_per_worker=None,
+                 resources_func=None, capacities=None):
+        """
+        :param chunk_func: chunk processing function
+        :param parallelism: number of worker processes
+        :param min_steal_size: minimum number of remaining items in a chunk before its tail can be stolen
+        :param failure_func: function for creating results of failed items
+        :param limits_func: function returning a tuple of the maximum wall time per item in seconds and the
+                            maximum RSS of a worker and its child processes in bytes for a job key (``None``
+                            for no limit)
+        :param max_items_per_worker: replace workers with fresh processes after this many items
+        :param resources_func: function returning a dict of resource names and the amounts a worker reserves
+                               while working on a job key
+        :param capacities: dict of resource names and total capacities (missing resources are unlimited)
+        """
+        self.chunk_func = chunk_func
+        self.parallelism = max(1, parallelism)
+        self.min_steal_size = max(2, min_steal_size)
+        self.failure_func = failure_func
+        self.limits_func = limits_func or (lambda _: (None, None))
+        self.max_items_per_worker = max_items_per_worker
+        self.resources_func = resources_func or (lambda _: {})
+        self.capacities = {k: v for k, v in (capacities or {}).items() if v is not None}
+        self._demands = {}
+
+    def run(self, chunks):
+        """
+        Process chunks and return an iterable of results as they become available.
+
+        :param chunks: list of ``(job_key, items)`` tuples
+        :return: iterable of ``(job_key, item_id, result)`` tuples (unordered)
+        """
+        if self.parallelism == 1:
+            return self._run_sequential(chunks)
+        return self._run_parallel(chunks)
+
+    def _run_sequential(self, chunks):
+        for job_key, items in chunks:
+            for item_id, result in self.chunk_func(job_key, items):
+                yield job_key, item_id, result
+
+    def _start_worker(self, ctx, worker_id):
+        parent_conn, child_conn = ctx.Pipe()
+        proc = ctx.Process(target=_worker_main, args=(self.chunk_func, child_conn, self.max_items_per_worker),
+                           daemon=True)
+        proc.start()
+        child_conn.close()
+        return _WorkerState(worker_id, proc, parent_conn)
+
+    @staticmethod
+    def _stop_worker(w):
+        w.process.join(timeout=5)
+        if w.process.is_alive():
+            w.process.kill()
+            w.process.join()
+        w.conn.close()
+
+    def _demand(self, job_key):
+        if job_key not in self._demands:
+            self._demands[job_key] = {r: v for r, v in self.resources_func(job_key).items()
+                                      if v and r in self.capacities}
+        return self._demands[job_key]
+
+    def _reserved(self, workers):
+        """Get the resources reserved by all busy workers."""
+        reserved = {}
+        for w in workers:
+            if w.busy:
+                for r, v in self._demand(w.job_key).items():
+                    reserved[r] = reserved.get(r, 0) + v
+        return reserved
+
+    def _admissible(self, job_key, reserved):
+        """Check whether another worker can start working on a job without exceeding the resource capacities."""
+        return all(not reserved.get(r) or reserved[r] + v <= self.capacities[r]
+                   for r, v in self._demand(job_key).items())
+
+    def _next_admissible(self, pending, reserved):
+        """Remove and return the first pending chunk whose job is admissible (or ``None``)."""
+        for i, (job_key, items) in enumerate(pending):
+            if self._admissible(job_key, reserved):
+                del pending[i]
+                return job_key, items
+        return None
+
+    def _steal(self, workers, reserved):
+        """Send a steal request to the busy worker with the most remaining items."""
+        candidates = [w for w in workers if w.busy and not w.steal_pending and w.remaining >= self.min_steal_size
+                      and self._admissible(w.job_key, reserved)]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda w: w.remaining)
+        victim.steal_pending = True
+        victim.conn.send(('steal', victim.chunk_id, victim.pos + (victim.remaining + 1) // 2))
+        return True
+
+    def _check_limits(self, w):
+        """Check whether a busy worker has exceeded its limits and return the failure reason if so."""
+        if not w.busy:
+            return None
+        max_time, max_rss = self.limits_func(w.job_key)
+        if max_time and time.monotonic() - w.item_started > max_time:
+            return 'timeout'
+        if max_rss:
+            rss = _get_rss(w.process.pid)
+            if rss and rss > max_rss:
+                return 'memory'
+        return None
+
+    @staticmethod
+    def _receive(w, pending, results):
+        """
+        Receive and process one message from a worker.
+
+        :return: ``"crash"`` if the worker died, ``"exit"`` if it recycled itself, otherwise ``None``
+        """
+        try:
+            msg = w.conn.recv()
+        except (EOFError, OSError):
+            return 'crash'
+
+        if msg[1] != w.chunk_id:
+            return None
+        if msg[0] == 'result':
+            w.pos += 1
+            w.item_started = time.monotonic()
+            results.append((w.job_key, msg[2], msg[3]))
+        elif msg[0] == 'stolen':
+            w.steal_pending = False
+            if msg[2] < w.end:
+                pending.append((w.job_key, w.items[msg[2]:w.end]))
+                w.end = msg[2]
+        elif msg[0] == 'done':
+            w.release()
+            if msg[2]:
+                return 'exit'
+        return None
+
+    def _run_parallel(self, chunks):
+        if not chunks:
+            return
+
+        ctx = get_context('spawn')
+        pending = deque(chunks)
+        next_chunk_id = 0
+        workers = [self._start_worker(ctx, i) for i in range(min(self.parallelism, len(pending)))]
+
+        try:
+            while True:
+                idle = [w for w in workers if not w.busy]
+                reserved = self._reserved(workers)
+                while idle and pending:
+                    chunk = self._next_admissible(pending, reserved)
+                    if chunk is None:
+                        # Remaining chunks have to wait until resources are released
+                        break
+                    job_key, items = chunk
+                    idle.pop().assign(next_chunk_id, job_key, items)
+                    next_chunk_id += 1
+                    for r, v in self._demand(job_key).items():
+                        reserved[r] = reserved.get(r, 0) + v
+
+                # Steal work for idle workers (unless enough steal requests are in flight already)
+                for _ in range(len(idle) - sum(w.steal_pending for w in workers)):
+                    if not self._steal(workers, reserved):
+                        break
+
+                if not pending and not any(w.busy for w in workers):
+                    break
+
+                results = []
+                failed = {}
+                for conn in wait([w.conn for w in workers], timeout=1):
+                    w = next(w for w in workers if w.conn is conn)
+                    status = self._receive(w, pending, results)
+                    if status:
+                        failed[w.worker_id] = status
+                yield from results
+
+                for w in workers:
+                    if w.worker_id not in failed:
+                        reason = self._check_limits(w)
+                        if reason:
+                            failed[w.worker_id] = reason
+
+                for worker_id, reason in failed.items():
+                    w = workers[worker_id]
+                    if reason == 'exit':
+                        # Replace recycled worker before it can be assigned another chunk
+                        try:
+                            w.conn.send(None)
+                        except OSError:
+                            pass
+                        self._stop_worker(w)
+                        workers[worker_id] = self._start_worker(ctx, worker_id)
+                        continue
+
+                    if self.failure_func is None:
+                        raise RuntimeError(f'Worker process {worker_id} failed ({reason}).')
+
+                    # Kill worker and collect any results it sent in the meantime
+                    _kill_process_tree(w.process)
+                    w.process.join()
+                    results = []
+                    while w.conn.poll() and self._receive(w, pending, results) is None:
+                        pass
+                    yield from results
+                    self._stop_worker(w)
+
+                    if w.busy and w.pos < w.end:
+                        # Report current item as failed and re-schedule the rest
+                        yield w.job_key, w.items[w.pos], self.failure_func(w.job_key, w.items[w.pos], reason)
+                        if w.pos + 1 < w.end:
+                            pending.appendleft((w.job_key, w.items[w.pos + 1:w.end]))
+                    workers[worker_id] = self._start_worker(ctx, worker_id)
+        finally:
+            for w in workers:
+                if w.process.is_alive():
+                    try:
+                        w.conn.send(None)
+                    except OSError:
+                        pass
+            for w in workers:
+                self._stop_worker(w)
@@ -21,14 +21,19 @@ import hashlib
 import csv
 import shutil
 
+from extraction_benchmark import archives
+
+
 def read_jsonl(file):
     """
     Read JSONL file and return iterable of dicts.
 
+    The file is read from an archive if it does not exist on disk (see :mod:`extraction_benchmark.archives`).
+
     :param file: input filename
     :return: iterable of dicts
     """
-    with open(file, 'r') as f:
+    with archives.open_file(file, 'r') as f:
         for line in f:
             yield json.loads(line)
 
@@ -28,6 +28,7 @@ def main():
 
 
 main.add_command(complexity)
+main.add_command(ensemble)
 main.add_command(eval)
 main.add_command(extract)
 main.add_command(convert_datasets)
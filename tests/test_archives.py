@@ -0,0 +1,37 @@
+import lzma
+import os
+import tarfile
+
+from extraction_benchmark import archives
+
+
+def _make_archive(tmp_path, num_files):
+    src = tmp_path / 'src' / 'combined' / 'html' / 'ds'
+    src.mkdir(parents=True)
+    for i in range(num_files):
+        (src / f'p{i:03d}.html').write_text(f'<p>page {i}</p>')
+    archive_path = str(tmp_path / 'combined.tar.xz')
+    with tarfile.open(archive_path, 'w:xz') as tar:
+        tar.add(str(tmp_path / 'src' / 'combined'), arcname='combined')
+    return archive_path
+
+
+def test_read_files_keeps_order_in_single_pass(tmp_path, monkeypatch):
+    archive_path = _make_archive(tmp_path, 20)
+    directory = str(tmp_path / 'combined')
+    index = archives.ArchiveIndex(archive_path, 'combined', index_path=str(tmp_path / 'index'))
+    monkeypatch.setitem(archives.ARCHIVES, directory, archive_path)
+    monkeypatch.setitem(archives._INDEXES, archive_path, (index, index.signature))
+
+    num_opened = []
+    lzma_open = lzma.open
+    monkeypatch.setattr(lzma, 'open', lambda *args, **kwargs: num_opened.append(1) or lzma_open(*args, **kwargs))
+
+    paths = [os.path.join(directory, 'html', 'ds', f'p{i:03d}.html') for i in reversed(range(0, 20, 3))]
+    paths.insert(2, os.path.join(directory, 'html', 'ds', 'missing.html'))
+    results = list(archives.read_files(paths))
+
+    assert [p for p, _ in results] == [p for p in paths if not p.endswith('missing.html')]
+    assert all(data == f'<p>page {int(p[-8:-5])}</p>'.encode() for p, data in results)
+    # Members are decompressed in one forward pass, even though they were requested in reverse order
+    assert len(num_opened) == 1
@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip('resiliparse')
+
+from extraction_benchmark import dataset_readers
+from extraction_benchmark.packed_dataset import PackedDataset, PackedDatasetWriter
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_combined_reader_reports_missing_pages(tmp_path, monkeypatch, packed):
+    html_path = tmp_path / 'html'
+    (html_path / 'ds').mkdir(parents=True)
+    with PackedDatasetWriter('ds', path=str(tmp_path)) as writer:
+        for i in range(5):
+            (html_path / 'ds' / f'p{i}.html').write_text(f'<p>page {i}</p>')
+            writer.write(f'p{i}', f'<p>page {i}</p>')
+    monkeypatch.setattr(dataset_readers, 'DATASET_COMBINED_HTML_PATH', str(html_path))
+    packed_ds = PackedDataset('ds', path=str(tmp_path)) if packed else None
+    monkeypatch.setattr(dataset_readers, '_get_packed_dataset', lambda _: packed_ds)
+
+    page_ids = ['p3', 'missing1', 'p0', 'p4', 'missing2']
+    try:
+        pages = list(dataset_readers.CombinedDatasetReader(False, ['ds'], page_ids))
+    finally:
+        if packed_ds:
+            packed_ds.close()
+
+    assert [p for p, _ in pages] == page_ids
+    for page_id, data in pages:
+        if page_id.startswith('missing'):
+            assert data == dict(html='', error='missing', source=['ds', page_id])
+        else:
+            assert data['html'] == f'<p>page {page_id[1]}</p>' and 'error' not in data
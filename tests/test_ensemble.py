@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('resiliparse')
+
+from extraction_benchmark.extractors import extractors
+
+_MAIN = 'the main content of this page is a long paragraph with many words in it'
+_BOILERPLATE = 'navigation links and other boilerplate that only some models keep around'
+_HTML = f'<html><body><p>{_MAIN}</p><p>{_BOILERPLATE}</p></body></html>'
+
+
+@pytest.mark.parametrize('chosen_models', [[], ['goose3', 'readability', 'trafilatura']])
+def test_weighted_ensemble_variants(chosen_models):
+    members = extractors.get_ensemble_members('ensemble_weighted', chosen_models)
+    answers = {m: _MAIN for m in members}
+    answers[members[0]] = f'{_MAIN} {_BOILERPLATE}'
+    options = dict(thresholds=[0.1, 0.9], weightings={'first': {members[0]: len(members)}})
+
+    results = extractors.extract_ensemble_weighted(_HTML, 'p0', chosen_models=chosen_models, member_answers=answers,
+                                                   **options)
+
+    assert set(results) == {'ensemble_weighted', *extractors.get_output_variants('ensemble_weighted', options)}
+    assert results['ensemble_weighted.t0.9'] == _MAIN
+    # The boilerplate is kept only if the first member alone has enough votes
+    assert results['ensemble_weighted.first.t0.9'] == f'{_MAIN} {_BOILERPLATE}'
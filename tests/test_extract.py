@@ -0,0 +1,33 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('click')
+pytest.importorskip('resiliparse')
+
+from extraction_benchmark import extract
+
+
+def test_batch_retries_only_failed_pages(monkeypatch):
+    pages = [(f'p{i}', SimpleNamespace(html=f'<p>{i}</p>'), f'key{i}') for i in range(4)]
+    batches = []
+    single = []
+
+    def _batch(htmls, **_):
+        batches.append(htmls)
+        return [None if h == '<p>2</p>' else h.upper() for h in htmls]
+
+    def _single(model_name, dataset, page_id, doc, *args, **kwargs):
+        single.append(page_id)
+        return dict(plaintext='', model=model_name, error='failed')
+
+    monkeypatch.setattr(extract.extractors, 'get_batch_extractor', lambda _: _batch)
+    monkeypatch.setattr(extract, '_extract_page', _single)
+
+    results = extract._extract_batch('web2text', 'ds', pages, logger=logging.getLogger(__name__))
+
+    assert len(batches) == 1
+    assert single == ['p2']
+    assert [r['plaintext'] for r in results] == ['<P>0</P>', '<P>1</P>', '', '<P>3</P>']
+    assert results[2]['error'] == 'failed'
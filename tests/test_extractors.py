@@ -0,0 +1,18 @@
+from extraction_benchmark.extractors import extractors
+
+
+def test_fingerprint_ignores_execution_options():
+    fingerprint = extractors.get_extractor_fingerprint('go_domdistiller')
+    assert extractors.get_extractor_fingerprint('go_domdistiller', {'instances': 4}) == fingerprint
+    assert extractors.get_extractor_fingerprint('boilernet', {'parser': 'resiliparse'}) != \
+        extractors.get_extractor_fingerprint('boilernet')
+
+
+def test_extractor_entries():
+    for name in extractors.list_extractors(include_ensembles=True):
+        info = extractors.get_extractor_info(name)
+        assert info['cost'] in extractors.EXTRACTOR_COST_CLASSES
+        assert callable(getattr(extractors, 'extract_' + name))
+        assert info['batched'] == (extractors.get_batch_extractor(name) is not None)
+    assert extractors.get_batch_extractor('web2text') is extractors.batch_extract_web2text
+    assert not extractors.get_extractor_info('web2text')['thread_safe']
@@ -0,0 +1,50 @@
+import stat
+import sys
+
+import pytest
+
+from extraction_benchmark.extractors import go_domdistiller
+
+# Old CLI without --serve mode: reads the file given as argument and panics if it does not exist
+_OLD_CLI = '''
+import sys
+try:
+    with open(sys.argv[1]) as f:
+        print('distilled ' + f.read())
+except OSError:
+    sys.exit(2)
+'''
+
+# CLI with --serve mode
+_SERVE_CLI = '''
+import struct, sys
+assert sys.argv[1] == '--serve'
+while True:
+    header = sys.stdin.buffer.read(4)
+    if len(header) < 4:
+        break
+    data = sys.stdin.buffer.read(struct.unpack('>I', header)[0])
+    out = b'served ' + data
+    sys.stdout.buffer.write(struct.pack('>BI', 0, len(out)) + out)
+    sys.stdout.buffer.flush()
+'''
+
+
+def _install_cli(tmp_path, monkeypatch, source):
+    path = tmp_path / 'go_domdistiller_cli'
+    path.write_text(f'#!{sys.executable}\n{source}')
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setattr(go_domdistiller, 'CLI_PATH', str(path))
+    monkeypatch.setattr(go_domdistiller, '_serve_supported', None)
+    monkeypatch.setattr(go_domdistiller, '_pool', None)
+
+
+@pytest.mark.parametrize('source, prefix', [(_OLD_CLI, 'distilled'), (_SERVE_CLI, 'served')])
+def test_extract_batch(tmp_path, monkeypatch, source, prefix):
+    _install_cli(tmp_path, monkeypatch, source)
+    htmls = [f'<p>page {i}</p>' for i in range(5)]
+    try:
+        assert go_domdistiller.extract_batch(htmls, instances=2) == [f'{prefix} {h}' for h in htmls]
+        assert go_domdistiller.extract(htmls[0]) == f'{prefix} {htmls[0]}'
+    finally:
+        go_domdistiller.get_pool().close()
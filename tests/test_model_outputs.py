@@ -0,0 +1,28 @@
+import json
+
+from extraction_benchmark.model_outputs import ModelAnswerStore
+
+
+def _write_outputs(path, dataset, model, answers):
+    (path / dataset).mkdir(parents=True, exist_ok=True)
+    with open(path / dataset / f'{model}.jsonl', 'w') as f:
+        for page_id, text in answers.items():
+            f.write(json.dumps({'page_id': page_id, 'plaintext': text}) + '\n')
+
+
+def test_answer_store_scopes_datasets_and_prunes_removed_files(tmp_path):
+    outputs = tmp_path / 'outputs'
+    _write_outputs(outputs, 'ds1', 'm1', {'p0': 'ds1 answer'})
+    _write_outputs(outputs, 'ds2', 'm1', {'p0': 'ds2 answer', 'p1': 'other page'})
+    _write_outputs(outputs, 'ds2', 'm2', {'p0': 'm2 answer'})
+
+    with ModelAnswerStore(str(tmp_path / 'answers.sqlite'), str(outputs)) as store:
+        store.update(['m1', 'm2'])
+        assert store.get('p0', ['m1', 'm2'], 'ds1') == {'m1': 'ds1 answer'}
+        assert store.get('p0', ['m1', 'm2'], 'ds2') == {'m1': 'ds2 answer', 'm2': 'm2 answer'}
+
+        (outputs / 'ds2' / 'm1.jsonl').unlink()
+        store.update(['m2'])
+        assert store.get('p0', ['m1', 'm2'], 'ds2') == {'m2': 'm2 answer'}
+        assert store.get('p1', ['m1']) == {}
+        assert store.get('p0', ['m1']) == {'m1': 'ds1 answer'}
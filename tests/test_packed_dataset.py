@@ -0,0 +1,15 @@
+from extraction_benchmark.packed_dataset import PackedDataset, PackedDatasetWriter
+
+
+def test_remove(tmp_path):
+    with PackedDatasetWriter('ds', path=str(tmp_path)) as writer:
+        writer.write('p0', '<p>page</p>')
+    with PackedDataset('ds', path=str(tmp_path)) as packed:
+        assert packed.get('p0') == '<p>page</p>'
+    assert PackedDataset.exists('ds', path=str(tmp_path))
+
+    PackedDataset.remove('ds', path=str(tmp_path))
+    assert not PackedDataset.exists('ds', path=str(tmp_path))
+    assert not list(tmp_path.iterdir())
+    # Removing a dataset that is not packed is a no-op
+    PackedDataset.remove('ds', path=str(tmp_path))
@@ -0,0 +1,47 @@
+from collections import Counter
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from extraction_benchmark.scheduler import WorkStealingScheduler, _get_descendant_pids, _get_rss, \
+    interleave_chunks, split_chunks
+
+
+def _square_chunk(job_key, items):
+    for i in items:
+        time.sleep(0.001)
+        yield i, (job_key, i * i)
+
+
+def test_worker_recycling_returns_every_item_once():
+    items = list(range(800))
+    chunks = interleave_chunks([(k, split_chunks(items[k::2], 20)) for k in range(2)])
+    scheduler = WorkStealingScheduler(_square_chunk, parallelism=4, max_items_per_worker=10)
+
+    results = list(scheduler.run(chunks))
+
+    counts = Counter(item_id for _, item_id, _ in results)
+    assert sorted(counts) == items
+    assert set(counts.values()) == {1}
+    assert all(job_key == r[0] and item_id * item_id == r[1] for job_key, item_id, r in results)
+
+
+def test_rss_includes_child_processes():
+    # Parent process that starts a child process holding ~64 MiB of memory
+    code = ('import subprocess, sys, time; '
+            'subprocess.Popen([sys.executable, "-c", "import time; x = bytearray(64 << 20); time.sleep(30)"]); '
+            'time.sleep(30)')
+    proc = subprocess.Popen([sys.executable, '-c', code])
+    try:
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and _get_rss(proc.pid) < 64 << 20:
+            time.sleep(0.05)
+        assert len(_get_descendant_pids(proc.pid)) == 1
+        assert _get_rss(proc.pid) >= 64 << 20
+    finally:
+        for p in _get_descendant_pids(proc.pid):
+            os.kill(p, signal.SIGKILL)
+        proc.kill()
+        proc.wait()